@@ -1,6 +1,7 @@
 from Backend.backgroundEvents.activitiesUpdater import *
 from Backend.backgroundEvents.base import *
 from Backend.backgroundEvents.manifestUpdater import *
+from Backend.backgroundEvents.missingPgcrRetrier import *
 from Backend.backgroundEvents.rssFeedChecker import *
 from Backend.backgroundEvents.steamPlayerUpdater import *
 from Backend.backgroundEvents.tokenUpdater import *
@@ -1,56 +1,198 @@
-import asyncio
+import dataclasses
+import datetime
+import heapq
+import time
+from typing import Optional
 
-from anyio import create_task_group
+from anyio import CapacityLimiter, create_task_group
+from bungio.http import RateLimiter
+from bungio.models import DestinyComponentType, DestinyProfileResponse
 
 from Backend.backgroundEvents.base import BaseEvent
+from Backend.bungio.client import get_bungio_client, use_fresh_requests
+from Backend.bungio.scheduler import PriorityRateLimiter, RequestPriority, request_priority
 from Backend.core.destiny.activities import DestinyActivities
 from Backend.core.errors import CustomException
-from Backend.crud import discord_users
+from Backend.crud import crud_activities, discord_users
 from Backend.database.base import acquire_db_session, is_test_mode
 from Backend.database.models import DiscordUsers
+from Backend.misc.cache import cache
+from Shared.functions.helperFunctions import get_now_with_tz
 
-semaphore = asyncio.Semaphore(5)
+# how often a user gets checked at most / at least
+min_update_interval = datetime.timedelta(minutes=15)
+max_update_interval = datetime.timedelta(hours=24)
 
+# how far back the play frequency gets looked at
+play_days_window = datetime.timedelta(days=14)
 
-class ActivitiesUpdater(BaseEvent):
-    """Check for Activity Updates 4 times a day"""
+# how many users get updated at once if the whole bungie budget is available
+max_concurrent_updates = 20
 
-    def __init__(self):
-        interval_minutes = 60 * 4
-        super().__init__(scheduler_type="interval", interval_minutes=interval_minutes)
 
-    async def run(self):
+@dataclasses.dataclass
+class ActivitiesSchedule:
+    """
+    Keeps a next due time per user and works through them in that order
+    Users who play a lot or are online right now get checked often, inactive ones only once a day
+    """
+
+    # (due time, destiny_id) heap. Entries which do not match `next_due` anymore are outdated and get skipped
+    queue: list[tuple[datetime.datetime, int]] = dataclasses.field(init=False, default_factory=list)
+    next_due: dict[int, datetime.datetime] = dataclasses.field(init=False, default_factory=dict)
+
+    # Key: destiny_id
+    users: dict[int, DiscordUsers] = dataclasses.field(init=False, default_factory=dict)
+
+    async def sync_users(self):
+        """Get the current users. New ones are due immediately, removed ones get dropped"""
+
         async with acquire_db_session() as db:
             all_users = await discord_users.get_all(db=db)
 
-            # when testing, make this only return our user where we have data
-            if is_test_mode():
-                all_users = [user for user in all_users if user.destiny_id == 444]
+        # when testing, make this only return our user where we have data
+        if is_test_mode():
+            all_users = [user for user in all_users if user.destiny_id == 444]
+
+        self.users = {user.destiny_id: user for user in all_users}
+        for destiny_id in list(self.next_due):
+            if destiny_id not in self.users:
+                self.next_due.pop(destiny_id)
+
+        now = get_now_with_tz()
+        for destiny_id in self.users:
+            if destiny_id not in self.next_due:
+                self.schedule(destiny_id=destiny_id, due=now)
+
+    def schedule(self, destiny_id: int, due: datetime.datetime):
+        """Set when the user is due next"""
+
+        self.next_due[destiny_id] = due
+        heapq.heappush(self.queue, (due, destiny_id))
+
+    async def run_due(self):
+        """Update all users which are due, until nobody is due anymore"""
+
+        limiter = CapacityLimiter(get_concurrency())
 
-        # update them in anyio tasks
         async with create_task_group() as tg:
-            for user in all_users:
-                tg.start_soon(self.handle_user, user)
+            while self.queue and self.queue[0][0] <= get_now_with_tz():
+                due, destiny_id = heapq.heappop(self.queue)
+                if self.next_due.get(destiny_id) != due or not (user := self.users.get(destiny_id)):
+                    continue
+                self.next_due.pop(destiny_id)
 
-        # try to get the missing pgcr
-        if all_users:
-            async with acquire_db_session() as db:
-                activities = DestinyActivities(db=db, user=all_users[0])
-                await activities.update_missing_pgcr()
+                # check the budget before every user, so we slow down as soon as bungie gets busy
+                limiter.total_tokens = get_concurrency()
+                await limiter.acquire_on_behalf_of(destiny_id)
+                tg.start_soon(self.handle_user, user, limiter)
 
-    @staticmethod
-    async def handle_user(user: DiscordUsers):
-        """Create a sessions for the user and handle their activities"""
+    async def handle_user(self, user: DiscordUsers, limiter: CapacityLimiter):
+        """Update the user if they played since the last time, and schedule them again"""
 
-        async with semaphore:
+        request_priority.set(RequestPriority.INGEST)
+
+        last_played = None
+        try:
             async with acquire_db_session() as db:
                 # make sure they have a token
                 if await discord_users.token_is_expired(user=user):
                     return
 
+                # the profile is a single cheap request, while the history needs multiple per character
+                checked_at = get_now_with_tz()
+                last_played = await get_last_played(user=user)
+                if last_played and last_played <= user.activities_last_updated:
+                    cache.activities_checked[user.destiny_id] = checked_at
+                    return
+
                 # update the activities
                 activities = DestinyActivities(db=db, user=user)
                 try:
                     await activities.update_activity_db()
                 except CustomException:
                     pass
+
+        finally:
+            limiter.release_on_behalf_of(user.destiny_id)
+
+            # the user might have been removed in the meantime
+            if user.destiny_id in self.users and user.destiny_id not in self.next_due:
+                async with acquire_db_session() as db:
+                    play_days = await crud_activities.get_play_days(
+                        db=db, destiny_ids=[user.destiny_id], since=get_now_with_tz() - play_days_window
+                    )
+                self.schedule(
+                    destiny_id=user.destiny_id,
+                    due=get_next_update(
+                        last_played=max(last_played or user.activities_last_updated, user.activities_last_updated),
+                        play_days=play_days.get(user.destiny_id, 0),
+                    ),
+                )
+
+
+activities_schedule = ActivitiesSchedule()
+
+
+class ActivitiesUpdater(BaseEvent):
+    """Check for Activity Updates of the users which are due every couple of minutes"""
+
+    def __init__(self):
+        interval_minutes = 5
+        super().__init__(scheduler_type="interval", interval_minutes=interval_minutes)
+
+    async def run(self):
+        await activities_schedule.sync_users()
+        await activities_schedule.run_due()
+
+
+def get_next_update(
+    last_played: datetime.datetime, play_days: int, now: Optional[datetime.datetime] = None
+) -> datetime.datetime:
+    """
+    Get when the user should be checked next
+    The interval grows with the time since they last played, and shrinks the more days they played recently
+    """
+
+    now = now or get_now_with_tz()
+
+    interval = (now - last_played) / 2
+    interval *= 1 - min(play_days, play_days_window.days) / (2 * play_days_window.days)
+
+    return now + min(max(interval, min_update_interval), max_update_interval)
+
+
+def get_concurrency() -> int:
+    """Get how many users can be updated at once with the bungie budget which is left right now"""
+
+    ratelimiter: PriorityRateLimiter = get_bungio_client().http.ratelimiter
+    budget = min(get_remaining_budget(ratelimiter), ratelimiter.get_remaining_budget(RequestPriority.INGEST))
+
+    return max(1, round(max_concurrent_updates * budget))
+
+
+def get_remaining_budget(ratelimiter: RateLimiter) -> float:
+    """Get the share of the ratelimiter tokens which are left in the current window"""
+
+    # the tokens only get refilled on the next request
+    if ratelimiter.tokens == ratelimiter.max_tokens or time.time() - ratelimiter.updated_at >= ratelimiter.seconds:
+        return 1
+
+    return ratelimiter.tokens / ratelimiter.max_tokens
+
+
+async def get_last_played(user: DiscordUsers) -> Optional[datetime.datetime]:
+    """Get when the user was last online. Skips the cached responses, since it needs to be current"""
+
+    async def fetch(to_fetch: list[int]) -> DestinyProfileResponse:
+        with use_fresh_requests():
+            return await user.bungio_user.get_profile(components=to_fetch, auth=user.auth)
+
+    try:
+        profile = await cache.profiles.get(
+            destiny_id=user.destiny_id, components=[DestinyComponentType.PROFILES.value], fetch=fetch, fresh=True
+        )
+    except Exception:
+        return None
+
+    return profile.profile.data.date_last_played
@@ -0,0 +1,13 @@
+from Backend.backgroundEvents.base import BaseEvent
+from Backend.core.destiny.activities import retry_missing_pgcrs
+
+
+class MissingPgcrRetrier(BaseEvent):
+    """Retry the missing pgcrs which are due every minute"""
+
+    def __init__(self):
+        interval_minutes = 1
+        super().__init__(scheduler_type="interval", interval_minutes=interval_minutes)
+
+    async def run(self):
+        await retry_missing_pgcrs()
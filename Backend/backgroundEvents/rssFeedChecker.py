@@ -47,22 +47,15 @@ class RssFeedChecker(BaseEvent):
                             "embed_description": f"[{item.description}]({bungie_url(item.link)})",
                             "embed_image_url": item.image_path,
                             "guilds": subscribed_data,
+                            "message_name": "rss",
                         }
 
-                        # send the payload to elevator
-                        result = await elevator_api.post(
+                        # send the payload to elevator. It delivers the messages in the background and removes the subscriptions of channels which are gone
+                        await elevator_api.post(
                             route="/messages",
                             json=data,
                         )
 
-                        # remove db entry if channel doesnt exist
-                        if result:
-                            if not result.content["success"]:
-                                for error_guild in result.content["guilds"]:
-                                    await persistent_messages.delete(
-                                        db=db, message_name="rss", guild_id=error_guild["guild_id"]
-                                    )
-
                         # save item in DB
                         await rss_feed.insert(db=db, item_id=item.unique_identifier)
                 except CustomException:
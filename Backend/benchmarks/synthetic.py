@@ -0,0 +1,284 @@
+import dataclasses
+import datetime
+import random
+from typing import AsyncIterator, Iterator
+
+from bungio.models import DestinyActivityModeType, DestinyClass, DestinyPostGameCarnageReportData
+
+from Backend.bungio.client import get_bungio_client
+
+
+@dataclasses.dataclass(frozen=True)
+class SyntheticActivity:
+    reference_id: int
+    mode: DestinyActivityModeType
+    modes: tuple[DestinyActivityModeType, ...]
+    weight: float  # how often it gets played compared to the others
+    max_players: int
+    duration_seconds: tuple[int, int]  # min / max
+    checkpoint_chance: float = 0  # chance it gets started from a checkpoint
+    lowman_chance: float = 0  # chance it gets played with less than the max players
+
+
+# roughly what the users here play
+default_activity_mix: tuple[SyntheticActivity, ...] = (
+    # last wish
+    SyntheticActivity(
+        reference_id=2122313384,
+        mode=DestinyActivityModeType.RAID,
+        modes=(DestinyActivityModeType.RAID,),
+        weight=2,
+        max_players=6,
+        duration_seconds=(1800, 7200),
+        checkpoint_chance=0.4,
+        lowman_chance=0.05,
+    ),
+    # vault of glass
+    SyntheticActivity(
+        reference_id=3881495763,
+        mode=DestinyActivityModeType.RAID,
+        modes=(DestinyActivityModeType.RAID,),
+        weight=2,
+        max_players=6,
+        duration_seconds=(1800, 5400),
+        checkpoint_chance=0.4,
+        lowman_chance=0.05,
+    ),
+    # prophecy
+    SyntheticActivity(
+        reference_id=4148187374,
+        mode=DestinyActivityModeType.DUNGEON,
+        modes=(DestinyActivityModeType.DUNGEON,),
+        weight=2,
+        max_players=3,
+        duration_seconds=(900, 3600),
+        checkpoint_chance=0.2,
+        lowman_chance=0.15,
+    ),
+    # grandmaster nightfall
+    SyntheticActivity(
+        reference_id=1964120205,
+        mode=DestinyActivityModeType.SCORED_NIGHTFALL,
+        modes=(DestinyActivityModeType.SCORED_NIGHTFALL, DestinyActivityModeType.ALL_STRIKES),
+        weight=1,
+        max_players=3,
+        duration_seconds=(1200, 3600),
+        lowman_chance=0.05,
+    ),
+    # strikes
+    SyntheticActivity(
+        reference_id=1203950592,
+        mode=DestinyActivityModeType.STRIKE,
+        modes=(DestinyActivityModeType.STRIKE, DestinyActivityModeType.ALL_STRIKES),
+        weight=8,
+        max_players=3,
+        duration_seconds=(400, 1200),
+    ),
+    # control
+    SyntheticActivity(
+        reference_id=2591737171,
+        mode=DestinyActivityModeType.CONTROL,
+        modes=(DestinyActivityModeType.CONTROL, DestinyActivityModeType.ALL_PV_P),
+        weight=10,
+        max_players=12,
+        duration_seconds=(300, 600),
+    ),
+    # patrol
+    SyntheticActivity(
+        reference_id=1199493030,
+        mode=DestinyActivityModeType.PATROL,
+        modes=(DestinyActivityModeType.PATROL,),
+        weight=5,
+        max_players=3,
+        duration_seconds=(60, 1800),
+    ),
+)
+
+
+@dataclasses.dataclass
+class SyntheticPgcrs:
+    """
+    Generates pgcrs which look like the ones bungie returns, with ids which are stable for the same seed
+
+    The users are split into clans. Fireteam slots get filled with members of the same clan with `clan_overlap` chance, and with random other players otherwise
+    """
+
+    users: int = 1000
+    clan_size: int = 100
+    clan_overlap: float = 0.7
+    weapons_per_player: int = 3
+    weapon_pool: int = 500
+    activity_mix: tuple[SyntheticActivity, ...] = default_activity_mix
+    start_time: datetime.datetime = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+    end_time: datetime.datetime = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    seed: int = 0
+
+    # the ids the generated data starts at
+    first_destiny_id: int = 4611686018400000000
+    first_instance_id: int = 10_000_000_000
+    first_weapon_id: int = 100_000
+
+    def __post_init__(self):
+        self._random = random.Random(self.seed)
+        self._weights = [activity.weight for activity in self.activity_mix]
+
+    @property
+    def destiny_ids(self) -> list[int]:
+        return [self.first_destiny_id + i for i in range(self.users)]
+
+    @property
+    def weapon_ids(self) -> list[int]:
+        return [self.first_weapon_id + i for i in range(self.weapon_pool)]
+
+    def character_ids(self, destiny_id: int) -> list[int]:
+        """Every user has three characters, one of each class"""
+
+        return [(destiny_id - self.first_destiny_id) * 3 + i + 1 for i in range(3)]
+
+    def generate(self, activities: int) -> Iterator[tuple[int, datetime.datetime, dict]]:
+        """Yield `activities` raw pgcrs as (instance_id, period, bungie json)"""
+
+        span = (self.end_time - self.start_time).total_seconds()
+        for i in range(activities):
+            instance_id = self.first_instance_id + i
+            period = self.start_time + datetime.timedelta(seconds=span * i / max(activities, 1))
+            yield instance_id, period, self._make_pgcr(instance_id=instance_id, period=period)
+
+    async def generate_models(
+        self, activities: int, batch_size: int = 500
+    ) -> AsyncIterator[list[tuple[int, datetime.datetime, DestinyPostGameCarnageReportData]]]:
+        """Yield batches of the pgcrs, converted to the bungio models like the real ones are"""
+
+        client = get_bungio_client()
+
+        batch = []
+        for instance_id, period, data in self.generate(activities=activities):
+            pgcr = await DestinyPostGameCarnageReportData.from_dict(data=data, client=client, recursive=True)
+            batch.append((instance_id, period, pgcr))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _make_pgcr(self, instance_id: int, period: datetime.datetime) -> dict:
+        rng = self._random
+        activity = rng.choices(self.activity_mix, weights=self._weights)[0]
+
+        # build the fireteam
+        players = activity.max_players
+        if rng.random() < activity.lowman_chance:
+            players = rng.randint(1, max(activity.max_players - 1, 1))
+        first = rng.randrange(self.users)
+        clan_start = first - first % self.clan_size
+        fireteam = {first}
+        while len(fireteam) < min(players, self.users):
+            if rng.random() < self.clan_overlap:
+                fireteam.add(clan_start + rng.randrange(min(self.clan_size, self.users - clan_start)))
+            else:
+                fireteam.add(rng.randrange(self.users))
+
+        duration = rng.randint(*activity.duration_seconds)
+        from_beginning = rng.random() >= activity.checkpoint_chance
+        flawless = rng.random() < 0.1
+
+        return {
+            "period": period.isoformat(),
+            "startingPhaseIndex": 0 if from_beginning else 2,
+            "activityWasStartedFromBeginning": from_beginning,
+            "activityDetails": {
+                "referenceId": activity.reference_id,
+                "directorActivityHash": activity.reference_id,
+                "instanceId": str(instance_id),
+                "mode": activity.mode.value,
+                "modes": [mode.value for mode in activity.modes],
+                "isPrivate": False,
+                "membershipType": 3,
+            },
+            "entries": [
+                self._make_entry(user=user, duration=duration, players=len(fireteam), flawless=flawless)
+                for user in sorted(fireteam)
+            ],
+            "teams": [],
+        }
+
+    def _make_entry(self, user: int, duration: int, players: int, flawless: bool) -> dict:
+        rng = self._random
+        destiny_id = self.first_destiny_id + user
+        character_index = rng.randrange(3)
+        character_class = [DestinyClass.TITAN, DestinyClass.HUNTER, DestinyClass.WARLOCK][character_index]
+
+        kills = rng.randint(0, duration // 5)
+        precision_kills = rng.randint(0, kills)
+        deaths = 0 if flawless else rng.randint(0, 20)
+        assists = rng.randint(0, kills + 1)
+        completed = rng.random() < 0.85
+
+        weapon_kills = [rng.randint(0, kills) for _ in range(self.weapons_per_player)]
+        weapons = [
+            {
+                "referenceId": self.first_weapon_id + rng.randrange(self.weapon_pool),
+                "values": {
+                    "uniqueWeaponKills": _stat(value),
+                    "uniqueWeaponPrecisionKills": _stat(rng.randint(0, value)),
+                },
+            }
+            for value in weapon_kills
+        ]
+
+        return {
+            "standing": 0,
+            "score": _stat(kills * 100),
+            "characterId": str(self.character_ids(destiny_id)[character_index]),
+            "player": {
+                "destinyUserInfo": {
+                    "membershipId": str(destiny_id),
+                    "membershipType": 3,
+                    "displayName": f"Guardian{user}",
+                    "bungieGlobalDisplayName": f"Guardian{user}",
+                    "bungieGlobalDisplayNameCode": user % 10_000,
+                    "crossSaveOverride": 0,
+                    "applicableMembershipTypes": [3],
+                    "isPublic": True,
+                    "iconPath": "",
+                },
+                "characterClass": character_class.display_name,
+                "classHash": 0,
+                "raceHash": 0,
+                "genderHash": 0,
+                "characterLevel": 50,
+                "lightLevel": rng.randint(1500, 1810),
+                "emblemHash": 1_000 + user % 100,
+            },
+            "values": {
+                "assists": _stat(assists),
+                "completed": _stat(int(completed)),
+                "deaths": _stat(deaths),
+                "kills": _stat(kills),
+                "opponentsDefeated": _stat(kills + assists),
+                "efficiency": _stat((kills + assists) / max(deaths, 1)),
+                "killsDeathsRatio": _stat(kills / max(deaths, 1)),
+                "killsDeathsAssists": _stat((kills + assists / 2) / max(deaths, 1)),
+                "score": _stat(kills * 100),
+                "activityDurationSeconds": _stat(duration),
+                "completionReason": _stat(0 if completed else 2),
+                "startSeconds": _stat(0),
+                "timePlayedSeconds": _stat(duration),
+                "playerCount": _stat(players),
+                "teamScore": _stat(0),
+            },
+            "extended": {
+                "weapons": weapons,
+                "values": {
+                    "precisionKills": _stat(precision_kills),
+                    "weaponKillsGrenade": _stat(rng.randint(0, kills // 10 + 1)),
+                    "weaponKillsMelee": _stat(rng.randint(0, kills // 10 + 1)),
+                    "weaponKillsSuper": _stat(rng.randint(0, kills // 10 + 1)),
+                    "weaponKillsAbility": _stat(rng.randint(0, kills // 10 + 1)),
+                },
+            },
+        }
+
+
+def _stat(value: float) -> dict:
+    return {"basic": {"value": float(value), "displayValue": str(value)}}
@@ -1,13 +1,17 @@
+import contextlib
 import datetime
 import logging
 import os
+from contextvars import ContextVar
+from typing import Optional
 
-from aiohttp_client_cache import RedisBackend
+from aiohttp_client_cache import CachedResponse, RedisBackend
 from bungio import Client
 from bungio.error import InvalidAuthentication
-from bungio.http import HttpClient, RateLimiter, Route
+from bungio.http import HttpClient, Route
 from bungio.models import AuthData
 
+from Backend.bungio.scheduler import PriorityRateLimiter, PrioritySemaphore
 from Backend.database import acquire_db_session, is_test_mode, setup_engine
 from Backend.prometheus.stats import prom_bungie_errors, prom_bungie_perf, prom_bungie_running
 from Shared.functions.readSettingsFile import get_setting
@@ -39,6 +43,32 @@ class MyClient(Client):
         self.logger.debug(f"Destiny manifest was updated by bungie")
 
 
+# if the bungie requests made in this context skip the cached responses
+skip_http_cache: ContextVar[bool] = ContextVar("skip_http_cache", default=False)
+
+
+@contextlib.contextmanager
+def use_fresh_requests():
+    """
+    Make the bungie requests in this block (and the tasks started in it) skip the cached responses
+    Unlike `session.disabled()` this does not touch the session, so the other requests still get cached ones
+    """
+
+    token = skip_http_cache.set(True)
+    try:
+        yield
+    finally:
+        skip_http_cache.reset(token)
+
+
+class MyRedisBackend(RedisBackend):
+    async def get_response(self, key: str) -> Optional[CachedResponse]:
+        # the fresh response still gets saved afterwards
+        if skip_http_cache.get():
+            return None
+        return await super().get_response(key)
+
+
 class MyHttpClient(HttpClient):
     async def request(self, route: Route) -> dict:
         labels = {
@@ -70,12 +100,6 @@ class MyHttpClient(HttpClient):
 _BUNGIO_CLIENT: MyClient = None
 
 
-# do some monkey patching to add a ratelimiter for this route
-async def get_activity_history(self, *args, **kwargs):
-    await self.activity_updater_ratelimiter.wait_for_token()
-    await self._get_activity_history(*args, **kwargs)
-
-
 def get_bungio_client() -> MyClient:
     global _BUNGIO_CLIENT
 
@@ -85,7 +109,7 @@ def get_bungio_client() -> MyClient:
             bungie_client_secret=get_setting("BUNGIE_APPLICATION_CLIENT_SECRET"),
             bungie_token=get_setting("BUNGIE_APPLICATION_API_KEY"),
             logger=logging.getLogger("bungio"),
-            cache=RedisBackend(
+            cache=MyRedisBackend(
                 cache_name="backend",
                 address=f"""redis://{os.environ.get("REDIS_HOST")}:{os.environ.get("REDIS_PORT")}""",
                 allowed_methods=["GET"],
@@ -106,8 +130,9 @@ def get_bungio_client() -> MyClient:
             manifest_storage=setup_engine(),
             http_client_class=MyHttpClient,
         )
-        _BUNGIO_CLIENT.api._get_activity_history = _BUNGIO_CLIENT.api.get_activity_history
-        _BUNGIO_CLIENT.api._get_activity_history = get_activity_history
-        _BUNGIO_CLIENT.api.activity_updater_ratelimiter = RateLimiter(max_tokens=230)
+
+        # hand out the ratelimit by priority, so background work can not starve the users
+        _BUNGIO_CLIENT.http.ratelimiter = PriorityRateLimiter()
+        _BUNGIO_CLIENT.http.semaphore = PrioritySemaphore()
 
     return _BUNGIO_CLIENT
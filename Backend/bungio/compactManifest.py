@@ -0,0 +1,243 @@
+import json
+import mmap
+import os
+from array import array
+from typing import Iterator, Optional
+
+from bungio.models import DamageType, DestinyAmmunitionType, DestinyInventoryItemDefinition, DestinyItemSubType
+
+# where the compact manifest files get saved. One file per manifest version
+manifest_cache_dir = "ManifestCache"
+
+# file layout: magic, header length, json header, the columns (each starting at a multiple of 8)
+_magic = b"EBCM"
+_header_length_size = 4
+
+
+class CompactWeapon:
+    """A single weapon from `CompactWeapons`. Only has the fields we use"""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "CompactWeapons", row: int):
+        self._store = store
+        self._row = row
+
+    def __repr__(self) -> str:
+        return f"CompactWeapon(hash={self.hash}, name={self.name!r})"
+
+    @property
+    def hash(self) -> int:
+        return self._store.columns["hash"][self._row]
+
+    @property
+    def name(self) -> str:
+        return self._store.get_string("name", self._row)
+
+    @property
+    def description(self) -> str:
+        return self._store.get_string("description", self._row)
+
+    @property
+    def flavor_text(self) -> str:
+        return self._store.get_string("flavor_text", self._row)
+
+    @property
+    def tier_type_name(self) -> str:
+        return self._store.get_string("tier_type_name", self._row)
+
+    @property
+    def bucket_type_hash(self) -> int:
+        return self._store.columns["bucket_type_hash"][self._row]
+
+    @property
+    def item_sub_type(self) -> DestinyItemSubType:
+        return DestinyItemSubType(self._store.columns["item_sub_type"][self._row])
+
+    @property
+    def default_damage_type(self) -> DamageType:
+        return DamageType(self._store.columns["default_damage_type"][self._row])
+
+    @property
+    def ammo_type(self) -> DestinyAmmunitionType:
+        return DestinyAmmunitionType(self._store.columns["ammo_type"][self._row])
+
+    @property
+    def redacted(self) -> bool:
+        return bool(self._store.columns["redacted"][self._row])
+
+
+class CompactWeapons:
+    """
+    All weapons of a manifest version, stored column wise with only the fields we use
+
+    The columns are arrays, or memoryviews into the mapped file when loaded with `load()`.
+    Strings are saved as one utf-8 blob per column with the offsets of each row.
+    """
+
+    __slots__ = ("version", "columns", "_rows", "_mmap")
+
+    # column name: array typecode
+    number_columns = {
+        "hash": "q",
+        "bucket_type_hash": "q",
+        "item_sub_type": "h",
+        "default_damage_type": "h",
+        "ammo_type": "h",
+        "redacted": "b",
+    }
+    string_columns = ("name", "description", "flavor_text", "tier_type_name")
+
+    def __init__(self, version: Optional[str], columns: dict, file: Optional[mmap.mmap] = None):
+        self.version = version
+        self.columns = columns
+        self._mmap = file
+
+        # dense hash -> row map
+        self._rows: dict[int, int] = {weapon_hash: row for row, weapon_hash in enumerate(self.columns["hash"])}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[CompactWeapon]:
+        return self.values()
+
+    def __contains__(self, item: int) -> bool:
+        return item in self._rows
+
+    def values(self) -> Iterator[CompactWeapon]:
+        """Iterate over all weapons"""
+
+        for row in range(len(self._rows)):
+            yield CompactWeapon(store=self, row=row)
+
+    def get(self, weapon_hash: int) -> Optional[CompactWeapon]:
+        """Get the weapon by its hash"""
+
+        row = self._rows.get(weapon_hash)
+        return CompactWeapon(store=self, row=row) if row is not None else None
+
+    def get_string(self, column: str, row: int) -> str:
+        """Decode a string from the blob"""
+
+        offsets = self.columns[f"{column}.offsets"]
+        return bytes(self.columns[f"{column}.data"][offsets[row] : offsets[row + 1]]).decode()
+
+    @classmethod
+    def from_definitions(
+        cls, version: Optional[str], definitions: list[DestinyInventoryItemDefinition]
+    ) -> "CompactWeapons":
+        """Convert the full manifest definitions"""
+
+        columns = {name: array(typecode) for name, typecode in cls.number_columns.items()}
+        strings: dict[str, list[bytes]] = {name: [] for name in cls.string_columns}
+
+        for definition in definitions:
+            columns["hash"].append(definition.hash)
+            columns["bucket_type_hash"].append(definition.inventory.bucket_type_hash)
+            columns["item_sub_type"].append(definition.item_sub_type.value)
+            columns["default_damage_type"].append(definition.default_damage_type.value)
+            columns["ammo_type"].append(definition.equipping_block.ammo_type.value)
+            columns["redacted"].append(definition.redacted)
+
+            strings["name"].append(definition.display_properties.name.encode())
+            strings["description"].append(definition.display_properties.description.encode())
+            strings["flavor_text"].append((definition.flavor_text or "").encode())
+            strings["tier_type_name"].append((definition.inventory.tier_type_name or "").encode())
+
+        for name, values in strings.items():
+            offsets = array("q", [0])
+            for value in values:
+                offsets.append(offsets[-1] + len(value))
+            columns[f"{name}.offsets"] = offsets
+            columns[f"{name}.data"] = array("B", b"".join(values))
+
+        return cls(version=version, columns=columns)
+
+    def save(self, path: str):
+        """Write the columns to the file. Gets written to a temporary file first, so readers never see half a file"""
+
+        header = {}
+        segments = []
+        offset = 0
+        for name, column in self.columns.items():
+            data = bytes(column)
+            header[name] = [column.format if isinstance(column, memoryview) else column.typecode, offset, len(data)]
+            segments.append(data)
+
+            # align the next column
+            offset += len(data) + (-len(data) % 8)
+
+        header_bytes = json.dumps({"version": self.version, "columns": header}).encode()
+        start = len(_magic) + _header_length_size + len(header_bytes)
+        start += -start % 8
+
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(_magic)
+            file.write(len(header_bytes).to_bytes(_header_length_size, "little"))
+            file.write(header_bytes)
+            for name, data in zip(header, segments):
+                file.seek(start + header[name][1])
+                file.write(data)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "CompactWeapons":
+        """Map the file into memory. The columns are read from the file directly, nothing gets parsed"""
+
+        with open(path, "rb") as file:
+            file_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if file_map[: len(_magic)] != _magic:
+            file_map.close()
+            raise ValueError(f"{path} is not a compact manifest file")
+
+        header_length = int.from_bytes(file_map[len(_magic) : len(_magic) + _header_length_size], "little")
+        header_start = len(_magic) + _header_length_size
+        header = json.loads(file_map[header_start : header_start + header_length])
+        start = header_start + header_length
+        start += -start % 8
+
+        view = memoryview(file_map)
+        columns = {
+            name: view[start + offset : start + offset + length].cast(typecode)
+            for name, (typecode, offset, length) in header["columns"].items()
+        }
+
+        return cls(version=header["version"], columns=columns, file=file_map)
+
+
+def get_compact_manifest_path(name: str, version: str) -> str:
+    """Get the path of the file for the manifest version"""
+
+    # the version contains characters that do not belong in a file name
+    version = "".join(char if char.isalnum() else "_" for char in version)
+    return os.path.join(manifest_cache_dir, f"{name}_{version}.bin")
+
+
+def load_compact_weapons(version: str) -> Optional[CompactWeapons]:
+    """Load the weapons of that manifest version from the file, if it exists"""
+
+    path = get_compact_manifest_path(name="weapons", version=version)
+    try:
+        return CompactWeapons.load(path)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_compact_weapons(weapons: CompactWeapons):
+    """Save the weapons and delete the files of older manifest versions"""
+
+    os.makedirs(manifest_cache_dir, exist_ok=True)
+    path = get_compact_manifest_path(name="weapons", version=weapons.version)
+    weapons.save(path)
+
+    for file_name in os.listdir(manifest_cache_dir):
+        file_path = os.path.join(manifest_cache_dir, file_name)
+        if file_name.startswith("weapons_") and file_name.endswith(".bin") and file_path != path:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                # another worker was faster
+                pass
@@ -1,7 +1,10 @@
 import asyncio
 import copy
-from typing import Optional
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Optional
 
+from anyio import create_task_group, to_thread
 from bungio.models import (
     MISSING,
     DestinyActivityDefinition,
@@ -16,10 +19,20 @@ from bungio.models import (
     DestinySeasonPassDefinition,
     DestinySocketTypeDefinition,
 )
+from sqlalchemy import text
 
 from Backend.bungio.client import get_bungio_client
+from Backend.bungio.compactManifest import (
+    CompactWeapon,
+    CompactWeapons,
+    load_compact_weapons,
+    save_compact_weapons,
+)
 from Backend.core.errors import CustomException
-from Backend.database.base import is_test_mode
+from Backend.crud import crud_weapon_attributes
+from Backend.database.base import acquire_db_session, is_test_mode
+from Backend.misc.cache import cache
+from Backend.prometheus.stats import prom_manifest_warmup
 from Shared.enums.destiny import DestinyPresentationNodesEnum
 from Shared.networkingSchemas import (
     SeasonalChallengesModel,
@@ -28,120 +41,130 @@ from Shared.networkingSchemas import (
 )
 from Shared.networkingSchemas.destiny import DestinyActivityModel, DestinyLoreModel
 
-get_challenging_solo_activities_lock = asyncio.Lock()
-get_gm_lock = asyncio.Lock()
-get_activities_lock = asyncio.Lock()
-get_collectible_lock = asyncio.Lock()
-get_triumph_lock = asyncio.Lock()
-get_lore_lock = asyncio.Lock()
-get_season_pass_lock = asyncio.Lock()
-get_seasonal_challenges_definition_lock = asyncio.Lock()
-get_catalyst_lock = asyncio.Lock()
-get_item_lock = asyncio.Lock()
-get_all_weapons_lock = asyncio.Lock()
-get_seals_lock = asyncio.Lock()
-get_sockets_lock = asyncio.Lock()
-
 
 class CRUDManifest:
-    # Manifest Definitions. Saving DB calls since 1982. Make sure to `asyncio.Lock():` them
-    _manifest_season_pass_definition: DestinySeasonPassDefinition = None
-    _manifest_seasonal_challenges_definition: SeasonalChallengesModel = None
-
-    # DestinyInventoryItemDefinition
-    _manifest_items: dict[int, Optional[DestinyInventoryItemDefinition]] = {}
-    _manifest_weapons: dict[int, DestinyInventoryItemDefinition] = {}
-
-    # DestinyCollectibleDefinition
-    _manifest_collectibles: dict[int, DestinyCollectibleDefinition] = {}
+    """
+    A snapshot of the manifest. Saving DB calls since 1982
 
-    # DestinyLoreModel
-    _manifest_lore: dict[int, DestinyLoreModel] = {}
+    Data is loaded on first access. `reset()` builds a complete new snapshot in the background and swaps it in at once
+    """
 
-    # DestinySocketTypeDefinition
-    _manifest_sockets: dict[int, DestinySocketTypeDefinition] = {}
+    def __init__(self):
+        self._manifest_season_pass_definition: Optional[DestinySeasonPassDefinition] = None
+        self._manifest_seasonal_challenges_definition: Optional[SeasonalChallengesModel] = None
 
-    # DestinyRecordDefinition
-    _manifest_triumphs: dict[int, DestinyRecordDefinition] = {}
-    _manifest_seals: dict[DestinyPresentationNodeDefinition, list[DestinyRecordDefinition]] = {}
-    _manifest_catalysts: list[DestinyRecordDefinition] = []
+        # DestinyInventoryItemDefinition
+        self._manifest_items: dict[int, Optional[DestinyInventoryItemDefinition]] = {}
+        self._manifest_weapons: Optional[CompactWeapons] = None
 
-    # DestinyActivityModel
-    _manifest_activities: dict[int, DestinyActivityModel] = {}
-    _manifest_grandmasters: list[DestinyActivityModel] = []
-    _manifest_interesting_solos: dict[str, list[DestinyActivityModel]] = {}  # Key: activity_category
+        # DestinyCollectibleDefinition
+        self._manifest_collectibles: dict[int, DestinyCollectibleDefinition] = {}
 
-    async def reset(self, soft: bool = False):
-        """Reset the caches after a manifest update"""
+        # DestinyLoreModel
+        self._manifest_lore: dict[int, DestinyLoreModel] = {}
 
-        self._manifest_weapons = {}
-        if not soft:
-            await destiny_manifest.get_all_weapons()
+        # DestinySocketTypeDefinition
+        self._manifest_sockets: dict[int, DestinySocketTypeDefinition] = {}
 
-        self._manifest_sockets = {}
-        if not soft:
-            await destiny_manifest.get_all_sockets()
+        # DestinyRecordDefinition
+        self._manifest_triumphs: dict[int, DestinyRecordDefinition] = {}
+        self._manifest_seals: dict[DestinyPresentationNodeDefinition, list[DestinyRecordDefinition]] = {}
+        self._manifest_catalysts: list[DestinyRecordDefinition] = []
 
-        self._manifest_season_pass_definition = None  # noqa
-        await destiny_manifest.get_current_season_pass()
+        # DestinyActivityModel
+        self._manifest_activities: dict[int, DestinyActivityModel] = {}
+        self._manifest_grandmasters: list[DestinyActivityModel] = []
+        self._manifest_interesting_solos: dict[str, list[DestinyActivityModel]] = {}  # Key: activity_category
 
-        self._manifest_seasonal_challenges_definition = None  # noqa
-        if not soft:
-            await self.get_seasonal_challenges_definition()
+        # only used while the data gets loaded, not when reading it
+        self._locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
 
-        self._manifest_items = {}
-        # per item, so not populated here
+    async def reset(self, soft: bool = False):
+        """Load a new snapshot after a manifest update. The old data is used until the new one is complete"""
 
-        self._manifest_collectibles = {}
-        if not soft:
-            await destiny_manifest.get_all_collectibles()
+        snapshot = CRUDManifest()
 
-        self._manifest_triumphs = {}
-        if not soft:
-            await destiny_manifest.get_all_triumphs()
+        if soft:
+            # everything else gets loaded on first access
+            await self._warmup(snapshot.get_current_season_pass)
 
-        self._manifest_seals = {}
-        if not soft:
-            await destiny_manifest.get_seals()
+        else:
+            # load the independent parts at the same time, the dependant ones after each other
+            async with create_task_group() as tg:
+                tg.start_soon(self._warmup, snapshot.get_all_weapons)
+                tg.start_soon(self._warmup, snapshot.get_all_sockets)
+                tg.start_soon(self._warmup, snapshot.get_current_season_pass)
+                tg.start_soon(self._warmup, snapshot.get_seasonal_challenges_definition)
+                tg.start_soon(self._warmup, snapshot.get_all_collectibles)
+                tg.start_soon(self._warmup, snapshot.get_all_lore)
+                tg.start_soon(self._warmup, snapshot.get_all_triumphs, snapshot.get_seals, snapshot.get_catalysts)
+                tg.start_soon(
+                    self._warmup,
+                    snapshot.get_all_activities,
+                    snapshot.get_grandmaster_nfs,
+                    snapshot.get_challenging_solo_activities,
+                )
 
-        self._manifest_lore = {}
-        if not soft:
-            await destiny_manifest.get_all_lore()
+        # swap without awaiting anything in between, so readers see either the old or the new data
+        self.__dict__.update(snapshot.__dict__)
 
-        self._manifest_catalysts = []
-        if not soft:
-            await destiny_manifest.get_catalysts()
+    @staticmethod
+    async def _warmup(*getters: Callable[[], Awaitable]):
+        """Load the sections after each other and track how long they took"""
 
-        self._manifest_activities = {}
-        if not soft:
-            await destiny_manifest.get_all_activities()
+        for getter in getters:
+            start = time.perf_counter()
+            await getter()
+            prom_manifest_warmup.labels(section=getter.__name__).set(time.perf_counter() - start)
 
-        self._manifest_grandmasters = []
-        if not soft:
-            await destiny_manifest.get_grandmaster_nfs()
+    async def get_version(self) -> Optional[str]:
+        """Get the version of the manifest which is saved in the db"""
 
-        self._manifest_interesting_solos = {}
-        if not soft:
-            await destiny_manifest.get_challenging_solo_activities()
+        table_name = f"{get_bungio_client().manifest.prefix}version"
+        async with acquire_db_session() as db:
+            # the table only exists once the manifest got downloaded
+            if not (await db.execute(text(f"SELECT to_regclass('\"{table_name}\"')"))).scalar():
+                return None
+            return (await db.execute(text(f'SELECT version FROM "{table_name}"'))).scalar()
 
-    async def get_all_weapons(self) -> dict[int, DestinyInventoryItemDefinition]:
+    async def get_all_weapons(self) -> CompactWeapons:
         """Return all weapons"""
 
-        async with get_all_weapons_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_weapons:
+            return self._manifest_weapons
+
+        async with self._locks["get_all_weapons"]:
             if not self._manifest_weapons:
-                results: list[DestinyInventoryItemDefinition] = await get_bungio_client().manifest.fetch_all(
-                    manifest_class=DestinyInventoryItemDefinition,
-                    filter=f"""CAST(data ->> 'itemType' AS INTEGER) = {DestinyItemType.WEAPON.value}""",
-                )
-                for result in results:
-                    self._manifest_weapons[result.hash] = result
-                    self._manifest_items[result.hash] = result
+                # a restart or another worker might have already built them for this manifest version
+                version = None if is_test_mode() else await self.get_version()
+                if version:
+                    self._manifest_weapons = await to_thread.run_sync(lambda: load_compact_weapons(version=version))
+
+                if not self._manifest_weapons:
+                    results: list[DestinyInventoryItemDefinition] = await get_bungio_client().manifest.fetch_all(
+                        manifest_class=DestinyInventoryItemDefinition,
+                        filter=f"""CAST(data ->> 'itemType' AS INTEGER) = {DestinyItemType.WEAPON.value}""",
+                    )
+                    self._manifest_weapons = await to_thread.run_sync(
+                        lambda: CompactWeapons.from_definitions(version=version, definitions=results)
+                    )
+                    if version:
+                        await to_thread.run_sync(lambda: save_compact_weapons(weapons=self._manifest_weapons))
+
+                # the db filters by the weapon attributes, so they need to match
+                async with acquire_db_session() as db:
+                    await crud_weapon_attributes.update(db=db, weapons=self._manifest_weapons)
         return self._manifest_weapons
 
     async def get_all_sockets(self) -> dict[int, DestinySocketTypeDefinition]:
         """Return all sockets"""
 
-        async with get_sockets_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_sockets:
+            return self._manifest_sockets
+
+        async with self._locks["get_sockets"]:
             if not self._manifest_sockets:
                 results: list[DestinySocketTypeDefinition] = await get_bungio_client().manifest.fetch_all(
                     manifest_class=DestinySocketTypeDefinition
@@ -150,7 +173,7 @@ class CRUDManifest:
                     self._manifest_sockets[result.hash] = result
         return self._manifest_sockets
 
-    async def get_weapon(self, weapon_id: int) -> DestinyInventoryItemDefinition:
+    async def get_weapon(self, weapon_id: int) -> CompactWeapon:
         """Gets weapon"""
 
         weapons = await self.get_all_weapons()
@@ -161,7 +184,11 @@ class CRUDManifest:
     async def get_seasonal_challenges_definition(self) -> SeasonalChallengesModel:
         """Gets all seasonal challenges"""
 
-        async with get_seasonal_challenges_definition_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_seasonal_challenges_definition:
+            return self._manifest_seasonal_challenges_definition
+
+        async with self._locks["get_seasonal_challenges_definition"]:
             if not self._manifest_seasonal_challenges_definition:
                 definition = SeasonalChallengesModel()
 
@@ -204,7 +231,11 @@ class CRUDManifest:
     async def get_item(self, item_id: int) -> Optional[DestinyInventoryItemDefinition]:
         """Return the item"""
 
-        async with get_item_lock:
+        # no need to wait for the lock once it is loaded
+        if item_id in self._manifest_items:
+            return self._manifest_items[item_id]
+
+        async with self._locks["get_item"]:
             if item_id not in self._manifest_items:
                 item: DestinyInventoryItemDefinition = await get_bungio_client().manifest.fetch(
                     manifest_class=DestinyInventoryItemDefinition, value=str(item_id)
@@ -239,7 +270,11 @@ class CRUDManifest:
     async def get_all_activities(self) -> dict[int, DestinyActivityModel]:
         """Gets all activities"""
 
-        async with get_activities_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_activities:
+            return self._manifest_activities
+
+        async with self._locks["get_activities"]:
             if not self._manifest_activities:
                 results: list[DestinyActivityDefinition] = await get_bungio_client().manifest.fetch_all(
                     manifest_class=DestinyActivityDefinition
@@ -287,23 +322,33 @@ class CRUDManifest:
     async def get_all_collectibles(self) -> dict[int, DestinyCollectibleDefinition]:
         """Gets all collectibles"""
 
-        async with get_collectible_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_collectibles:
+            return self._manifest_collectibles
+
+        async with self._locks["get_collectible"]:
             if not self._manifest_collectibles:
                 results: list[DestinyCollectibleDefinition] = await get_bungio_client().manifest.fetch_all(
                     manifest_class=DestinyCollectibleDefinition
                 )
                 self._manifest_collectibles = {result.hash: result for result in results}
+                cache.collectible_index.seed(self._manifest_collectibles)
         return self._manifest_collectibles
 
     async def get_all_triumphs(self) -> dict[int, DestinyRecordDefinition]:
         """Gets all triumphs"""
 
-        async with get_triumph_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_triumphs:
+            return self._manifest_triumphs
+
+        async with self._locks["get_triumph"]:
             if not self._manifest_triumphs:
                 results: list[DestinyRecordDefinition] = await get_bungio_client().manifest.fetch_all(
                     manifest_class=DestinyRecordDefinition
                 )
                 self._manifest_triumphs = {result.hash: result for result in results}
+                cache.triumph_index.seed(self._manifest_triumphs)
         return self._manifest_triumphs
 
     async def get_triumph(self, triumph_id: int) -> DestinyRecordDefinition:
@@ -317,7 +362,11 @@ class CRUDManifest:
     async def get_seals(self) -> dict[DestinyPresentationNodeDefinition, list[DestinyRecordDefinition]]:
         """Returns a list of the current seals. Returns {title_name: DestinyRecordDefinition}"""
 
-        async with get_seals_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_seals:
+            return self._manifest_seals
+
+        async with self._locks["get_seals"]:
             if not self._manifest_seals:
                 presentation_nodes: list[
                     DestinyPresentationNodeDefinition
@@ -330,19 +379,26 @@ class CRUDManifest:
                             seals.append(node)
 
                 # now loop through all the seals and get the record infos
+                # only set the result once it is complete, readers do not wait for the lock
+                result = {}
                 for seal in seals:
                     records = []
                     for triumph in seal.children.records:
                         records.append(await self.get_triumph(triumph_id=triumph.record_hash))
 
-                    self._manifest_seals[seal] = records
+                    result[seal] = records
+                self._manifest_seals = result
 
         return self._manifest_seals
 
     async def get_catalysts(self) -> list[DestinyRecordDefinition]:
         """Returns a list of the current catalysts"""
 
-        async with get_catalyst_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_catalysts:
+            return self._manifest_catalysts
+
+        async with self._locks["get_catalyst"]:
             if not self._manifest_catalysts:
                 triumphs = await self.get_all_triumphs()
 
@@ -356,7 +412,11 @@ class CRUDManifest:
         """Gets all lore"""
 
         # get them all from the db
-        async with get_lore_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_lore:
+            return self._manifest_lore
+
+        async with self._locks["get_lore"]:
             if not self._manifest_lore:
                 results: list[DestinyLoreDefinition] = await get_bungio_client().manifest.fetch_all(
                     manifest_class=DestinyLoreDefinition
@@ -374,7 +434,11 @@ class CRUDManifest:
     async def get_current_season_pass(self) -> DestinySeasonPassDefinition:
         """Get the current season pass from the DB"""
 
-        async with get_season_pass_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_season_pass_definition:
+            return self._manifest_season_pass_definition
+
+        async with self._locks["get_season_pass"]:
             if not self._manifest_season_pass_definition:
                 results: list[DestinySeasonPassDefinition] = await get_bungio_client().manifest.fetch_all(
                     manifest_class=DestinySeasonPassDefinition
@@ -385,7 +449,11 @@ class CRUDManifest:
     async def get_grandmaster_nfs(self) -> list[DestinyActivityModel]:
         """Get all grandmaster nfs"""
 
-        async with get_gm_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_grandmasters:
+            return self._manifest_grandmasters
+
+        async with self._locks["get_gm"]:
             if not self._manifest_grandmasters:
                 results: list[DestinyActivityDefinition] = await get_bungio_client().manifest.fetch_all(
                     manifest_class=DestinyActivityDefinition
@@ -442,7 +510,11 @@ class CRUDManifest:
     async def get_challenging_solo_activities(self) -> dict[str, list[DestinyActivityModel]]:
         """Get activities that are difficult to solo"""
 
-        async with get_challenging_solo_activities_lock:
+        # no need to wait for the lock once it is loaded
+        if self._manifest_interesting_solos:
+            return self._manifest_interesting_solos
+
+        async with self._locks["get_challenging_solo_activities"]:
             # check self
             if not self._manifest_interesting_solos:
                 # key is the topic, then the activity display name
@@ -479,9 +551,11 @@ class CRUDManifest:
                 )
 
                 # loop through each of the entries
+                # only set the result once it is complete, readers do not wait for the lock
+                result = {}
                 for category, items in interesting_solos.items():
-                    if category not in self._manifest_interesting_solos:
-                        self._manifest_interesting_solos[category] = []
+                    if category not in result:
+                        result[category] = []
 
                     for activity_name, search_data in items.items():
                         # special handling for grandmasters
@@ -528,7 +602,9 @@ class CRUDManifest:
                             assert data is not None
 
                         if data:
-                            self._manifest_interesting_solos[category].append(data)
+                            result[category].append(data)
+
+                self._manifest_interesting_solos = result
 
         return self._manifest_interesting_solos
 
@@ -0,0 +1,185 @@
+import asyncio
+import collections
+import contextlib
+import dataclasses
+import enum
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from bungio.http import RateLimiter
+from bungio.models.base import custom_define, custom_field
+
+from Backend.prometheus.stats import prom_bungie_queue_depth, prom_bungie_queue_wait
+
+
+class RequestPriority(enum.IntEnum):
+    """Who is waiting for the bungie request. Lower is more important"""
+
+    INTERACTIVE = 0  # a user is waiting for the answer
+    ROLES = 1  # role checks for whole guilds
+    INGEST = 2  # activity updates in the background
+    BACKFILL = 3  # retrying old missing data
+
+
+@dataclasses.dataclass(frozen=True)
+class PriorityClass:
+    weight: int  # share of the tokens while multiple classes are waiting
+    budget: float  # share of the tokens per window this class can use at most
+    max_concurrent: int  # requests of this class which can be running at once
+
+
+priority_classes: dict[RequestPriority, PriorityClass] = {
+    RequestPriority.INTERACTIVE: PriorityClass(weight=8, budget=1, max_concurrent=100),
+    RequestPriority.ROLES: PriorityClass(weight=4, budget=0.6, max_concurrent=50),
+    RequestPriority.INGEST: PriorityClass(weight=2, budget=0.5, max_concurrent=50),
+    RequestPriority.BACKFILL: PriorityClass(weight=1, budget=0.25, max_concurrent=20),
+}
+
+# the priority of the bungie requests made in this context. Unmarked requests come from the endpoints
+request_priority: ContextVar[RequestPriority] = ContextVar("request_priority", default=RequestPriority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def use_request_priority(priority: RequestPriority):
+    """Make the bungie requests in this block (and the tasks started in it) with that priority"""
+
+    token = request_priority.set(priority)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+@custom_define()
+class PriorityRateLimiter(RateLimiter):
+    """
+    Hands out the ratelimit tokens with weighted fair queuing between the priority classes
+    Every class but the interactive one can only use its budget of each window, so the rest is always left for the users
+    """
+
+    _waiting: dict[RequestPriority, collections.deque[asyncio.Future]] = custom_field(
+        init=False, factory=lambda: {priority: collections.deque() for priority in RequestPriority}
+    )
+    _virtual_time: dict[RequestPriority, float] = custom_field(
+        init=False, factory=lambda: {priority: 0.0 for priority in RequestPriority}
+    )
+    _virtual_clock: float = custom_field(init=False, default=0.0)
+    _used: dict[RequestPriority, int] = custom_field(
+        init=False, factory=lambda: {priority: 0 for priority in RequestPriority}
+    )
+    _window_start: float = custom_field(init=False, factory=time.time)
+    _dispatcher: Optional[asyncio.Task] = custom_field(init=False, default=None)
+
+    # set when a new request shows up, so the dispatcher does not sleep through it
+    _wakeup: asyncio.Event = custom_field(init=False, factory=asyncio.Event)
+
+    async def wait_for_token(self):
+        """Waits until a token becomes available for the priority of the current context"""
+
+        priority = request_priority.get()
+
+        # a class which was idle does not get to use up the time it was not waiting
+        if not self._waiting[priority]:
+            self._virtual_time[priority] = max(self._virtual_time[priority], self._virtual_clock)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[priority].append(future)
+        self._wakeup.set()
+        if not self._dispatcher or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        queue_depth = prom_bungie_queue_depth.labels(priority=priority.name)
+        queue_depth.inc()
+        start = time.perf_counter()
+        try:
+            await future
+        finally:
+            queue_depth.dec()
+            prom_bungie_queue_wait.labels(priority=priority.name).observe(time.perf_counter() - start)
+
+    def get_remaining_budget(self, priority: RequestPriority) -> float:
+        """Get the share of its budget the class has left in the current window"""
+
+        self._roll_window()
+        budget = self._get_budget(priority)
+        return max(budget - self._used[priority], 0) / budget
+
+    async def _dispatch(self):
+        """Give out the tokens while requests are waiting"""
+
+        # a token which was taken, but nobody with budget was waiting for it anymore
+        has_token = False
+
+        while any(self._waiting.values()):
+            if self._next_priority() is None:
+                # everyone waiting is out of budget. Wait for the next window, or for a new request which might have budget
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=max(self._window_start + self.seconds - time.time(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if not has_token:
+                await RateLimiter.wait_for_token(self)
+                has_token = True
+
+            # pick after getting the token, since more important requests might have shown up in the meantime
+            if (priority := self._next_priority()) is None:
+                continue
+            has_token = False
+
+            future = self._waiting[priority].popleft()
+            future.set_result(None)
+            self._used[priority] += 1
+            self._virtual_clock = self._virtual_time[priority]
+            self._virtual_time[priority] += 1 / priority_classes[priority].weight
+
+    def _next_priority(self) -> Optional[RequestPriority]:
+        """Get the waiting class with the smallest virtual time which still has budget left"""
+
+        self._roll_window()
+
+        best = None
+        for priority, waiting in self._waiting.items():
+            # drop the requests which stopped waiting
+            while waiting and waiting[0].done():
+                waiting.popleft()
+
+            if waiting and self._used[priority] < self._get_budget(priority):
+                if best is None or self._virtual_time[priority] < self._virtual_time[best]:
+                    best = priority
+
+        return best
+
+    def _roll_window(self):
+        """Reset the used budgets once the window is over"""
+
+        if time.time() - self._window_start >= self.seconds:
+            self._window_start = time.time()
+            for priority in self._used:
+                self._used[priority] = 0
+
+    def _get_budget(self, priority: RequestPriority) -> int:
+        return max(int(self.max_tokens * priority_classes[priority].budget), 1)
+
+
+class PrioritySemaphore:
+    """Limits the running requests per priority class, so a full class does not block the others"""
+
+    def __init__(self):
+        self._semaphores = {
+            priority: asyncio.Semaphore(priority_class.max_concurrent)
+            for priority, priority_class in priority_classes.items()
+        }
+
+    async def __aenter__(self):
+        semaphore = self._semaphores[request_priority.get()]
+        await semaphore.acquire()
+        return semaphore
+
+    async def __aexit__(self, *args):
+        self._semaphores[request_priority.get()].release()
@@ -2,21 +2,30 @@ import asyncio
 import dataclasses
 import datetime
 import logging
-from typing import Optional
+import time
+from typing import Awaitable, Callable, Optional
 
-from anyio import create_task_group, to_thread
+import orjson
+from anyio import EndOfStream, create_memory_object_stream, create_task_group, move_on_after, to_thread
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
 from bungio.error import BungieDead, BungIOException, InvalidAuthentication, TimeoutException
-from bungio.http import RateLimiter
 from bungio.models import DestinyActivityModeType, DestinyPostGameCarnageReportData
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from Backend.bungio.client import get_bungio_client
 from Backend.bungio.manifest import destiny_manifest
+from Backend.bungio.scheduler import RequestPriority, use_request_priority
 from Backend.core.destiny.clan import DestinyClan
 from Backend.core.errors import CustomException
-from Backend.crud import crud_activities, crud_activities_fail_to_get, discord_users
+from Backend.crud import (
+    crud_activities,
+    crud_activities_archive,
+    crud_activities_fail_to_get,
+    crud_activities_users_stats,
+    discord_users,
+)
 from Backend.database.base import acquire_db_session
-from Backend.database.models import ActivitiesUsers, DiscordUsers
+from Backend.database.models import ActivitiesUsers, ActivitiesUsersStats, DiscordUsers
 from Backend.misc.cache import cache
 from Shared.functions.helperFunctions import get_now_with_tz
 from Shared.networkingSchemas.destiny import (
@@ -31,11 +40,49 @@ from Shared.networkingSchemas.destiny import (
 )
 from Shared.networkingSchemas.destiny.roles import TimePeriodModel
 
-update_missing_pgcr_lock = asyncio.Lock()
-input_data_lock = asyncio.Lock()
-
 pgcr_getter_semaphore = asyncio.Semaphore(100)
 
+# how many history entries get checked against the db at once
+history_page_size = 250
+
+# how many instances can wait for their pgcr per update. Applies back-pressure to the history pager
+pgcr_fetch_queue_size = 250
+# how many pgcrs are fetched concurrently per update (still bound by the global semaphore)
+pgcr_fetch_workers = 25
+# how many pgcrs are written to the db at once
+pgcr_write_batch_size = 50
+# how many seconds a non-full batch can wait before it gets written anyway
+pgcr_write_interval = 5
+
+# how many workers retry the missing pgcrs concurrently per process, and how many rows each of them claims at once
+missing_pgcr_workers = 5
+missing_pgcr_batch_size = 10
+
+# how many archived pgcrs get replayed at once, and how many batches are read ahead
+archive_replay_batch_size = 1000
+archive_replay_read_ahead = 2
+
+# how old the saved activities can be before requests start an update
+activity_freshness_budget = datetime.timedelta(minutes=5)
+# how many seconds requests wait for that update before they answer with the saved data
+activity_freshness_deadline = 2
+
+# the running background updates - Key: destiny_id
+activity_update_tasks: dict[int, asyncio.Task] = {}
+
+
+async def load_saved_pgcrs():
+    """Fill the cache with the instance_ids of all saved activities"""
+
+    # get the logger
+    logger = logging.getLogger("updateActivityDb")
+
+    async with acquire_db_session() as db:
+        instance_ids = await crud_activities.get_all_instance_ids(db=db)
+    cache.saved_pgcrs.update(instance_ids, is_sorted=True)
+
+    logger.info(f"Loaded `{len(instance_ids)}` saved instance_ids into the cache")
+
 
 @dataclasses.dataclass
 class DestinyActivities:
@@ -65,6 +112,34 @@ class DestinyActivities:
     ) -> DestinyLowManModel:
         """Returns low man data. If results gets passed, the result gets added to that list too"""
 
+        # use the rollup if possible, it does not know about individual runs
+        if not (score_threshold or min_kills_per_minute or disallowed_datetimes):
+            stats = await crud_activities_users_stats.get(
+                db=db or self.db,
+                destiny_id=self.destiny_id,
+                activity_hashes=activity_ids,
+                no_checkpoints=no_checkpoints,
+                require_team_flawless=require_flawless,
+                maximum_allowed_players=max_player_count,
+            )
+
+            count = sum(entry.completed_rows for entry in stats)
+            flawless_count = sum(entry.flawless_completed_rows for entry in stats)
+            fastest = min(
+                (entry for entry in stats if entry.fastest_completed_row_seconds is not None),
+                key=lambda entry: entry.fastest_completed_row_seconds,
+                default=None,
+            )
+
+            return DestinyLowManModel(
+                activity_ids=activity_ids,
+                count=count,
+                flawless_count=flawless_count,
+                not_flawless_count=count - flawless_count,
+                fastest=datetime.timedelta(seconds=fastest.fastest_completed_row_seconds) if fastest else None,
+                fastest_instance_id=fastest.fastest_completed_row_instance_id if fastest else None,
+            )
+
         # get player data
         low_activity_info = await crud_activities.get_activities(
             db=db or self.db,
@@ -93,41 +168,6 @@ class DestinyActivities:
 
         return result
 
-    async def update_missing_pgcr(self):
-        """Insert the missing pgcr"""
-
-        async with update_missing_pgcr_lock:
-            if not (missing := await crud_activities_fail_to_get.get_all(db=self.db)):
-                return
-
-            # get the destiny clan members for descend
-            async with acquire_db_session() as session:
-                clan = DestinyClan(db=session, guild_id=-1)
-                descend_clan_members = await clan.get_descend_clan_members()
-
-            for activity in missing:
-                # check if info is already in DB, delete and skip if so
-                result = await crud_activities.get(db=self.db, instance_id=activity.instance_id)
-                if result:
-                    await crud_activities_fail_to_get.delete(db=self.db, obj=activity)
-                    continue
-
-                # get PGCR
-                try:
-                    pgcr = await get_bungio_client().api.get_post_game_carnage_report(activity_id=activity.instance_id)
-                except BungIOException:
-                    # only continue if we get a response this time
-                    continue
-
-                # add info to DB
-                await crud_activities.insert(
-                    data=[(activity.instance_id, activity.period, pgcr)], descend_clan_members=descend_clan_members
-                )
-
-                # delete from to-do DB
-                await crud_activities_fail_to_get.delete(db=self.db, obj=activity)
-                cache.saved_pgcrs.add(activity.instance_id)
-
     async def get_last_played(
         self,
         mode: int = 0,
@@ -192,48 +232,94 @@ class DestinyActivities:
         return data
 
     async def update_activity_db(self, entry_time: Optional[datetime.datetime] = None):
-        """Gets this user's not-saved history and saves it in the db"""
-
-        async def handle(
-            results: list[tuple[int, datetime.datetime, DestinyPostGameCarnageReportData]], i: int, t: datetime.datetime
-        ):
-            """Get pgcr"""
-
-            try:
-                async with pgcr_getter_semaphore:
-                    # make get pgcrs at a lower rate to free space for other requests
-                    # prevents complete blockage
-                    await bungio_client.api.activity_updater_ratelimiter.wait_for_token()
-
-                    pgcr = await bungio_client.api.get_post_game_carnage_report(i)
-                    results.append((i, t, pgcr))
-
-            except Exception as e:
-                # stop everything if bungie is ded
-                if isinstance(e, BungieDead):
-                    raise e
-
-                # log that
-                logger_exceptions.exception(f"Failed getting PGCR `{i}`", exc_info=e)
-
-                # remove the instance_id from the cache
-                cache.saved_pgcrs.remove(i)
-
-                # looks like it failed, lets try again later
-                async with acquire_db_session() as db:
-                    await crud_activities_fail_to_get.insert(db=db, instance_id=i, period=t)
+        """
+        Gets this user's not-saved history and saves it in the db
+
+        This is a pipeline with back-pressure, so memory usage stays flat no matter how long the history is:
+        history pager -> bounded instance queue -> pgcr fetch workers -> bounded pgcr queue -> batched db writer
+        """
+
+        async def queue_new_instances(page: dict[int, datetime.datetime]):
+            """Queue the instances of the history page which are not saved yet"""
+
+            # check the cache first, and claim the new instances to prevent other users with the same instance from queueing them too
+            # this does not await in between, so it does not need a lock. They will get removed again if something fails
+            new_instances = [instance_id for instance_id in page if instance_id not in cache.saved_pgcrs]
+            for instance_id in new_instances:
+                cache.saved_pgcrs.add(instance_id)
+            if not new_instances:
+                return
 
-        async def input_data(gather_instances: dict[int, datetime.datetime]):
-            """Gather all pgcr and insert them"""
+            # check if the cache is maybe just wrong (it is still loading on startup for example)
+            saved = await crud_activities.get_saved_instance_ids(db=self.db, instance_ids=new_instances)
 
-            # get the data with anyio tasks
-            results: list[tuple[int, datetime.datetime, DestinyPostGameCarnageReportData]] = []
-            async with create_task_group() as tg:
-                for i, t in gather_instances.items():
-                    tg.start_soon(lambda: handle(results=results, i=i, t=t))
+            for instance_id in new_instances:
+                if instance_id not in saved:
+                    # add to the queue. This waits if the fetchers are falling behind
+                    await instance_send_stream.send((instance_id, page[instance_id]))
 
-            # insert information to DB
-            await crud_activities.insert(data=results, descend_clan_members=descend_clan_members)
+        async def fetch_pgcrs(
+            instance_receive_stream: MemoryObjectReceiveStream[tuple[int, datetime.datetime]],
+            pgcr_send_stream: MemoryObjectSendStream[tuple[int, datetime.datetime, DestinyPostGameCarnageReportData]],
+        ):
+            """Get the pgcrs of the queued instances and pass them to the writer"""
+
+            async with instance_receive_stream, pgcr_send_stream:
+                async for i, t in instance_receive_stream:
+                    try:
+                        async with pgcr_getter_semaphore:
+                            pgcr = await bungio_client.api.get_post_game_carnage_report(i)
+
+                    except Exception as e:
+                        # stop everything if bungie is ded
+                        if isinstance(e, BungieDead):
+                            raise e
+
+                        # log that
+                        logger_exceptions.exception(f"Failed getting PGCR `{i}`", exc_info=e)
+
+                        # remove the instance_id from the cache
+                        cache.saved_pgcrs.remove(i)
+
+                        # looks like it failed, lets try again later
+                        async with acquire_db_session() as db:
+                            await crud_activities_fail_to_get.insert(
+                                db=db, instance_id=i, period=t, error=f"{type(e).__name__}: {e}"
+                            )
+                        continue
+
+                    # this waits if the writer is falling behind
+                    await pgcr_send_stream.send((i, t, pgcr))
+
+        async def write_pgcrs(
+            pgcr_receive_stream: MemoryObjectReceiveStream[
+                tuple[int, datetime.datetime, DestinyPostGameCarnageReportData]
+            ],
+        ):
+            """Insert the pgcrs in batches"""
+
+            batch: list[tuple[int, datetime.datetime, DestinyPostGameCarnageReportData]] = []
+            last_write = time.monotonic()
+
+            async with pgcr_receive_stream:
+                while True:
+                    # only wait until the batch is due, so it also gets written when the fetching stalls
+                    with move_on_after(max(pgcr_write_interval - (time.monotonic() - last_write), 0)):
+                        try:
+                            batch.append(await pgcr_receive_stream.receive())
+                        except EndOfStream:
+                            break
+
+                    # flush when the batch is full, or when it has been waiting for a while, so the first rows land fast
+                    if len(batch) >= pgcr_write_batch_size or time.monotonic() - last_write >= pgcr_write_interval:
+                        if batch:
+                            await crud_activities.insert(data=batch, descend_clan_members=descend_clan_members)
+                            batch = []
+                        last_write = time.monotonic()
+
+            # insert the rest
+            if batch:
+                await crud_activities.insert(data=batch, descend_clan_members=descend_clan_members)
 
         # get the logger
         logger = logging.getLogger("updateActivityDb")
@@ -246,17 +332,17 @@ class DestinyActivities:
             clan = DestinyClan(db=session, guild_id=-1)
             descend_clan_members = await clan.get_descend_clan_members()
 
-        try:
-            async with input_data_lock:
-                # ignore this if the same user is currently running
-                if self.destiny_id in cache.updater_running_updates:
-                    logger.info(f"Skipping duplicate activity DB update for destinyID `{self.destiny_id}`")
-                    return
-                else:
-                    cache.updater_running_updates.add(self.destiny_id)
+        # ignore this if the same user is currently running
+        if self.destiny_id in cache.updater_running_updates:
+            logger.info(f"Skipping duplicate activity DB update for destinyID `{self.destiny_id}`")
+            return
+        else:
+            cache.updater_running_updates.add(self.destiny_id)
 
+        try:
             # save the start time, so we can update the user afterwards
             start_time = None
+            checked_at = get_now_with_tz()
 
             # get the entry time
             if not entry_time:
@@ -270,44 +356,37 @@ class DestinyActivities:
             except InvalidAuthentication:
                 pass
 
+            # the queues between the steps. Their size limits how much is held in memory at once
+            instance_send_stream, instance_receive_stream = create_memory_object_stream(
+                max_buffer_size=pgcr_fetch_queue_size
+            )
+            pgcr_send_stream, pgcr_receive_stream = create_memory_object_stream(max_buffer_size=pgcr_write_batch_size)
+
             # loop through all activities
             try:
-                async for activity in self.user.bungio_user.yield_activity_history(
-                    mode=DestinyActivityModeType.NONE, earliest_allowed_datetime=entry_time, auth=self.user.auth
-                ):
-                    instance_id = activity.activity_details.instance_id
-
-                    # save the youngest start time
-                    if (not start_time) or (activity.period > start_time):
-                        start_time = activity.period
-
-                    # needs to be same for anyio tasks
-                    async with input_data_lock:
-                        # check if info is already in DB, skip if so. query the cache first
-                        if instance_id in cache.saved_pgcrs:
-                            continue
-
-                        # add the instance_id to the cache to prevent other users with the same instance to double-check this
-                        # will get removed again if something fails
-                        cache.saved_pgcrs.add(instance_id)
-
-                        # check if the cache is maybe just wrong
-                        if await crud_activities.get(db=self.db, instance_id=instance_id) is not None:
-                            continue
-
-                        # add to task list
-                        cache.updater_instances.update({instance_id: activity.period})
-
-                # insert the missing activities
-                async with input_data_lock:
-                    if cache.updater_instances:
-                        to_get_instances = cache.updater_instances
-                        cache.updater_instances = {}
-                    else:
-                        to_get_instances = {}
-
-                # get and input the data
-                await input_data(to_get_instances)
+                async with create_task_group() as tg:
+                    # start the consumers
+                    async with instance_receive_stream, pgcr_send_stream:
+                        for _ in range(pgcr_fetch_workers):
+                            tg.start_soon(fetch_pgcrs, instance_receive_stream.clone(), pgcr_send_stream.clone())
+                    tg.start_soon(write_pgcrs, pgcr_receive_stream)
+
+                    # produce the instances. Closing the stream afterwards lets the consumers finish
+                    async with instance_send_stream:
+                        page: dict[int, datetime.datetime] = {}
+                        async for activity in self.user.bungio_user.yield_activity_history(
+                            mode=DestinyActivityModeType.NONE, earliest_allowed_datetime=entry_time, auth=self.user.auth
+                        ):
+                            # save the youngest start time
+                            if (not start_time) or (activity.period > start_time):
+                                start_time = activity.period
+
+                            page.update({activity.activity_details.instance_id: activity.period})
+                            if len(page) >= history_page_size:
+                                await queue_new_instances(page)
+                                page = {}
+
+                        await queue_new_instances(page)
 
             except BungIOException as e:
                 # catch when bungie is down and ignore it
@@ -318,6 +397,7 @@ class DestinyActivities:
             # update them with the newest entry timestamp
             if start_time:
                 await discord_users.update(db=self.db, to_update=self.user, activities_last_updated=start_time)
+            cache.activities_checked[self.destiny_id] = checked_at
 
             logger.info(f"Done with activity DB update for destinyID `{self.destiny_id}`")
 
@@ -325,7 +405,35 @@ class DestinyActivities:
             # log that
             logger_exceptions.exception(f"Activity DB update for destinyID `{self.destiny_id}`", exc_info=error)
 
-        cache.updater_running_updates.remove(self.destiny_id)
+        finally:
+            cache.updater_running_updates.remove(self.destiny_id)
+
+    async def ensure_fresh(
+        self,
+        max_age: datetime.timedelta = activity_freshness_budget,
+        wait_seconds: float = activity_freshness_deadline,
+    ) -> datetime.datetime:
+        """
+        Start an update in the background if the saved activities are older than `max_age`, and wait up to `wait_seconds` for it
+        Returns the time up to which the saved activities are complete
+        """
+
+        checked_at = cache.activities_checked.get(self.destiny_id)
+        if not checked_at or get_now_with_tz() - checked_at > max_age:
+            # only one update per user
+            if not (task := activity_update_tasks.get(self.destiny_id)):
+                task = asyncio.create_task(update_activities_in_background(user=self.user))
+                activity_update_tasks[self.destiny_id] = task
+                task.add_done_callback(lambda _: activity_update_tasks.pop(self.destiny_id, None))
+
+            # shield it, the update should keep running if we stop waiting
+            if wait_seconds:
+                try:
+                    await asyncio.wait_for(asyncio.shield(task), timeout=wait_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+        return cache.activities_checked.get(self.destiny_id, self.user.activities_last_updated)
 
     async def get_solos(self) -> DestinyLowMansByCategoryModel:
         """Return the destiny solos"""
@@ -385,6 +493,14 @@ class DestinyActivities:
     ) -> DestinyActivityOutputModel:
         """Return the user's stats for the activity"""
 
+        # use the rollup if possible, it does not know about modes, characters or time
+        if not (mode or character_class or character_ids or start_time or end_time):
+            stats = await crud_activities_users_stats.get(
+                db=self.db, destiny_id=self.destiny_id, activity_hashes=activity_ids
+            )
+
+            return get_activity_stats_from_rollup(stats)
+
         allow_time_period = None
         if start_time or end_time:
             allow_time_period = [
@@ -421,11 +537,163 @@ class DestinyActivities:
         return result
 
 
+async def retry_missing_pgcrs():
+    """
+    Work through the missing pgcrs which are due
+    The workers lock the rows they claimed with `SKIP LOCKED`, so this can run in multiple processes at once
+    """
+
+    # get the logger
+    logger_exceptions = logging.getLogger("updateActivityDbExceptions")
+
+    # get the destiny clan members for descend
+    async with acquire_db_session() as db:
+        clan = DestinyClan(db=db, guild_id=-1)
+        descend_clan_members = await clan.get_descend_clan_members()
+
+    bungio_client = get_bungio_client()
+
+    async def work():
+        """Claim and retry rows until none are due anymore"""
+
+        while True:
+            # the rows stay locked until this session is done
+            async with acquire_db_session() as db:
+                if not (missing := await crud_activities_fail_to_get.claim(db=db, limit=missing_pgcr_batch_size)):
+                    return
+
+                # they might have been saved by an activity update in the meantime
+                saved = await crud_activities.get_saved_instance_ids(
+                    db=db, instance_ids=[activity.instance_id for activity in missing]
+                )
+
+                data = []
+                to_insert = []
+                for activity in missing:
+                    if activity.instance_id in saved:
+                        continue
+
+                    # a single broken row should not stop the others, so every error only pushes that row back
+                    try:
+                        pgcr = await bungio_client.api.get_post_game_carnage_report(activity_id=activity.instance_id)
+                    except Exception as error:
+                        await crud_activities_fail_to_get.retry_later(
+                            db=db, obj=activity, error=f"{type(error).__name__}: {error}"
+                        )
+                        continue
+
+                    data.append((activity.instance_id, activity.period, pgcr))
+                    to_insert.append(activity)
+
+                if data:
+                    try:
+                        await crud_activities.insert(data=data, descend_clan_members=descend_clan_members)
+                    except Exception as error:
+                        logger_exceptions.error(
+                            f"Could not insert the missing pgcrs `{[activity.instance_id for activity in to_insert]}`",
+                            exc_info=error,
+                        )
+                        for activity in to_insert:
+                            await crud_activities_fail_to_get.retry_later(
+                                db=db, obj=activity, error=f"{type(error).__name__}: {error}"
+                            )
+                        data = []
+
+                    for instance_id, _, _ in data:
+                        cache.saved_pgcrs.add(instance_id)
+
+                done = saved | {instance_id for instance_id, _, _ in data}
+                if done:
+                    await crud_activities_fail_to_get.delete(db=db, instance_ids=list(done))
+
+    # this is old data, everything else is more important
+    with use_request_priority(RequestPriority.BACKFILL):
+        async with create_task_group() as tg:
+            for _ in range(missing_pgcr_workers):
+                tg.start_soon(work)
+
+
+async def replay_pgcr_archive(
+    handle: Callable[[list[tuple[dict, list[tuple[dict, list[dict]]]]]], Awaitable[None]],
+    after_instance_id: int = 0,
+):
+    """
+    Run the archived pgcrs through `CRUDActivities._convert_to_values()` again and give the batches to `handle`
+    This way new stats can be backfilled without requesting all the pgcrs from bungie again
+    Nothing calls this by itself, the backfill for a new stat brings its own `handle` which saves its new columns
+
+    Reading the next batches from the db overlaps with the conversion, and the decompression runs in worker threads (zstd releases the GIL)
+    """
+
+    # get the logger
+    logger = logging.getLogger("updateActivityDb")
+
+    bungio_client = get_bungio_client()
+    send_stream, receive_stream = create_memory_object_stream(max_buffer_size=archive_replay_read_ahead)
+
+    async def read(send: MemoryObjectSendStream):
+        """Get the archived pgcrs page by page and decompress them"""
+
+        nonlocal after_instance_id
+
+        async with send:
+            while True:
+                async with acquire_db_session() as db:
+                    rows = await crud_activities_archive.get_batch(
+                        db=db, after_instance_id=after_instance_id, limit=archive_replay_batch_size
+                    )
+                if not rows:
+                    return
+                after_instance_id = rows[-1][0]
+
+                def decompress() -> list[dict]:
+                    raws = crud_activities_archive.compressor.decompress(
+                        [(dictionary_id, data) for _, _, dictionary_id, data in rows]
+                    )
+                    return [orjson.loads(raw) for raw in raws]
+
+                pgcrs = await to_thread.run_sync(decompress)
+                await send.send([(instance_id, period, pgcr) for (instance_id, period, _, _), pgcr in zip(rows, pgcrs)])
+
+    async def convert(receive: MemoryObjectReceiveStream):
+        """Rebuild the pgcrs and convert them"""
+
+        count = 0
+        async with receive:
+            async for batch in receive:
+                data = [
+                    (
+                        instance_id,
+                        period,
+                        await DestinyPostGameCarnageReportData.from_dict(
+                            data=pgcr, client=bungio_client, recursive=True
+                        ),
+                    )
+                    for instance_id, period, pgcr in batch
+                ]
+                values = await to_thread.run_sync(
+                    lambda: [
+                        crud_activities._convert_to_values(instance_id=instance_id, activity_time=period, pgcr=pgcr)
+                        for instance_id, period, pgcr in data
+                    ]
+                )
+                await handle(values)
+
+                count += len(values)
+                logger.info(f"Replayed `{count}` archived pgcrs, up to instance `{batch[-1][0]}`")
+
+    async with create_task_group() as tg:
+        tg.start_soon(read, send_stream)
+        tg.start_soon(convert, receive_stream)
+
+
 async def update_activities_in_background(user: DiscordUsers):
     """Gets called when a user first registers and updates their activities in the background"""
-    async with acquire_db_session() as db:
-        activities = DestinyActivities(db=db, user=user)
-        await activities.update_activity_db()
+
+    with use_request_priority(RequestPriority.INGEST):
+        async with acquire_db_session() as db:
+            activities = DestinyActivities(db=db, user=user)
+            await activities.update_activity_db()
 
 
 def get_lowman_count_subprocess(
@@ -448,6 +716,35 @@ def get_lowman_count_subprocess(
     return count, flawless_count, not_flawless_count, fastest, fastest_instance_id
 
 
+def get_activity_stats_from_rollup(stats: list[ActivitiesUsersStats]) -> DestinyActivityOutputModel:
+    """Sum up the rollup rows"""
+
+    full_stats = [entry for entry in stats if not entry.is_checkpoint]
+    full_completions = sum(entry.completed_instances for entry in full_stats)
+    fastest = min(
+        (entry for entry in full_stats if entry.fastest_completed_instance_seconds is not None),
+        key=lambda entry: entry.fastest_completed_instance_seconds,
+        default=None,
+    )
+
+    return DestinyActivityOutputModel(
+        full_completions=full_completions,
+        cp_completions=sum(entry.completed_instances for entry in stats if entry.is_checkpoint),
+        kills=sum(entry.kills for entry in stats),
+        precision_kills=sum(entry.precision_kills for entry in stats),
+        deaths=sum(entry.deaths for entry in stats),
+        assists=sum(entry.assists for entry in stats),
+        time_spend=datetime.timedelta(seconds=sum(entry.time_played_seconds for entry in stats)),
+        fastest=datetime.timedelta(seconds=fastest.fastest_completed_instance_seconds) if fastest else None,
+        fastest_instance_id=fastest.fastest_completed_instance_id if fastest else None,
+        average=datetime.timedelta(
+            seconds=sum(entry.completed_instances_duration_seconds for entry in full_stats) / full_completions
+        )
+        if full_completions
+        else None,
+    )
+
+
 def get_activity_stats_subprocess(
     data_full: list[ActivitiesUsers], data_cp: list[ActivitiesUsers]
 ) -> DestinyActivityOutputModel:
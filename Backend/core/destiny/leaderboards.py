@@ -0,0 +1,139 @@
+import dataclasses
+import datetime
+from typing import Optional
+
+from bungio.models import DestinyActivityModeType
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from Backend.bungio.manifest import destiny_manifest
+from Backend.core.errors import CustomException
+from Backend.crud import crud_leaderboards, discord_users
+from Backend.database.models import DiscordUsers
+from Backend.misc.cache import cache
+from Shared.networkingSchemas.destiny import (
+    DestinyLeaderboardEntryModel,
+    DestinyLeaderboardInputModel,
+    DestinyLeaderboardModel,
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class Leaderboard:
+    sort_by: str
+    weapons: bool = False
+    ascending: bool = False
+    mode: Optional[int] = None  # use all activities with that mode instead of the input activity_ids
+
+
+# the leaderboards which can be computed from the db
+leaderboards: dict[str, Leaderboard] = {
+    "endgame_raids": Leaderboard(sort_by="full_completions", mode=DestinyActivityModeType.RAID.value),
+    "endgame_raid_time": Leaderboard(sort_by="time_played_seconds", mode=DestinyActivityModeType.RAID.value),
+    "endgame_gms": Leaderboard(sort_by="full_completions"),
+    "endgame_gm_time": Leaderboard(sort_by="time_played_seconds"),
+    "activity_full_completions": Leaderboard(sort_by="full_completions"),
+    "activity_cp_completions": Leaderboard(sort_by="cp_completions"),
+    "activity_kills": Leaderboard(sort_by="kills"),
+    "activity_precision_kills": Leaderboard(sort_by="precision_kills"),
+    "activity_percent_precision_kills": Leaderboard(sort_by="precision_percent"),
+    "activity_deaths": Leaderboard(sort_by="deaths"),
+    "activity_assists": Leaderboard(sort_by="assists"),
+    "activity_time_spend": Leaderboard(sort_by="time_played_seconds"),
+    "activity_fastest": Leaderboard(sort_by="fastest_seconds", ascending=True),
+    "activity_average": Leaderboard(sort_by="average_seconds", ascending=True),
+    "weapon_kills": Leaderboard(sort_by="kills", weapons=True),
+    "weapon_precision_kills": Leaderboard(sort_by="precision_kills", weapons=True),
+    "weapon_precision_kills_percent": Leaderboard(sort_by="precision_percent", weapons=True),
+}
+
+
+@dataclasses.dataclass
+class DestinyLeaderboards:
+    """Leaderboards over many users"""
+
+    db: AsyncSession
+    guild_id: int
+
+    async def get(self, leaderboard_name: str, input_model: DestinyLeaderboardInputModel) -> DestinyLeaderboardModel:
+        """Rank the given users. Users which are not registered get skipped"""
+
+        if not (leaderboard := leaderboards.get(leaderboard_name)):
+            raise CustomException("LeaderboardNotFound")
+
+        # get the users
+        users: dict[int, DiscordUsers] = {}
+        for discord_id in set(input_model.discord_ids):
+            try:
+                user = await discord_users.get_profile_from_discord_id(discord_id, db=self.db)
+            except CustomException:
+                continue
+            users[user.destiny_id] = user
+
+        # check if that was calculated already
+        # the activities of the users are kept fresh by the activities updater, which invalidates this on new activities
+        # updating them here would start an update for every member of a big guild at once
+        cache_key = (
+            self.guild_id,
+            leaderboard_name,
+            tuple(sorted(user.discord_id for user in users.values())),
+            tuple(sorted(input_model.activity_ids or [])),
+            tuple(sorted(input_model.weapon_ids or [])),
+        )
+        if cached := cache.leaderboards.get(cache_key):
+            return cached[1]
+
+        result = DestinyLeaderboardModel(name=leaderboard_name, sort_by_ascending=leaderboard.ascending)
+        if users:
+            if leaderboard.weapons:
+                if not input_model.weapon_ids:
+                    raise CustomException("LeaderboardNotFound")
+
+                rows = await crud_leaderboards.get_weapons(
+                    db=self.db,
+                    destiny_ids=list(users),
+                    weapon_ids=input_model.weapon_ids,
+                    sort_by=leaderboard.sort_by,
+                    ascending=leaderboard.ascending,
+                )
+            else:
+                if leaderboard.mode:
+                    activity_ids = [
+                        activity_id
+                        for activity_id, activity in (await destiny_manifest.get_all_activities()).items()
+                        if leaderboard.mode in activity.modes
+                    ]
+                elif input_model.activity_ids:
+                    activity_ids = input_model.activity_ids
+                else:
+                    raise CustomException("LeaderboardNotFound")
+
+                rows = await crud_leaderboards.get_activities(
+                    db=self.db,
+                    destiny_ids=list(users),
+                    activity_hashes=activity_ids,
+                    sort_by=leaderboard.sort_by,
+                    ascending=leaderboard.ascending,
+                )
+
+            for row in rows:
+                entry = DestinyLeaderboardEntryModel(
+                    discord_id=users[row.destiny_id].discord_id,
+                    rank=row.rank,
+                    value=float(row.value) if row.value is not None else None,
+                    kills=row.kills,
+                    precision_kills=row.precision_kills,
+                )
+                if not leaderboard.weapons:
+                    entry.full_completions = row.full_completions
+                    entry.cp_completions = row.cp_completions
+                    entry.deaths = row.deaths
+                    entry.assists = row.assists
+                    entry.time_spend = datetime.timedelta(seconds=row.time_played_seconds)
+                    if row.fastest_seconds is not None:
+                        entry.fastest = datetime.timedelta(seconds=row.fastest_seconds)
+                    if row.average_seconds is not None:
+                        entry.average = datetime.timedelta(seconds=float(row.average_seconds))
+                result.entries.append(entry)
+
+        cache.leaderboards[cache_key] = (frozenset(users), result)
+        return result
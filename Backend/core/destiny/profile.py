@@ -2,8 +2,9 @@ import asyncio
 import copy
 import dataclasses
 import datetime
+import weakref
 from contextlib import AsyncExitStack
-from typing import Literal, Optional
+from typing import Iterable, Literal, Optional
 
 from anyio import to_thread
 from bungio.models import (
@@ -12,6 +13,7 @@ from bungio.models import (
     DestinyClass,
     DestinyCollectibleComponent,
     DestinyCollectibleState,
+    DestinyComponentType,
     DestinyCraftableComponent,
     DestinyHistoricalStatsAccountResult,
     DestinyInsertPlugsActionRequest,
@@ -31,15 +33,16 @@ from bungio.models import (
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from Backend.bungio.client import get_bungio_client
+from Backend.bungio.client import get_bungio_client, use_fresh_requests
 from Backend.bungio.manifest import destiny_manifest
 from Backend.core.errors import CustomException
 from Backend.crud import crud_activities, discord_users
 from Backend.crud.destiny.collectibles import collectibles
 from Backend.crud.destiny.records import records
 from Backend.database import acquire_db_session
-from Backend.database.models import Collectibles, DiscordUsers, Records
+from Backend.database.models import DiscordUsers
 from Backend.misc.cache import cache
+from Backend.misc.hashBitset import HashBitset
 from Shared.enums.destiny import DestinyInventoryBucketEnum, DestinyPresentationNodeWeaponSlotEnum
 from Shared.functions.formatting import make_progress_bar_text
 from Shared.functions.helperFunctions import get_now_with_tz
@@ -59,11 +62,44 @@ from Shared.networkingSchemas.destiny import (
 )
 from Shared.networkingSchemas.destiny.clan import DestinyClanModel
 
-has_triumph_lock = asyncio.Lock()
-has_collectible_lock = asyncio.Lock()
+# one lock per user - Key: destiny_id
+has_triumph_locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+has_collectible_locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
 get_season_pass_level_lock = asyncio.Lock()
 get_seasonal_challenges_lock = asyncio.Lock()
 
+# the profile components the inventory helpers need
+inventory_bucket_components = (
+    DestinyComponentType.PROFILE_INVENTORIES,
+    DestinyComponentType.CHARACTER_INVENTORIES,
+    DestinyComponentType.ITEM_INSTANCES,
+)
+all_inventory_bucket_components = (
+    DestinyComponentType.PROFILE_INVENTORIES,
+    DestinyComponentType.CHARACTERS,
+    DestinyComponentType.CHARACTER_INVENTORIES,
+    DestinyComponentType.CHARACTER_EQUIPMENT,
+    DestinyComponentType.ITEM_INSTANCES,
+)
+# includes the sockets, so the transmog can use the same response
+character_items_components = (
+    DestinyComponentType.PROFILE_INVENTORIES,
+    DestinyComponentType.CHARACTERS,
+    DestinyComponentType.CHARACTER_INVENTORIES,
+    DestinyComponentType.CHARACTER_EQUIPMENT,
+    DestinyComponentType.ITEM_SOCKETS,
+)
+
+
+def get_user_lock(locks: weakref.WeakValueDictionary[int, asyncio.Lock], destiny_id: int) -> asyncio.Lock:
+    """Get the lock of the user. It gets dropped again once nobody uses it anymore"""
+
+    lock = locks.get(destiny_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        locks[destiny_id] = lock
+    return lock
+
 
 @dataclasses.dataclass
 class DestinyProfile:
@@ -78,7 +114,6 @@ class DestinyProfile:
     _collectibles: dict[int, DestinyCollectibleComponent] = dataclasses.field(
         init=False, default_factory=dict, repr=False
     )
-    _profile: DestinyProfileResponse = dataclasses.field(init=False, default=None, repr=False)
     _inventory_bucket: dict[
         DestinyInventoryBucketEnum,
         dict[int, dict[Literal["item", "power_level", "quantity"], DestinyItemComponent | int]],
@@ -115,8 +150,9 @@ class DestinyProfile:
 
         # get all the items and instances
         items = await self.get_character_items(character_id)
-        sockets = self._profile.item_components.sockets.data
-        character = self._profile.characters.data[character_id]
+        profile = await self.__get_profile(*character_items_components)
+        sockets = profile.item_components.sockets.data
+        character = profile.characters.data[character_id]
 
         # get all the correct sockets
         all_sockets = await destiny_manifest.get_all_sockets()
@@ -193,6 +229,9 @@ class DestinyProfile:
                         data.plug.socket_index = transmog_index
                         await bungio_client.api.insert_socket_plug_free(data=data, auth=auth_data)
 
+        # the saved sockets are outdated now
+        cache.profiles.invalidate(destiny_id=self.destiny_id)
+
     async def get_clan(self) -> DestinyClanModel:
         """Return the user's clan"""
 
@@ -210,6 +249,12 @@ class DestinyProfile:
         # get the seals
         seals = await destiny_manifest.get_seals()
 
+        # check all the triumphs at once
+        gotten = await self.has_triumphs(
+            triumph_hashes=[triumph.hash for triumphs in seals.values() for triumph in triumphs]
+            + [seal.completion_record_hash for seal in seals if seal.completion_record_hash]
+        )
+
         # loop through the seals and format the data
         result = DestinySealsModel()
         for seal, triumphs in seals.items():
@@ -219,22 +264,22 @@ class DestinyProfile:
             user_completed = []
             user_completed_int = 0
             for triumph in triumphs:
-                user_data = await self.has_triumph(triumph.hash)
+                completed = gotten[triumph.hash]
                 model = DestinyRecordModel(
                     name=triumph.display_properties.name,
                     description=triumph.display_properties.description,
-                    completed=user_data.bool,
+                    completed=completed,
                 )
 
                 # handle guilded triumphs differently
                 if triumph.for_title_gilding:
                     user_guilded_completed.append(model)
-                    if user_data.bool:
+                    if completed:
                         user_guilded_completed_int += 1
 
                 else:
                     user_completed.append(model)
-                    if user_data.bool:
+                    if completed:
                         user_completed_int += 1
 
             # normal triumph data
@@ -243,7 +288,7 @@ class DestinyProfile:
             # check if the seals maybe requires not all triumphs
             completion_triumph_id = seal.completion_record_hash
             if completion_triumph_id:
-                if await self.has_triumph(completion_triumph_id):
+                if gotten[completion_triumph_id]:
                     completion_percentage = 1
 
             data = DestinySealModel(
@@ -286,12 +331,13 @@ class DestinyProfile:
 
         catalysts = await destiny_manifest.get_catalysts()
         triumphs = await self.get_triumphs()
+        gotten = await self.has_triumphs(triumph_hashes=[catalyst.hash for catalyst in catalysts])
 
         # check their completion
         result = DestinyCatalystsModel()
         for catalyst in catalysts:
             # get the completion rate
-            if await self.has_triumph(catalyst.hash):
+            if gotten[catalyst.hash]:
                 completion_percentage = 1
             else:
                 user_data = triumphs[catalyst.hash]
@@ -349,7 +395,7 @@ class DestinyProfile:
     ) -> int:
         """Returns the amount of a consumable this user has"""
 
-        result = await self.__get_profile()
+        result = await self.__get_profile(DestinyComponentType.CURRENCY_LOOKUPS)
         items = list(result.character_currency_lookups.data.values())[0].item_quantities
         try:
             value = items[consumable_id]
@@ -405,140 +451,121 @@ class DestinyProfile:
 
         triumph_hash = int(triumph_hash)
 
-        # check cache
-        async with has_triumph_lock:
-            if self.destiny_id not in cache.triumphs:
-                cache.triumphs.update({self.destiny_id: set()})
-
-            if triumph_hash not in cache.triumphs[self.destiny_id]:
-                # check if the last update is older than 10 minutes
-                if not send_details and (
-                    self.user.triumphs_last_updated + datetime.timedelta(minutes=10) > get_now_with_tz()
-                ):
-                    return BoolModelRecord(bool=False)
-
-                async with AsyncExitStack() as async_onexit_calls:
-                    if fresh_db:
-                        db = await async_onexit_calls.enter_async_context(acquire_db_session())
-                    else:
-                        db = self.db
-
-                    # sync the cache with the db
-                    results = await records.gotten_records(db=db, destiny_id=self.destiny_id)
-                    if results and len(results) != len(cache.triumphs[self.destiny_id]):
-                        # only caching already got records
-                        for record in results:
-                            cache.triumphs[self.destiny_id].add(record.record_id)
-                        if triumph_hash in cache.triumphs[self.destiny_id]:
-                            return BoolModelRecord(bool=True)
-
-                    # alright, the user doesn't have the triumph, at least not in the db. So let's update the db entries
-                    triumphs_data = await self.get_triumphs()
-                    to_insert = []
-                    sought_triumph = {}
-
-                    # loop through all triumphs and add them / update them in the db
-                    for triumph_id, triumph_info in triumphs_data.items():
-                        try:
-                            triumph_id = int(triumph_id)
-                        except ValueError:
-                            # this is the "active_score", ... fields
-                            continue
-
-                        if triumph_id in cache.triumphs[self.destiny_id]:
-                            continue
+        gotten = await self.has_triumphs(triumph_hashes=[triumph_hash], force=send_details, fresh_db=fresh_db)
+        if gotten[triumph_hash]:
+            return BoolModelRecord(bool=True)
 
-                        # calculate if the triumph is gotten and save the triumph we are looking for
-                        status = True
-                        if not triumph_info.objectives:
-                            status &= DestinyRecordState.OBJECTIVE_NOT_COMPLETED not in triumph_info.state
+        # if not, return the data with the objectives info
+        result = BoolModelRecord(bool=False)
+        if send_details:
+            triumphs_data = await self.get_triumphs()
+            sought_triumph = triumphs_data.get(triumph_hash)
+            if sought_triumph and sought_triumph.objectives:
+                for part in sought_triumph.objectives:
+                    result.objectives.append(BoolModelObjective(objective_id=part.objective_hash, bool=part.complete))
+        return result
 
-                        else:
-                            for part in triumph_info.objectives:
-                                status &= part.complete
+    async def has_triumphs(
+        self, triumph_hashes: Iterable[str | int], force: bool = False, fresh_db: bool = False
+    ) -> dict[int, bool]:
+        """Returns which of the triumphs are gotten. The profile gets checked at most once for all of them"""
 
-                        # is this the triumph we are looking for?
-                        if triumph_id == triumph_hash:
-                            sought_triumph = triumph_info
+        triumph_hashes = {int(triumph_hash) for triumph_hash in triumph_hashes}
 
-                        # don't really need to insert not-gained triumphs
-                        if status:
-                            cache.triumphs[self.destiny_id].add(triumph_id)
-                            to_insert.append(Records(destiny_id=self.destiny_id, record_id=triumph_id))
+        async with get_user_lock(has_triumph_locks, self.destiny_id):
+            new_bits = 0
+            async with AsyncExitStack() as async_onexit_calls:
+                if fresh_db:
+                    db = await async_onexit_calls.enter_async_context(acquire_db_session())
+                else:
+                    db = self.db
+
+                # load the snapshot of the gotten triumphs from the db
+                if self.destiny_id not in cache.triumphs:
+                    cache.triumphs[self.destiny_id] = HashBitset(
+                        index=cache.triumph_index,
+                        hashes=await records.gotten_records(db=db, destiny_id=self.destiny_id),
+                    )
+                snapshot = cache.triumphs[self.destiny_id]
+
+                # only update when something is missing and the last update is older than 10 minutes
+                if any(triumph_hash not in snapshot for triumph_hash in triumph_hashes) and (
+                    force or self.user.triumphs_last_updated + datetime.timedelta(minutes=10) <= get_now_with_tz()
+                ):
+                    triumphs_data = await self.get_triumphs()
+                    gotten = await to_thread.run_sync(lambda: get_gotten_triumphs_subprocess(triumphs=triumphs_data))
 
-                    # mass insert the missing entries
-                    if to_insert:
-                        await records.insert_records(db=db, objs=to_insert)
+                    # diff with the snapshot and only insert the newly gotten ones
+                    # the snapshot only gets them once they are saved, so it never has more than the db
+                    new_bits = snapshot.diff(gotten)
+                    if to_insert := snapshot.index.to_hashes(new_bits):
+                        await records.insert_records(db=db, destiny_id=self.destiny_id, record_ids=to_insert)
 
                     # save the update time
                     await discord_users.update(db=db, to_update=self.user, triumphs_last_updated=get_now_with_tz())
 
-        # now check again if its completed
-        if triumph_hash in cache.triumphs[self.destiny_id]:
-            return BoolModelRecord(bool=True)
+            # the write is done (and committed, if the db session is our own), so the snapshot can take the new ones
+            snapshot.add_bits(new_bits)
 
-        # if not, return the data with the objectives info
-        result = BoolModelRecord(bool=False)
-        if send_details:
-            if sought_triumph.objectives:
-                for part in sought_triumph.objectives:
-                    result.objectives.append(BoolModelObjective(objective_id=part.objective_hash, bool=part.complete))
-        return result
+        return {triumph_hash: triumph_hash in snapshot for triumph_hash in triumph_hashes}
 
     async def has_collectible(self, collectible_hash: str | int, fresh_db: bool = False) -> bool:
         """Returns if the collectible is gotten"""
 
         collectible_hash = int(collectible_hash)
 
-        # check cache
-        async with has_collectible_lock:
-            if self.destiny_id not in cache.collectibles:
-                cache.collectibles.update({self.destiny_id: set()})
-
-            if collectible_hash not in cache.collectibles[self.destiny_id]:
-                # check if the last update is older than 10 minutes
-                if self.user.collectibles_last_updated + datetime.timedelta(minutes=10) > get_now_with_tz():
-                    return False
-
-                async with AsyncExitStack() as async_onexit_calls:
-                    if fresh_db:
-                        db = await async_onexit_calls.enter_async_context(acquire_db_session())
-                    else:
-                        db = self.db
-
-                    # sync the cache with the db
-                    results = await collectibles.gotten_collectibles(db=db, destiny_id=self.destiny_id)
-                    if results and len(results) != len(cache.collectibles[self.destiny_id]):
-                        # only caching already got collectibles
-                        for collectible in results:
-                            cache.collectibles[self.destiny_id].add(collectible.collectible_id)
-                        if collectible_hash in cache.collectibles[self.destiny_id]:
-                            return True
-
-                    # as with the triumphs, we need to update our local collectible data now
-                    collectibles_data = await self.get_collectibles()
-                    to_insert = []
+        gotten = await self.has_collectibles(collectible_hashes=[collectible_hash], fresh_db=fresh_db)
+        return gotten[collectible_hash]
 
-                    # loop through the collectibles
-                    for collectible_id, collectible_info in collectibles_data.items():
-                        # if its in cache, its also in the db
-                        if collectible_id in cache.collectibles[self.destiny_id]:
-                            continue
+    async def has_collectibles(
+        self, collectible_hashes: Iterable[str | int], fresh_db: bool = False
+    ) -> dict[int, bool]:
+        """Returns which of the collectibles are gotten. The profile gets checked at most once for all of them"""
 
-                        # don't really need to insert not-owned collectibles
-                        if DestinyCollectibleState.NOT_ACQUIRED not in collectible_info.state:
-                            cache.collectibles[self.destiny_id].add(collectible_id)
-                            to_insert.append(Collectibles(destiny_id=self.destiny_id, collectible_id=collectible_id))
+        collectible_hashes = {int(collectible_hash) for collectible_hash in collectible_hashes}
 
-                    # mass insert the missing entries
-                    if to_insert:
-                        await collectibles.insert_collectibles(db=db, objs=to_insert)
+        async with get_user_lock(has_collectible_locks, self.destiny_id):
+            new_bits = 0
+            async with AsyncExitStack() as async_onexit_calls:
+                if fresh_db:
+                    db = await async_onexit_calls.enter_async_context(acquire_db_session())
+                else:
+                    db = self.db
+
+                # load the snapshot of the gotten collectibles from the db
+                if self.destiny_id not in cache.collectibles:
+                    cache.collectibles[self.destiny_id] = HashBitset(
+                        index=cache.collectible_index,
+                        hashes=await collectibles.gotten_collectibles(db=db, destiny_id=self.destiny_id),
+                    )
+                snapshot = cache.collectibles[self.destiny_id]
+
+                # only update when something is missing and the last update is older than 10 minutes
+                if any(collectible_hash not in snapshot for collectible_hash in collectible_hashes) and (
+                    self.user.collectibles_last_updated + datetime.timedelta(minutes=10) <= get_now_with_tz()
+                ):
+                    collectibles_data = await self.get_collectibles()
+                    gotten = [
+                        collectible_id
+                        for collectible_id, collectible_info in collectibles_data.items()
+                        if DestinyCollectibleState.NOT_ACQUIRED not in collectible_info.state
+                    ]
+
+                    # diff with the snapshot and only insert the newly gotten ones
+                    # the snapshot only gets them once they are saved, so it never has more than the db
+                    new_bits = snapshot.diff(gotten)
+                    if to_insert := snapshot.index.to_hashes(new_bits):
+                        await collectibles.insert_collectibles(
+                            db=db, destiny_id=self.destiny_id, collectible_ids=to_insert
+                        )
 
                     # save the update time
                     await discord_users.update(db=db, to_update=self.user, collectibles_last_updated=get_now_with_tz())
 
-        # now check again if its owned
-        return collectible_hash in cache.collectibles[self.destiny_id]
+            # the write is done (and committed, if the db session is our own), so the snapshot can take the new ones
+            snapshot.add_bits(new_bits)
+
+        return {collectible_hash: collectible_hash in snapshot for collectible_hash in collectible_hashes}
 
     async def get_metric_value(self, metric_hash: str | int) -> int:
         """Returns the value of the given metric hash"""
@@ -598,13 +625,13 @@ class DestinyProfile:
     async def get_artifact_level(self) -> ValueModel:
         """Returns the seasonal artifact data"""
 
-        result = await self.__get_profile()
+        result = await self.__get_profile(DestinyComponentType.PROFILE_PROGRESSION)
         return ValueModel(value=result.profile_progression.data.seasonal_artifact.power_bonus)
 
     async def get_season_pass_level(self) -> ValueModel:
         """Returns the seasonal pass level"""
 
-        result = await self.__get_profile()
+        result = await self.__get_profile(DestinyComponentType.CHARACTER_PROGRESSIONS)
         data = list(result.character_progressions.data.values())[0].progressions
 
         season_pass = await destiny_manifest.get_current_season_pass()
@@ -656,7 +683,7 @@ class DestinyProfile:
         """Get character info"""
 
         characters = DestinyCharactersModel()
-        result = await self.__get_profile()
+        result = await self.__get_profile(DestinyComponentType.CHARACTERS)
 
         # loop through each character
         for character_id, character_data in result.characters.data.items():
@@ -676,7 +703,7 @@ class DestinyProfile:
         """Populate the triumphs and then return them"""
 
         if not self._triumphs:
-            result = await self.__get_profile()
+            result = await self.__get_profile(DestinyComponentType.RECORDS)
 
             # combine profile and character ones
             self._triumphs = await to_thread.run_sync(lambda: get_triumphs_subprocess(result=result))
@@ -687,7 +714,7 @@ class DestinyProfile:
         """Populate the collectibles and then return them"""
 
         if not self._collectibles:
-            result = await self.__get_profile()
+            result = await self.__get_profile(DestinyComponentType.COLLECTIBLES)
 
             # combine profile and character ones
             self._collectibles = await to_thread.run_sync(lambda: get_collectibles_subprocess(result=result))
@@ -696,7 +723,7 @@ class DestinyProfile:
     async def get_craftables(self) -> dict[int, DestinyCraftableComponent]:
         """Populate the craftables and then return them"""
 
-        result = await self.__get_profile()
+        result = await self.__get_profile(DestinyComponentType.CRAFTABLES)
         return await to_thread.run_sync(lambda: get_craftables_subprocess(result=result))
 
     async def get_materials(self) -> DestinyAllMaterialsModel:
@@ -780,7 +807,7 @@ class DestinyProfile:
     async def get_metrics(self) -> dict[int, DestinyMetricComponent]:
         """Populate the metrics and then return them"""
 
-        metrics = await self.__get_profile()
+        metrics = await self.__get_profile(DestinyComponentType.METRICS)
         return metrics.metrics.data.metrics
 
     async def get_stats(self) -> DestinyHistoricalStatsAccountResult:
@@ -798,7 +825,7 @@ class DestinyProfile:
             Vault: 138197802
         """
 
-        result = await self.__get_profile()
+        result = await self.__get_profile(DestinyComponentType.PROFILE_INVENTORIES)
         all_items = result.profile_inventory.data.items
         items = []
         for item in all_items:
@@ -827,6 +854,26 @@ class DestinyProfile:
             character_class=character_class,
         )
 
+    async def get_time_played_by_modes(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        modes: list[int],
+        activity_ids: Optional[list[int]] = None,
+        character_class: Optional[str] = None,
+    ) -> tuple[dict[int, int], int]:
+        """Get the time played (in seconds) for all modes and the activity ids at once"""
+
+        return await crud_activities.calculate_time_played_by_modes(
+            db=self.db,
+            destiny_id=self.destiny_id,
+            modes=modes,
+            activity_ids=activity_ids,
+            start_time=start_time,
+            end_time=end_time,
+            character_class=character_class,
+        )
+
     async def get_character_items(
         self, character_id: int
     ) -> dict[
@@ -846,7 +893,7 @@ class DestinyProfile:
             "class": {"equipped": [], "inventory": []},
         }
 
-        result = await self.__get_profile(force=True)
+        result = await self.__get_profile(*character_items_components, force=True)
         character = result.characters.data[character_id]
 
         # get character equipped
@@ -933,7 +980,7 @@ class DestinyProfile:
         result = {}
         for bucket in buckets:
             if bucket not in self._inventory_bucket:
-                profile = await self.__get_profile()
+                profile = await self.__get_profile(*inventory_bucket_components)
 
                 # only get the items in the correct buckets
                 self._inventory_bucket.update(
@@ -977,12 +1024,13 @@ class DestinyProfile:
             ],
             item: DestinyItemComponent,
             char_id: int,
+            bucket_hash: Optional[int] = None,
         ):
-            """Func to add the items"""
+            """Func to add the items. `bucket_hash` overwrites the one of the item"""
 
             # only get the items in the correct buckets
             for bucket in buckets:
-                if item.bucket_hash == bucket.value:
+                if (bucket_hash or item.bucket_hash) == bucket.value:
                     if bucket not in result_dict[char_id]:
                         result_dict[char_id].update({bucket: {}})
                     result_dict[char_id][bucket].update({item.item_instance_id: {"item": item}})
@@ -999,7 +1047,7 @@ class DestinyProfile:
         if not buckets:
             buckets = DestinyInventoryBucketEnum.all()
 
-        result = await self.__get_profile()
+        result = await self.__get_profile(*all_inventory_bucket_components)
         items: dict[
             int,
             dict[
@@ -1035,7 +1083,6 @@ class DestinyProfile:
             if profile_data.bucket_hash == DestinyInventoryBucketEnum.VAULT.value and profile_data.item_instance_id:
                 # get the character class and actual bucket hash from the item id
                 definition = await destiny_manifest.get_item(item_id=profile_data.item_hash)
-                profile_data.bucket_hash = definition.inventory.bucket_type_hash
 
                 # try to catch users which deleted their warlock but still have warlock items
                 if definition.class_type in character_ids:
@@ -1043,70 +1090,49 @@ class DestinyProfile:
                     actual_character_ids = character_ids[definition.class_type]
                     for actual_character_id in actual_character_ids:
                         await to_thread.run_sync(
-                            lambda: add_info(result_dict=items, item=profile_data, char_id=actual_character_id)
+                            lambda: add_info(
+                                result_dict=items,
+                                item=profile_data,
+                                char_id=actual_character_id,
+                                bucket_hash=definition.inventory.bucket_type_hash,
+                            )
                         )
 
         return items
 
-    async def __get_profile(self, force: bool = False) -> DestinyProfileResponse:
+    async def __get_profile(self, *components: DestinyComponentType, force: bool = False) -> DestinyProfileResponse:
         """
-        Return info from the profile call
+        Return info from the profile call with these components. The profile component is always included
+        The response is shared with the other requests for this user, so it must not be modified
         https://bungie-net.github.io/multi/schema_Destiny-DestinyComponentType.html#schema_Destiny-DestinyComponentType
         """
-        if not self._profile or force:
-            # just calling nearly all of them. Don't need all quite yet, but who knows what the future will bring
-            components = [
-                100,
-                101,
-                102,
-                103,
-                104,
-                105,
-                200,
-                201,
-                202,
-                204,
-                205,
-                300,
-                301,
-                302,
-                304,
-                305,
-                306,
-                307,
-                400,
-                401,
-                402,
-                500,
-                600,
-                700,
-                800,
-                900,
-                1100,
-                1200,
-                1300,
-            ]
-
-            call = self.user.bungio_user.get_profile(components=components, auth=self.user.auth)
+
+        async def fetch(to_fetch: list[int]) -> DestinyProfileResponse:
             if force:
-                async with get_bungio_client().http.session.disabled():
-                    self._profile = await call
-            else:
-                self._profile = await call
+                with use_fresh_requests():
+                    return await self.user.bungio_user.get_profile(components=to_fetch, auth=self.user.auth)
+            return await self.user.bungio_user.get_profile(components=to_fetch, auth=self.user.auth)
+
+        profile = await cache.profiles.get(
+            destiny_id=self.destiny_id,
+            components=[DestinyComponentType.PROFILES.value, *(component.value for component in components)],
+            fetch=fetch,
+            fresh=force,
+        )
 
-            # get bungie name
-            bungie_name = self._profile.profile.data.user_info.full_bungie_name
+        # get bungie name
+        bungie_name = profile.profile.data.user_info.full_bungie_name
 
-            # update name if different
-            if bungie_name != self.user.bungie_name:
-                await discord_users.update(db=self.db, to_update=self.user, bungie_name=bungie_name)
+        # update name if different
+        if bungie_name != self.user.bungie_name:
+            await discord_users.update(db=self.db, to_update=self.user, bungie_name=bungie_name)
 
-        return self._profile
+        return profile
 
     async def __get_currency_amount(self, bucket: DestinyInventoryBucketEnum) -> int:
         """Returns the amount of the specified currency owned"""
 
-        profile = await self.__get_profile()
+        profile = await self.__get_profile(DestinyComponentType.PROFILE_CURRENCIES)
         items = profile.profile_currencies.data.items
 
         # get the item with the correct bucket
@@ -1203,8 +1229,8 @@ def get_seasonal_challenges_subprocess(
 def get_triumphs_subprocess(result: DestinyProfileResponse) -> dict[int | str, DestinyRecordComponent | int]:
     """Run in anyio subprocess on another thread since this might be slow"""
 
-    # get profile triumphs
-    triumphs = result.profile_records.data.records
+    # get profile triumphs. Copied, since the response is shared
+    triumphs = dict(result.profile_records.data.records)
     # noinspection PyTypeChecker
     triumphs.update(
         {
@@ -1226,11 +1252,32 @@ def get_triumphs_subprocess(result: DestinyProfileResponse) -> dict[int | str, D
     return triumphs
 
 
+def get_gotten_triumphs_subprocess(triumphs: dict[int | str, DestinyRecordComponent | int]) -> list[int]:
+    """Run in anyio subprocess on another thread since this might be slow"""
+
+    gotten = []
+    for triumph_id, triumph_info in triumphs.items():
+        # skip the "active_score", ... fields
+        if isinstance(triumph_id, str):
+            continue
+
+        # calculate if the triumph is gotten
+        if not triumph_info.objectives:
+            status = DestinyRecordState.OBJECTIVE_NOT_COMPLETED not in triumph_info.state
+        else:
+            status = all(part.complete for part in triumph_info.objectives)
+
+        if status:
+            gotten.append(int(triumph_id))
+
+    return gotten
+
+
 def get_collectibles_subprocess(result: DestinyProfileResponse) -> dict[int, DestinyCollectibleComponent]:
     """Run in anyio subprocess on another thread since this might be slow"""
 
-    # get profile collectibles
-    user_collectibles = result.profile_collectibles.data.collectibles
+    # get profile collectibles. Copied, since the response is shared
+    user_collectibles = dict(result.profile_collectibles.data.collectibles)
 
     # get character collectibles
     character_collectibles = [
@@ -1,17 +1,23 @@
 import asyncio
 import dataclasses
+import itertools
+import logging
+from typing import AsyncIterator, Optional
 
 from anyio import ExceptionGroup, create_task_group
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from Backend.bungio.scheduler import RequestPriority, request_priority
+from Backend.core.destiny.activities import DestinyActivities
 from Backend.core.destiny.profile import DestinyProfile
 from Backend.core.errors import CustomException
-from Backend.crud import crud_activities
+from Backend.crud import crud_activities, discord_users
 from Backend.crud.destiny.roles import CRUDRoles, crud_roles
 from Backend.database.base import acquire_db_session
 from Backend.database.models import Roles
 from Shared.networkingSchemas.destiny.roles import (
     EarnedRoleModel,
+    EarnedRolesBulkModel,
     EarnedRolesModel,
     MissingRolesModel,
     RoleDataUserModel,
@@ -20,6 +26,9 @@ from Shared.networkingSchemas.destiny.roles import (
     RolesCategoryModel,
 )
 
+# how many users get checked at once by `get_guild_roles_bulk()`
+bulk_roles_concurrency = 10
+
 
 class RoleNotEarnedException(Exception):
     """This is raised should a role not be earned and we don't want additional info"""
@@ -28,6 +37,107 @@ class RoleNotEarnedException(Exception):
         self.role_id = role_id
 
 
+async def sort_roles_by_requirements(db: AsyncSession, roles: list[Roles]) -> list[Roles]:
+    """Sort the roles topologically by their required roles. Required roles from other guilds get added too"""
+
+    roles_by_id = {role.role_id: role for role in roles}
+    sorted_roles: list[Roles] = []
+
+    # key: role_id, value: if the role is done (False while its requirements are getting visited)
+    visited: dict[int, bool] = {}
+
+    async def visit(role: Roles):
+        if role.role_id in visited:
+            # roles which require each other can never be resolved
+            if not visited[role.role_id]:
+                raise CustomException("RoleLookupTimedOut")
+            return
+
+        visited[role.role_id] = False
+        for requirement_role in role.requirement_require_roles:
+            # get the role with the proper relationship depths from cache -> all attrs are loaded
+            if requirement_role.role_id not in roles_by_id:
+                roles_by_id[requirement_role.role_id] = await crud_roles.get_role(
+                    db=db, role_id=requirement_role.role_id
+                )
+            await visit(roles_by_id[requirement_role.role_id])
+        visited[role.role_id] = True
+
+        sorted_roles.append(role)
+
+    for guild_role in roles:
+        await visit(guild_role)
+
+    return sorted_roles
+
+
+async def get_sorted_guild_roles(guild_id: int) -> tuple[list[Roles], list[Roles]]:
+    """Get the guild roles, and the same roles sorted so required roles get checked before the roles which require them"""
+
+    async with acquire_db_session() as db:
+        guild_roles = await crud_roles.get_guild_roles(db=db, guild_id=guild_id)
+        sorted_roles = await sort_roles_by_requirements(db=db, roles=guild_roles)
+
+    return guild_roles, sorted_roles
+
+
+async def get_guild_roles_bulk(guild_id: int, discord_ids: list[int]) -> AsyncIterator[EarnedRolesBulkModel]:
+    """Get the roles for a lot of users in a guild. Yields the users in the order they are done"""
+
+    # get the logger
+    logger_exceptions = logging.getLogger("requestsExceptions")
+
+    # the guild roles are the same for everyone
+    sorted_guild_roles = await get_sorted_guild_roles(guild_id=guild_id)
+
+    async def check_user(discord_id: int) -> EarnedRolesBulkModel:
+        """Update and check a single user"""
+
+        result = EarnedRolesBulkModel(discord_id=discord_id)
+        request_priority.set(RequestPriority.ROLES)
+        try:
+            async with acquire_db_session() as db:
+                user = await discord_users.get_profile_from_discord_id(discord_id, db=db)
+
+                # update the user's db entries
+                activities = DestinyActivities(db=db, user=user)
+                await activities.update_activity_db()
+
+                user_roles = UserRoles(user=DestinyProfile(db=db, user=user))
+                result.roles = await user_roles.get_guild_roles(
+                    guild_id=guild_id, sorted_guild_roles=sorted_guild_roles
+                )
+
+        except CustomException as error:
+            result.error = error.error
+
+        except Exception as error:
+            # one broken user should not stop the whole guild
+            logger_exceptions.exception(f"Bulk role check for discordID `{discord_id}`", exc_info=error)
+            result.error = "ProgrammingError"
+
+        return result
+
+    # keep `bulk_roles_concurrency` users running at once, and hand them out as soon as they are done
+    to_check = iter(discord_ids)
+    pending: set[asyncio.Task] = set()
+    try:
+        while True:
+            for discord_id in itertools.islice(to_check, bulk_roles_concurrency - len(pending)):
+                pending.add(asyncio.create_task(check_user(discord_id)))
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+
+    finally:
+        # the receiver went away
+        for task in pending:
+            task.cancel()
+
+
 @dataclasses.dataclass
 class UserRoles:
     """Check for role completions with a cache to remove double role check on role dependencies"""
@@ -39,6 +149,11 @@ class UserRoles:
     _cache_worthy: dict = dataclasses.field(default_factory=dict, init=False)
     _cache_worthy_info: dict = dataclasses.field(default_factory=dict, init=False)
 
+    # the loaded requirement data for `get_guild_roles()`
+    _activity_counts: dict[int, int] = dataclasses.field(default_factory=dict, init=False)
+    _collectibles: dict[int, bool] = dataclasses.field(default_factory=dict, init=False)
+    _records: dict[int, bool] = dataclasses.field(default_factory=dict, init=False)
+
     async def get_missing_roles(self, guild_id: int, db: AsyncSession) -> MissingRolesModel:
         """Return all the missing guild roles"""
 
@@ -62,20 +177,24 @@ class UserRoles:
 
         return result
 
-    async def get_guild_roles(self, guild_id: int) -> EarnedRolesModel:
-        """Return all the gotten / not gotten guild roles"""
+    async def get_guild_roles(
+        self, guild_id: int, sorted_guild_roles: Optional[tuple[list[Roles], list[Roles]]] = None
+    ) -> EarnedRolesModel:
+        """
+        Return all the gotten / not gotten guild roles
 
-        # get all guild roles
-        async with acquire_db_session() as db:
-            guild_roles = await self.crud_roles.get_guild_roles(db=db, guild_id=guild_id)
+        `sorted_guild_roles` can be passed in as returned by `get_sorted_guild_roles()` when checking a lot of users
+        """
+
+        guild_roles, sorted_roles = sorted_guild_roles or await get_sorted_guild_roles(guild_id=guild_id)
         user_roles = EarnedRolesModel()
 
-        # get them in anyio tasks
-        async with create_task_group() as tg:
-            for role in guild_roles:
-                tg.start_soon(lambda: self._has_role(role=role, called_with_task_group=True, i_only_need_the_bool=True))
+        # load everything the roles need at once, then check them in order
+        await self._load_requirements(roles=sorted_roles)
+        for role in sorted_roles:
+            self._check_loaded_role(role=role)
 
-        # loop through the roles now that the tasks are done and categorise them
+        # loop through the roles now that they are checked and categorise them
         for role in guild_roles:
             category = str(role.category)
             model = RolesCategoryModel(category=category, discord_role_id=role.role_id)
@@ -101,6 +220,100 @@ class UserRoles:
 
         return user_roles
 
+    async def _load_requirements(self, roles: list[Roles]):
+        """Load the data for all the requirements of the roles at once"""
+
+        acquirable_roles = [role for role in roles if role.acquirable]
+
+        # count the activities for all requirements in one query
+        entries = [entry for role in acquirable_roles for entry in role.requirement_require_activity_completions]
+        async with acquire_db_session() as db:
+            counts = await crud_activities.count_activities(
+                db=db,
+                destiny_id=self.user.destiny_id,
+                requirements=[
+                    {
+                        "activity_hashes": entry.allowed_activity_hashes,
+                        "no_checkpoints": not entry.allow_checkpoints,
+                        "require_team_flawless": entry.require_team_flawless,
+                        "require_individual_flawless": entry.require_individual_flawless,
+                        "require_score": entry.require_score,
+                        "require_kills": entry.require_kills,
+                        "require_kills_per_minute": entry.require_kills_per_minute,
+                        "require_kda": entry.require_kda,
+                        "require_kd": entry.require_kd,
+                        "maximum_allowed_players": entry.maximum_allowed_players,
+                        "allow_time_periods": entry.allow_time_periods,
+                        "disallow_time_periods": entry.disallow_time_periods,
+                    }
+                    for entry in entries
+                ],
+            )
+        self._activity_counts = {entry._id: count for entry, count in zip(entries, counts)}
+
+        # check all collectibles / records at once, this only looks at the profile once
+        self._collectibles = await self.user.has_collectibles(
+            collectible_hashes=[
+                collectible.bungie_id
+                for role in acquirable_roles
+                for collectible in role.requirement_require_collectibles
+            ],
+            fresh_db=True,
+        )
+        self._records = await self.user.has_triumphs(
+            triumph_hashes=[
+                record.bungie_id for role in acquirable_roles for record in role.requirement_require_records
+            ],
+            fresh_db=True,
+        )
+
+    def _check_loaded_role(self, role: Roles) -> RoleEnum:
+        """Check the role with the loaded requirement data. Required roles need to be checked first"""
+
+        # check cache first
+        if role.role_id in self._cache_worthy:
+            return self._cache_worthy[role.role_id]
+
+        info = self._cache_worthy_info[role.role_id] = {}
+
+        # check if it is set as acquirable
+        if not role.acquirable:
+            self._cache_worthy[role.role_id] = RoleEnum.NOT_ACQUIRABLE
+            return RoleEnum.NOT_ACQUIRABLE
+
+        worthy = RoleEnum.EARNED
+
+        info["require_activity_completions"] = []
+        for entry in role.requirement_require_activity_completions:
+            count = self._activity_counts[entry._id]
+            if (count < entry.count) != entry.inverse:
+                worthy = RoleEnum.NOT_EARNED
+            info["require_activity_completions"].append(f"{count} / {entry.count}")
+
+        info["require_collectibles"] = []
+        for collectible in role.requirement_require_collectibles:
+            result = self._collectibles[collectible.bungie_id]
+            if result == collectible.inverse:
+                worthy = RoleEnum.NOT_EARNED
+            info["require_collectibles"].append(result)
+
+        info["require_records"] = []
+        for record in role.requirement_require_records:
+            result = self._records[record.bungie_id]
+            if result == record.inverse:
+                worthy = RoleEnum.NOT_EARNED
+            info["require_records"].append(result)
+
+        info["require_role_ids"] = []
+        for requirement_role in role.requirement_require_roles:
+            result = self._cache_worthy[requirement_role.role_id] != RoleEnum.NOT_EARNED
+            if not result:
+                worthy = RoleEnum.NOT_EARNED
+            info["require_role_ids"].append(result)
+
+        self._cache_worthy[role.role_id] = worthy
+        return worthy
+
     async def has_role(self, role: Roles, i_only_need_the_bool: bool = False) -> EarnedRoleModel:
         """
         Return is the role is gotten and a dictionary of what is missing to get the role
@@ -110,16 +323,14 @@ class UserRoles:
         Argument `i_only_need_the_bool` makes this stop as soon as worthy is not true anymore
         """
 
-        worthy = await self._has_role(
-            role=role, called_with_task_group=False, i_only_need_the_bool=i_only_need_the_bool
-        )
+        worthy = await self._has_role(role=role, i_only_need_the_bool=i_only_need_the_bool)
         return EarnedRoleModel(
             earned=worthy,
             role=RoleModel.from_sql_model(role),
             user_role_data=RoleDataUserModel.parse_obj(self._cache_worthy_info[role.role_id]),
         )
 
-    async def _has_role(self, role: Roles, called_with_task_group: bool, i_only_need_the_bool: bool) -> RoleEnum:
+    async def _has_role(self, role: Roles, i_only_need_the_bool: bool) -> RoleEnum:
         """Check the role. Can be used in anyio task groups"""
 
         self._cache_worthy_info[role.role_id] = {}
@@ -146,7 +357,6 @@ class UserRoles:
                                 role=role,
                                 requirement_name=requirement_name,
                                 i_only_need_the_bool=i_only_need_the_bool,
-                                called_with_task_group=called_with_task_group,
                             )
                         )
 
@@ -178,7 +388,6 @@ class UserRoles:
         role: Roles,
         requirement_name: str,
         i_only_need_the_bool: bool,
-        called_with_task_group: bool,
     ):
         """Check the get_requirements. Can be used in task groups"""
 
@@ -232,9 +441,15 @@ class UserRoles:
             case "requirement_require_collectibles":
                 self._cache_worthy_info[role.role_id].update({"require_collectibles": []})
 
+                # check all collectibles at once
+                gotten = await self.user.has_collectibles(
+                    collectible_hashes=[collectible.bungie_id for collectible in role.requirement_require_collectibles],
+                    fresh_db=True,
+                )
+
                 # loop through the collectibles
                 for collectible in role.requirement_require_collectibles:
-                    result = await self.user.has_collectible(collectible.bungie_id, fresh_db=True)
+                    result = gotten[collectible.bungie_id]
 
                     if not result:
                         if not collectible.inverse:
@@ -256,9 +471,14 @@ class UserRoles:
             case "requirement_require_records":
                 self._cache_worthy_info[role.role_id].update({"require_records": []})
 
+                # check all records at once
+                gotten = await self.user.has_triumphs(
+                    triumph_hashes=[record.bungie_id for record in role.requirement_require_records], fresh_db=True
+                )
+
                 # loop through the records
                 for record in role.requirement_require_records:
-                    result = await self.user.has_triumph(triumph_hash=record.bungie_id, fresh_db=True)
+                    result = gotten[record.bungie_id]
 
                     if not result:
                         if not record.inverse:
@@ -267,7 +487,7 @@ class UserRoles:
                         if record.inverse:
                             worthy = RoleEnum.NOT_EARNED
 
-                    self._cache_worthy_info[role.role_id]["require_records"].append(result.bool)
+                    self._cache_worthy_info[role.role_id]["require_records"].append(result)
 
                     # make this end early
                     if i_only_need_the_bool and worthy == RoleEnum.NOT_EARNED:
@@ -286,57 +506,31 @@ class UserRoles:
                     async with acquire_db_session() as db:
                         requirement_role = await crud_roles.get_role(db=db, role_id=requirement_role.role_id)
 
-                    # alright so this is a bit more convoluted
-                    # simply calling this function again would lead to double-checking / race conditions when checking all roles (because of task groups)
-                    # but just waiting would not work too, since a single role can get checked too
-                    # so, we are waiting if called with tasks groups, and looking ourselves if not
-                    if called_with_task_group:
-                        # 5 minutes wait time
-                        waited_for = 0
-                        while waited_for < 300:
-                            if requirement_role.role_id in self._cache_worthy:
-                                if self._cache_worthy[requirement_role.role_id] == RoleEnum.NOT_EARNED:
-                                    worthy = RoleEnum.NOT_EARNED
-                                    self._cache_worthy_info[role.role_id]["require_role_ids"].append(False)
-                                else:
-                                    self._cache_worthy_info[role.role_id]["require_role_ids"].append(True)
-
-                                break
-
-                            waited_for += 2
-                            await asyncio.sleep(2)
-
-                        # this is only called if nothing was found
-                        if waited_for >= 300:
-                            raise CustomException("RoleLookupTimedOut")
-
-                    # check the sub-roles ourselves
-                    else:
-                        sub_role_worthy = await self._has_role(
-                            role=requirement_role,
-                            called_with_task_group=False,
-                            i_only_need_the_bool=i_only_need_the_bool,
-                        )
+                    # check the sub-roles
+                    sub_role_worthy = await self._has_role(
+                        role=requirement_role,
+                        i_only_need_the_bool=i_only_need_the_bool,
+                    )
+
+                    # check if this role replaces the sub role
+                    if (
+                        requirement_role.requirement_replaced_by_role
+                        and requirement_role.requirement_replaced_by_role.role_id == role.role_id
+                    ):
+                        # do not set it to EARNED
+                        if sub_role_worthy == RoleEnum.EARNED:
+                            sub_role_worthy = RoleEnum.EARNED_BUT_REPLACED_BY_HIGHER_ROLE
+                            self._cache_worthy[requirement_role.role_id] = sub_role_worthy
+
+                    if (
+                        sub_role_worthy == RoleEnum.EARNED
+                        or sub_role_worthy == RoleEnum.EARNED_BUT_REPLACED_BY_HIGHER_ROLE
+                    ):
+                        self._cache_worthy_info[role.role_id]["require_role_ids"].append(True)
 
-                        # check if this role replaces the sub role
-                        if (
-                            requirement_role.requirement_replaced_by_role
-                            and requirement_role.requirement_replaced_by_role.role_id == role.role_id
-                        ):
-                            # do not set it to EARNED
-                            if sub_role_worthy == RoleEnum.EARNED:
-                                sub_role_worthy = RoleEnum.EARNED_BUT_REPLACED_BY_HIGHER_ROLE
-                                self._cache_worthy[requirement_role.role_id] = sub_role_worthy
-
-                        if (
-                            sub_role_worthy == RoleEnum.EARNED
-                            or sub_role_worthy == RoleEnum.EARNED_BUT_REPLACED_BY_HIGHER_ROLE
-                        ):
-                            self._cache_worthy_info[role.role_id]["require_role_ids"].append(True)
-
-                        else:
-                            worthy = RoleEnum.NOT_EARNED
-                            self._cache_worthy_info[role.role_id]["require_role_ids"].append(False)
+                    else:
+                        worthy = RoleEnum.NOT_EARNED
+                        self._cache_worthy_info[role.role_id]["require_role_ids"].append(False)
 
                     # make this end early
                     if i_only_need_the_bool and worthy == RoleEnum.NOT_EARNED:
@@ -347,8 +541,7 @@ class UserRoles:
                         break
 
             case "requirement_replaced_by_role":
-                # only need to check this sometimes
-                if role.requirement_replaced_by_role and not called_with_task_group:
+                if role.requirement_replaced_by_role:
                     # get the role with the proper relationship depths -> all attrs are loaded
                     async with acquire_db_session() as db:
                         replaced_by_role = await crud_roles.get_role(
@@ -364,7 +557,6 @@ class UserRoles:
                         # check the higher role
                         higher_role_worthy = await self._has_role(
                             role=replaced_by_role,
-                            called_with_task_group=False,
                             i_only_need_the_bool=i_only_need_the_bool,
                         )
 
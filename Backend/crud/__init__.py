@@ -1,12 +1,19 @@
-from Backend.crud.destiny.activities import crud_activities, crud_activities_fail_to_get
+from Backend.crud.destiny.activities import (
+    crud_activities,
+    crud_activities_archive,
+    crud_activities_fail_to_get,
+    crud_activities_users_stats,
+    crud_activities_users_weapons_stats,
+)
 from Backend.crud.destiny.collectibles import collectibles
 from Backend.crud.destiny.destinyClanLinks import destiny_clan_links
 from Backend.crud.destiny.discordUsers import discord_users
+from Backend.crud.destiny.leaderboards import crud_leaderboards
 from Backend.crud.destiny.lfgSystem import lfg
 from Backend.crud.destiny.records import records
 from Backend.crud.destiny.roles import crud_roles
 from Backend.crud.destiny.rssFeed import rss_feed
-from Backend.crud.destiny.weapons import crud_weapons
+from Backend.crud.destiny.weapons import crud_weapon_attributes, crud_weapons
 from Backend.crud.discord.elevatorServers import elevator_servers
 from Backend.crud.misc.backendUsers import backend_user
 from Backend.crud.misc.moderation import moderation
@@ -100,6 +100,15 @@ class CRUDBase:
         db.add_all(to_create)
         await db.flush()
 
+    @staticmethod
+    async def _copy_records(db: AsyncSession, table_name: str, columns: list[str], records: list[tuple]) -> None:
+        """Bulk load the records into the table with COPY. Runs in the transaction of the session"""
+
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+
+        await raw_connection.driver_connection.copy_records_to_table(table_name, records=records, columns=columns)
+
     @staticmethod
     async def _update(db: AsyncSession, to_update: ModelType, **update_kwargs) -> ModelType:
         """Updates an initiated ModelType in the database"""
@@ -1,27 +1,107 @@
 import asyncio
 import datetime
+from array import array
 from typing import Optional
 
+import orjson
+from anyio import to_thread
 from bungio.models import DestinyPostGameCarnageReportData
 from bungio.models.base import MISSING
-from sqlalchemy import distinct, func, not_, select
+from sqlalchemy import ARRAY, BigInteger, and_, any_, bindparam, case, delete, func, inspect, not_, or_, select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from Backend.core.errors import CustomException
 from Backend.crud.base import CRUDBase
 from Backend.database import acquire_db_session
-from Backend.database.models import Activities, ActivitiesFailToGet, ActivitiesUsers, ActivitiesUsersWeapons
+from Backend.database.models import (
+    Activities,
+    ActivitiesArchive,
+    ActivitiesArchiveDictionaries,
+    ActivitiesFailToGet,
+    ActivitiesUsers,
+    ActivitiesUsersStats,
+    ActivitiesUsersWeapons,
+    ActivitiesUsersWeaponsStats,
+)
+from Backend.misc.cache import cache
+from Backend.misc.pgcrArchive import PgcrCompressor
 from Backend.prometheus.stats import prom_clan_activities
+from Shared.functions.helperFunctions import get_now_with_tz
 from Shared.networkingSchemas import DestinyClanMemberModel
 from Shared.networkingSchemas.destiny.roles import TimePeriodModel
 
-fail_to_get_insert_lock = asyncio.Lock()
-delete_lock = asyncio.Lock()
+# when failed pgcrs get tried again. Doubles after every attempt
+missing_pgcr_base_backoff = datetime.timedelta(minutes=5)
+missing_pgcr_max_backoff = datetime.timedelta(days=1)
+
+# after this many attempts the pgcr is parked and not tried anymore. The row stays, so they can be looked at
+missing_pgcr_max_attempts = 30
+missing_pgcr_parked_until = datetime.datetime(year=9999, month=1, day=1, tzinfo=datetime.timezone.utc)
+
+# asyncpg only allows so many bind parameters per query
+max_query_parameters = 32767
+
 insert_lock = asyncio.Lock()
 
 
 starting_phase_cutoff = datetime.datetime(day=22, month=2, year=2022, hour=17, tzinfo=datetime.timezone.utc)
 
+# the columns which get loaded with COPY, in the order `_convert_to_values()` returns them
+activities_users_columns = [
+    "destiny_id",
+    "bungie_name",
+    "character_id",
+    "character_class",
+    "character_level",
+    "system",
+    "light_level",
+    "emblem_hash",
+    "standing",
+    "assists",
+    "completed",
+    "deaths",
+    "kills",
+    "opponents_defeated",
+    "efficiency",
+    "kills_deaths_ratio",
+    "kills_deaths_assists",
+    "score",
+    "activity_duration_seconds",
+    "completion_reason",
+    "start_seconds",
+    "time_played_seconds",
+    "player_count",
+    "team_score",
+    "precision_kills",
+    "weapon_kills_grenade",
+    "weapon_kills_melee",
+    "weapon_kills_super",
+    "weapon_kills_ability",
+    "activity_instance_id",
+]
+activities_users_weapons_columns = ["weapon_id", "unique_weapon_kills", "unique_weapon_precision_kills"]
+
+# the columns of the rollup which get summed up / which keep the fastest run
+stats_sums = [
+    "completed_rows",
+    "flawless_completed_rows",
+    "completed_instances",
+    "completed_instances_duration_seconds",
+    "kills",
+    "precision_kills",
+    "deaths",
+    "assists",
+    "time_played_seconds",
+]
+stats_fastest = [
+    ("fastest_completed_row_seconds", "fastest_completed_row_instance_id"),
+    ("fastest_completed_instance_seconds", "fastest_completed_instance_id"),
+]
+
+# the columns of the weapon rollup which get summed up
+weapons_stats_sums = ["kills", "precision_kills", "usages"]
+
 
 class CRUDActivitiesFailToGet(CRUDBase):
     async def get_all(self, db: AsyncSession) -> list[ActivitiesFailToGet]:
@@ -29,18 +109,138 @@ class CRUDActivitiesFailToGet(CRUDBase):
 
         return await self._get_all(db=db)
 
-    async def insert(self, db: AsyncSession, instance_id: int, period: datetime.datetime):
-        """Insert missing pgcr"""
+    async def insert(self, db: AsyncSession, instance_id: int, period: datetime.datetime, error: Optional[str] = None):
+        """Insert missing pgcr. It gets retried right away"""
+
+        query = postgresql.insert(ActivitiesFailToGet).values(instance_id=instance_id, period=period, last_error=error)
+        query = query.on_conflict_do_nothing(index_elements=[ActivitiesFailToGet.instance_id])
+        await self._execute_query(db=db, query=query)
+
+    async def claim(self, db: AsyncSession, limit: int) -> list[ActivitiesFailToGet]:
+        """
+        Get the missing pgcrs which are due and lock them until the session ends
+        Rows which other workers have locked get skipped, so multiple workers / processes can work on this at once
+        """
+
+        query = select(ActivitiesFailToGet)
+        query = query.filter(ActivitiesFailToGet.next_attempt_at <= func.now())
+        query = query.order_by(ActivitiesFailToGet.next_attempt_at)
+        query = query.limit(limit)
+        query = query.with_for_update(skip_locked=True)
+
+        result = await self._execute_query(db=db, query=query)
+        return result.scalars().all()
+
+    async def retry_later(self, db: AsyncSession, obj: ActivitiesFailToGet, error: str):
+        """Push the next attempt back exponentially, or park the pgcr if it failed too often"""
+
+        attempts = obj.attempts + 1
+        if attempts >= missing_pgcr_max_attempts:
+            next_attempt_at = missing_pgcr_parked_until
+        else:
+            # cap the exponent, the timedelta overflows otherwise
+            backoff = min(missing_pgcr_base_backoff * 2 ** min(obj.attempts, 16), missing_pgcr_max_backoff)
+            next_attempt_at = get_now_with_tz() + backoff
+
+        await self._update(
+            db=db,
+            to_update=obj,
+            attempts=attempts,
+            next_attempt_at=next_attempt_at,
+            last_error=error,
+        )
+
+    async def delete(self, db: AsyncSession, instance_ids: list[int]):
+        """Delete the missing pgcrs"""
+
+        query = delete(ActivitiesFailToGet)
+        query = query.filter(
+            ActivitiesFailToGet.instance_id
+            == any_(bindparam("instance_ids", value=instance_ids, type_=ARRAY(BigInteger)))
+        )
+        await self._execute_query(db=db, query=query)
+
+
+class CRUDActivitiesArchive(CRUDBase):
+    compressor: Optional[PgcrCompressor] = None
+    compressor_lock = asyncio.Lock()
+
+    async def insert(
+        self, db: AsyncSession, pgcrs: dict[int, tuple[datetime.datetime, DestinyPostGameCarnageReportData]]
+    ):
+        """Compress and insert the raw pgcrs. Already archived instances get skipped"""
+
+        if not pgcrs:
+            return
 
-        async with fail_to_get_insert_lock:
-            if await self._get_with_key(db=db, primary_key=instance_id) is None:
-                await self._insert(db=db, to_create=ActivitiesFailToGet(instance_id=instance_id, period=period))
+        compressor = await self._get_compressor(db=db)
+        raws = [orjson.dumps(pgcr.to_dict()) for _, pgcr in pgcrs.values()]
+        dictionary_id, compressed = await to_thread.run_sync(lambda: compressor.compress(raws))
 
-    async def delete(self, db: AsyncSession, obj: ActivitiesFailToGet):
-        """Insert missing pgcr"""
+        query = postgresql.insert(ActivitiesArchive).values(
+            [
+                {"instance_id": instance_id, "period": period, "dictionary_id": dictionary_id, "data": data}
+                for (instance_id, (period, _)), data in zip(pgcrs.items(), compressed)
+            ]
+        )
+        query = query.on_conflict_do_nothing(index_elements=[ActivitiesArchive.instance_id])
+        await self._execute_query(db=db, query=query)
+
+        # once there are enough samples, everything afterwards gets compressed with a trained dictionary
+        if compressor.needs_dictionary:
+            async with self.compressor_lock:
+                if compressor.needs_dictionary:
+                    data = await to_thread.run_sync(compressor.train_dictionary)
+
+                    # separate session, so the dictionary is saved even if this insert gets rolled back
+                    dictionary = ActivitiesArchiveDictionaries(data=data)
+                    async with acquire_db_session() as dictionary_db:
+                        await self._insert(db=dictionary_db, to_create=dictionary)
+                    compressor.add_dictionary(dictionary_id=dictionary.id, data=data)
+
+    async def get_batch(
+        self, db: AsyncSession, after_instance_id: int = 0, limit: int = 1000
+    ) -> list[tuple[int, datetime.datetime, Optional[int], bytes]]:
+        """Get the next archived pgcrs sorted by instance_id. Returns the still compressed (instance_id, period, dictionary_id, data)"""
+
+        query = select(
+            ActivitiesArchive.instance_id,
+            ActivitiesArchive.period,
+            ActivitiesArchive.dictionary_id,
+            ActivitiesArchive.data,
+        )
+        query = query.filter(ActivitiesArchive.instance_id > after_instance_id)
+        query = query.order_by(ActivitiesArchive.instance_id)
+        query = query.limit(limit)
+
+        result = await self._execute_query(db=db, query=query)
+        rows = result.all()
+
+        # rows from a dictionary we have not seen yet (from another process) need it loaded
+        compressor = await self._get_compressor(db=db)
+        for dictionary_id in {row.dictionary_id for row in rows}:
+            if dictionary_id is not None and not compressor.knows_dictionary(dictionary_id):
+                dictionary = await self._get_with_key(db=db, primary_key=dictionary_id)
+                compressor.add_dictionary(dictionary_id=dictionary_id, data=dictionary.data, use=False)
+
+        return [tuple(row) for row in rows]
+
+    async def _get_compressor(self, db: AsyncSession) -> PgcrCompressor:
+        """Get the compressor, with the newest dictionary loaded"""
+
+        if self.compressor is None:
+            async with self.compressor_lock:
+                if self.compressor is None:
+                    compressor = PgcrCompressor()
+
+                    query = select(ActivitiesArchiveDictionaries)
+                    result = await self._execute_query(db=db, query=query)
+                    for dictionary in sorted(result.scalars().all(), key=lambda x: x.id):
+                        compressor.add_dictionary(dictionary_id=dictionary.id, data=dictionary.data)
+
+                    self.compressor = compressor
 
-        async with delete_lock:
-            await self._delete(db=db, obj=obj)
+        return self.compressor
 
 
 class CRUDActivities(CRUDBase):
@@ -49,37 +249,143 @@ class CRUDActivities(CRUDBase):
 
         return await self._get_with_key(db=db, primary_key=instance_id)
 
+    async def get_all_instance_ids(self, db: AsyncSession) -> array:
+        """Get the instance_ids of all saved activities, sorted"""
+
+        query = select(Activities.instance_id).order_by(Activities.instance_id)
+
+        # stream them, there can be a lot
+        instance_ids = array("q")
+        result = await db.stream_scalars(query)
+        async for partition in result.partitions(100_000):
+            instance_ids.extend(partition)
+
+        return instance_ids
+
+    async def get_saved_instance_ids(self, db: AsyncSession, instance_ids: list[int]) -> set[int]:
+        """Get which of the instance_ids are already saved"""
+
+        query = select(Activities.instance_id)
+        query = query.filter(
+            Activities.instance_id == any_(bindparam("instance_ids", value=instance_ids, type_=ARRAY(BigInteger)))
+        )
+
+        result = await self._execute_query(db=db, query=query)
+        return set(result.scalars().fetchall())
+
+    async def get_play_days(self, db: AsyncSession, destiny_ids: list[int], since: datetime.datetime) -> dict[int, int]:
+        """Get on how many different (utc) days the users played since then. Users without activities are missing"""
+
+        query = select(
+            ActivitiesUsers.destiny_id,
+            func.count(func.distinct(func.date(func.timezone("UTC", Activities.period)))),
+        )
+        query = query.join(Activities, Activities.instance_id == ActivitiesUsers.activity_instance_id)
+        query = query.filter(
+            ActivitiesUsers.destiny_id == any_(bindparam("destiny_ids", value=destiny_ids, type_=ARRAY(BigInteger)))
+        )
+        query = query.filter(Activities.period >= since)
+        query = query.group_by(ActivitiesUsers.destiny_id)
+
+        result = await self._execute_query(db=db, query=query)
+        return {destiny_id: days for destiny_id, days in result.all()}
+
     async def insert(
         self,
         data: list[tuple[int, datetime.datetime, DestinyPostGameCarnageReportData]],
         descend_clan_members: dict[int, DestinyClanMemberModel],
     ):
-        """Get the activity with the instance_id"""
+        """
+        Bulk insert the pgcrs
+
+        The activities get inserted with `ON CONFLICT DO NOTHING`, and only the users of the actually new activities get loaded with COPY.
+        The user ids are taken from the sequence beforehand, so the weapons can reference them without a round-trip per row
+        """
 
-        to_create = []
+        # convert the pgcrs to plain values. Duplicated instances only get inserted once
+        to_create = {}
         for instance_id, activity_time, pgcr in data:
-            to_create.append(self._convert_to_model(instance_id=instance_id, activity_time=activity_time, pgcr=pgcr))
+            to_create[instance_id] = self._convert_to_values(
+                instance_id=instance_id, activity_time=activity_time, pgcr=pgcr
+            )
+        if not to_create:
+            return
 
         async with acquire_db_session() as session:
-            await self._insert_multi(db=session, to_create=to_create)
+            # insert the activities and get the ones which did not exist yet
+            query = postgresql.insert(Activities).values([activity for activity, _ in to_create.values()])
+            query = query.on_conflict_do_nothing(index_elements=[Activities.instance_id]).returning(
+                Activities.instance_id
+            )
+            result = await self._execute_query(db=session, query=query)
+            inserted = set(result.scalars().fetchall())
+
+            # keep the raw pgcrs, so new stats can be derived from them later on
+            await crud_activities_archive.insert(
+                db=session,
+                pgcrs={
+                    instance_id: (activity_time, pgcr)
+                    for instance_id, activity_time, pgcr in data
+                    if instance_id in inserted
+                },
+            )
+
+            to_create = {instance_id: values for instance_id, values in to_create.items() if instance_id in inserted}
+            users = [user for _, activity_users in to_create.values() for user in activity_users]
+            if not users:
+                return
+
+            # reserve the user ids
+            query = select(func.nextval(func.pg_get_serial_sequence(f'"{ActivitiesUsers.__tablename__}"', "id")))
+            query = query.select_from(func.generate_series(1, len(users)))
+            result = await self._execute_query(db=session, query=query)
+            user_ids = result.scalars().fetchall()
+
+            # build the rows
+            user_records = []
+            weapon_records = []
+            # by column name, so the order of the dicts does not matter
+            for user_id, (user, weapons) in zip(user_ids, users):
+                user_records.append((user_id, *(user[column] for column in activities_users_columns)))
+                for weapon in weapons:
+                    weapon_records.append((*(weapon[column] for column in activities_users_weapons_columns), user_id))
+
+            # load them
+            await self._copy_records(
+                db=session,
+                table_name=ActivitiesUsers.__tablename__,
+                columns=["id", *activities_users_columns],
+                records=user_records,
+            )
+            if weapon_records:
+                await self._copy_records(
+                    db=session,
+                    table_name=ActivitiesUsersWeapons.__tablename__,
+                    columns=[*activities_users_weapons_columns, "user_id"],
+                    records=weapon_records,
+                )
+
+            # update the rollups
+            await crud_activities_users_stats.add(db=session, activities=list(to_create.values()))
+            await crud_activities_users_weapons_stats.add(db=session, activities=list(to_create.values()))
+
+        # the saved leaderboards with these users are outdated now
+        destiny_ids = {user["destiny_id"] for user, _ in users}
+        for key, (leaderboard_destiny_ids, _) in list(cache.leaderboards.items()):
+            if not leaderboard_destiny_ids.isdisjoint(destiny_ids):
+                cache.leaderboards.pop(key, None)
 
         # save the prometheus stats
-        for activity in to_create:
-            users_in_clan = [
-                descend_clan_members[user.destiny_id]
-                for user in activity.users
-                if user.destiny_id in descend_clan_members
-            ]
-            for user in users_in_clan:
-                if user.discord_id:
-                    counter = prom_clan_activities.labels(user_id=user.discord_id)
-                    counter.inc()
+        for user, _ in users:
+            if (member := descend_clan_members.get(user["destiny_id"])) and member.discord_id:
+                counter = prom_clan_activities.labels(user_id=member.discord_id)
+                counter.inc()
 
     @staticmethod
-    def _convert_to_model(
+    def _convert_to_values(
         instance_id: int, activity_time: datetime.datetime, pgcr: DestinyPostGameCarnageReportData
-    ) -> Activities:
-        """Actually do the insert"""
+    ) -> tuple[dict, list[tuple[dict, list[dict]]]]:
+        """Convert the pgcr to the column values of the activity, its users and their weapons"""
 
         # starting phase index is only the way to go before 22/2/22, after we should use activityWasStartedFromBeginning
         if activity_time > starting_phase_cutoff:
@@ -88,19 +394,20 @@ class CRUDActivities(CRUDBase):
             starting_phase_index = pgcr.starting_phase_index
 
         # build the activity
-        activity = Activities(
-            instance_id=instance_id,
-            period=activity_time,
-            reference_id=pgcr.activity_details.reference_id,
-            director_activity_hash=pgcr.activity_details.director_activity_hash,
-            starting_phase_index=starting_phase_index,
-            mode=pgcr.activity_details.mode.value,
-            modes=[mode.value for mode in pgcr.activity_details.modes],
-            is_private=pgcr.activity_details.is_private,
-            system=pgcr.activity_details.membership_type.value,
-        )
+        activity = {
+            "instance_id": instance_id,
+            "period": activity_time,
+            "reference_id": pgcr.activity_details.reference_id,
+            "director_activity_hash": pgcr.activity_details.director_activity_hash,
+            "starting_phase_index": starting_phase_index,
+            "mode": pgcr.activity_details.mode.value,
+            "modes": [mode.value for mode in pgcr.activity_details.modes],
+            "is_private": pgcr.activity_details.is_private,
+            "system": pgcr.activity_details.membership_type.value,
+        }
 
         # loop through the members of the activity and append that data
+        users = []
         for player_pgcr in pgcr.entries:
             # get the bungie name separately, since bungie decided it would be fun to pass it as an empty string if it does not exist yet
             try:
@@ -115,62 +422,67 @@ class CRUDActivities(CRUDBase):
                 bungie_name = "UnknownName"
                 bungie_code = "0000"
 
+            # the order needs to match `activities_users_columns`
             extended_data = player_pgcr.extended or None
-            player = ActivitiesUsers(
-                destiny_id=player_pgcr.player.destiny_user_info.membership_id,
-                bungie_name=f"{bungie_name}#{bungie_code}",
-                character_id=player_pgcr.character_id,
-                character_class=player_pgcr.player.character_class or None,
-                character_level=player_pgcr.player.character_level,
-                system=player_pgcr.player.destiny_user_info.membership_type.value,
-                light_level=player_pgcr.player.light_level,
-                emblem_hash=player_pgcr.player.emblem_hash,
-                standing=player_pgcr.standing,
-                assists=int(player_pgcr.values["assists"].basic.value),
-                completed=int(player_pgcr.values["completed"].basic.value),
-                deaths=int(player_pgcr.values["deaths"].basic.value),
-                kills=int(player_pgcr.values["kills"].basic.value),
-                opponents_defeated=int(player_pgcr.values["opponentsDefeated"].basic.value),
-                efficiency=player_pgcr.values["efficiency"].basic.value,
-                kills_deaths_ratio=player_pgcr.values["killsDeathsRatio"].basic.value,
-                kills_deaths_assists=player_pgcr.values["killsDeathsAssists"].basic.value,
-                score=int(player_pgcr.values["score"].basic.value),
-                activity_duration_seconds=int(player_pgcr.values["activityDurationSeconds"].basic.value),
-                completion_reason=int(player_pgcr.values["completionReason"].basic.value),
-                start_seconds=int(player_pgcr.values["startSeconds"].basic.value),
-                time_played_seconds=int(player_pgcr.values["timePlayedSeconds"].basic.value),
-                player_count=int(player_pgcr.values["playerCount"].basic.value),
-                team_score=int(player_pgcr.values["teamScore"].basic.value),
-                precision_kills=int(extended_data.values["precisionKills"].basic.value) if extended_data else 0,
-                weapon_kills_grenade=int(extended_data.values["weaponKillsGrenade"].basic.value)
+            player = {
+                "destiny_id": player_pgcr.player.destiny_user_info.membership_id,
+                "bungie_name": f"{bungie_name}#{bungie_code}",
+                "character_id": player_pgcr.character_id,
+                "character_class": player_pgcr.player.character_class or None,
+                "character_level": player_pgcr.player.character_level,
+                "system": player_pgcr.player.destiny_user_info.membership_type.value,
+                "light_level": player_pgcr.player.light_level,
+                "emblem_hash": player_pgcr.player.emblem_hash,
+                "standing": player_pgcr.standing,
+                "assists": int(player_pgcr.values["assists"].basic.value),
+                "completed": int(player_pgcr.values["completed"].basic.value),
+                "deaths": int(player_pgcr.values["deaths"].basic.value),
+                "kills": int(player_pgcr.values["kills"].basic.value),
+                "opponents_defeated": int(player_pgcr.values["opponentsDefeated"].basic.value),
+                "efficiency": player_pgcr.values["efficiency"].basic.value,
+                "kills_deaths_ratio": player_pgcr.values["killsDeathsRatio"].basic.value,
+                "kills_deaths_assists": player_pgcr.values["killsDeathsAssists"].basic.value,
+                "score": int(player_pgcr.values["score"].basic.value),
+                "activity_duration_seconds": int(player_pgcr.values["activityDurationSeconds"].basic.value),
+                "completion_reason": int(player_pgcr.values["completionReason"].basic.value),
+                "start_seconds": int(player_pgcr.values["startSeconds"].basic.value),
+                "time_played_seconds": int(player_pgcr.values["timePlayedSeconds"].basic.value),
+                "player_count": int(player_pgcr.values["playerCount"].basic.value),
+                "team_score": int(player_pgcr.values["teamScore"].basic.value),
+                "precision_kills": int(extended_data.values["precisionKills"].basic.value) if extended_data else 0,
+                "weapon_kills_grenade": int(extended_data.values["weaponKillsGrenade"].basic.value)
                 if extended_data
                 else 0,
-                weapon_kills_melee=int(extended_data.values["weaponKillsMelee"].basic.value) if extended_data else 0,
-                weapon_kills_super=int(extended_data.values["weaponKillsSuper"].basic.value) if extended_data else 0,
-                weapon_kills_ability=int(extended_data.values["weaponKillsAbility"].basic.value)
+                "weapon_kills_melee": int(extended_data.values["weaponKillsMelee"].basic.value) if extended_data else 0,
+                "weapon_kills_super": int(extended_data.values["weaponKillsSuper"].basic.value) if extended_data else 0,
+                "weapon_kills_ability": int(extended_data.values["weaponKillsAbility"].basic.value)
                 if extended_data
                 else 0,
-            )
-
-            if extended_data:
-                # loop through the weapons the player used and append that data
-                if extended_data.weapons:
-                    for weapon_pgcr in extended_data.weapons:
-                        weapon = ActivitiesUsersWeapons(
-                            weapon_id=weapon_pgcr.reference_id,
-                            unique_weapon_kills=int(weapon_pgcr.values["uniqueWeaponKills"].basic.value),
-                            unique_weapon_precision_kills=int(
+                "activity_instance_id": instance_id,
+            }
+
+            # loop through the weapons the player used and append that data
+            weapons = []
+            if extended_data and extended_data.weapons:
+                for weapon_pgcr in extended_data.weapons:
+                    weapons.append(
+                        {
+                            "weapon_id": weapon_pgcr.reference_id,
+                            "unique_weapon_kills": int(weapon_pgcr.values["uniqueWeaponKills"].basic.value),
+                            "unique_weapon_precision_kills": int(
                                 weapon_pgcr.values["uniqueWeaponPrecisionKills"].basic.value
                             ),
-                        )
-
-                        # append weapon data to player
-                        player.weapons.append(weapon)
+                        }
+                    )
 
             # append player data to activity
-            activity.users.append(player)
+            users.append((player, weapons))
 
-        return activity
+        # these get queried a lot, so they are saved directly on the activity
+        activity["distinct_player_count"] = len({user["destiny_id"] for user, _ in users})
+        activity["team_deaths"] = sum(user["deaths"] for user, _ in users)
+
+        return activity, users
 
     async def get_activities(
         self,
@@ -201,93 +513,149 @@ class CRUDActivities(CRUDBase):
         query = query.group_by(ActivitiesUsers.id)
 
         query = query.filter(ActivitiesUsers.destiny_id == destiny_id)
+        query = query.filter(
+            *self._get_activities_filters(
+                activity_hashes=activity_hashes,
+                mode=mode,
+                only_completed=only_completed,
+                no_checkpoints=no_checkpoints,
+                only_checkpoint=only_checkpoint,
+                require_team_flawless=require_team_flawless,
+                require_individual_flawless=require_individual_flawless,
+                character_class=character_class,
+                character_ids=character_ids,
+                maximum_allowed_players=maximum_allowed_players,
+                require_score=require_score,
+                require_kills=require_kills,
+                require_kills_per_minute=require_kills_per_minute,
+                require_kda=require_kda,
+                require_kd=require_kd,
+                allow_time_periods=allow_time_periods,
+                disallow_time_periods=disallow_time_periods,
+            )
+        )
+
+        result = await self._execute_query(db=db, query=query)
+        scalars = result.scalars().fetchall()
+        return scalars
+
+    async def count_activities(self, db: AsyncSession, destiny_id: int, requirements: list[dict]) -> list[int]:
+        """
+        Counts the Activities that fulfill each of the requirements in one query
+
+        The requirements take the same arguments as `get_activities()`
+        """
+
+        if not requirements:
+            return []
+
+        query = select(
+            *[func.count().filter(and_(*self._get_activities_filters(**requirement))) for requirement in requirements]
+        )
+        query = query.select_from(ActivitiesUsers)
+        query = query.join(Activities)
+
+        query = query.filter(ActivitiesUsers.destiny_id == destiny_id)
+
+        result = await self._execute_query(db=db, query=query)
+        return list(result.one())
+
+    @staticmethod
+    def _get_activities_filters(
+        activity_hashes: Optional[list[int]] = None,
+        mode: Optional[int] = None,
+        only_completed: bool = True,
+        no_checkpoints: bool = True,
+        only_checkpoint: bool = False,
+        require_team_flawless: bool = False,
+        require_individual_flawless: bool = False,
+        character_class: Optional[str] = None,
+        character_ids: Optional[list[int]] = None,
+        maximum_allowed_players: Optional[int] = None,
+        require_score: Optional[int] = None,
+        require_kills: Optional[int] = None,
+        require_kills_per_minute: Optional[float] = None,
+        require_kda: Optional[float] = None,
+        require_kd: Optional[float] = None,
+        allow_time_periods: Optional[list[TimePeriodModel]] = None,
+        disallow_time_periods: Optional[list[TimePeriodModel]] = None,
+    ) -> list:
+        """Build the filter clauses for the get_requirements"""
+
+        filters = []
 
         # filter activity hashes
         if activity_hashes:
-            query = query.filter(Activities.director_activity_hash.in_(activity_hashes))
+            filters.append(Activities.director_activity_hash.in_(activity_hashes))
 
         # filter mode
         if mode:
-            query = query.filter(Activities.modes.any(mode))
+            filters.append(Activities.modes.any(mode))
 
         # do we accept non checkpoint runs?
         if no_checkpoints:
-            query = query.filter(Activities.starting_phase_index == 0)
+            filters.append(Activities.starting_phase_index == 0)
         if only_checkpoint:
-            query = query.filter(Activities.starting_phase_index != 0)
+            filters.append(Activities.starting_phase_index != 0)
 
         # team flawless required?
         if require_team_flawless:
-            subquery = select(Activities.instance_id)
-            subquery = subquery.join(ActivitiesUsers)
-            subquery = subquery.group_by(Activities.instance_id)
-
-            subquery = subquery.having(func.sum(distinct(ActivitiesUsers.deaths)) == 0)
-
-            query = query.filter(Activities.instance_id.in_(subquery))
+            filters.append(Activities.team_deaths == 0)
 
         # check completion status
         if only_completed:
-            query = query.filter(ActivitiesUsers.completed == 1)
-        query = query.filter(ActivitiesUsers.completion_reason == 0)
+            filters.append(ActivitiesUsers.completed == 1)
+        filters.append(ActivitiesUsers.completion_reason == 0)
 
         # individual flawless required?
         if require_individual_flawless:
-            query = query.filter(ActivitiesUsers.deaths == 0)
+            filters.append(ActivitiesUsers.deaths == 0)
 
         # limit character class
         if character_class:
-            query = query.filter(ActivitiesUsers.character_class == character_class)
+            filters.append(ActivitiesUsers.character_class == character_class)
 
         # limit character ids
         if character_ids:
-            query = query.filter(ActivitiesUsers.character_id.in_(character_ids))
+            filters.append(ActivitiesUsers.character_id.in_(character_ids))
 
         # minimum score?
         if require_score:
-            query = query.filter(ActivitiesUsers.score > require_score)
+            filters.append(ActivitiesUsers.score > require_score)
 
         # minimum kills?
         if require_kills:
-            query = query.filter(ActivitiesUsers.kills >= require_kills)
+            filters.append(ActivitiesUsers.kills >= require_kills)
 
         # minimum kills per minute?
         if require_kills_per_minute:
-            query = query.filter(
+            filters.append(
                 (ActivitiesUsers.kills * 60 / ActivitiesUsers.time_played_seconds) >= require_kills_per_minute
             )
 
         # minimum kda?
         if require_kda:
-            query = query.filter(ActivitiesUsers.kills_deaths_assists >= require_kda)
+            filters.append(ActivitiesUsers.kills_deaths_assists >= require_kda)
 
         # minimum kd?
         if require_kd:
-            query = query.filter(ActivitiesUsers.kills_deaths_ratio >= require_kd)
+            filters.append(ActivitiesUsers.kills_deaths_ratio >= require_kd)
 
         # do we have allowed datetimes
         if allow_time_periods:
             for time in allow_time_periods:
-                query = query.filter(Activities.period.between(time.start_time, time.end_time))
+                filters.append(Activities.period.between(time.start_time, time.end_time))
 
         # do we have disallowed datetimes
         if disallow_time_periods:
             for time in disallow_time_periods:
-                query = query.filter(not_(Activities.period.between(time.start_time, time.end_time)))
+                filters.append(not_(Activities.period.between(time.start_time, time.end_time)))
 
         # limit max users to player_count
         if maximum_allowed_players is not None:
-            subquery = select(Activities.instance_id)
-            subquery = subquery.join(ActivitiesUsers)
-            subquery = subquery.group_by(Activities.instance_id)
-
-            subquery = subquery.having(func.count(distinct(ActivitiesUsers.destiny_id)) <= maximum_allowed_players)
+            filters.append(Activities.distinct_player_count <= maximum_allowed_players)
 
-            query = query.filter(Activities.instance_id.in_(subquery))
-
-        result = await self._execute_query(db=db, query=query)
-        scalars = result.scalars().fetchall()
-        return scalars
+        return filters
 
     async def get_last_activity(
         self,
@@ -375,6 +743,271 @@ class CRUDActivities(CRUDBase):
         # I heard this can return None instead of 0, so we're doing this
         return result if result else 0
 
+    async def calculate_time_played_by_modes(
+        self,
+        db: AsyncSession,
+        destiny_id: int,
+        modes: list[int],
+        activity_ids: Optional[list[int]] = None,
+        start_time: Optional[datetime.datetime] = None,
+        end_time: Optional[datetime.datetime] = None,
+        character_class: Optional[str] = None,
+    ) -> tuple[dict[int, int], int]:
+        """
+        Calculate the time played (in seconds) for all modes and the activity ids with a single query
+        Returns the time by mode (0 is the total) and the time in the activity ids
+        """
+
+        # one aggregate per mode, each only summing the rows it is interested in
+        # this way activities with multiple modes are counted once per mode and only once for the total
+        modes = list(dict.fromkeys(modes))
+        columns = []
+        for mode in modes:
+            column = func.sum(ActivitiesUsers.time_played_seconds)
+            if mode != 0:
+                column = column.filter(Activities.modes.any(mode))
+            columns.append(column)
+        if activity_ids:
+            columns.append(
+                func.sum(ActivitiesUsers.time_played_seconds).filter(Activities.reference_id.in_(activity_ids))
+            )
+
+        # the query needs at least one column
+        if not columns:
+            return {}, 0
+
+        query = select(*columns)
+        query = query.join(Activities)
+
+        # limit to the allowed times if that is requested
+        if start_time:
+            query = query.filter(Activities.period >= start_time)
+        if end_time:
+            query = query.filter(Activities.period <= end_time)
+
+        # filter the destiny id
+        query = query.filter(ActivitiesUsers.destiny_id == destiny_id)
+
+        # limit the class
+        if character_class:
+            query = query.filter(ActivitiesUsers.character_class == character_class)
+
+        result = await self._execute_query(db=db, query=query)
+        row = [value or 0 for value in result.one()]
+
+        return dict(zip(modes, row)), row[len(modes)] if activity_ids else 0
+
+
+class CRUDActivitiesUsersStats(CRUDBase):
+    async def get(
+        self,
+        db: AsyncSession,
+        destiny_id: int,
+        activity_hashes: Optional[list[int]] = None,
+        no_checkpoints: bool = False,
+        require_team_flawless: bool = False,
+        maximum_allowed_players: Optional[int] = None,
+    ) -> list[ActivitiesUsersStats]:
+        """Get the rollup rows of the user that fulfill the requirements"""
+
+        query = select(ActivitiesUsersStats)
+        query = query.filter(ActivitiesUsersStats.destiny_id == destiny_id)
+
+        # filter activity hashes
+        if activity_hashes:
+            query = query.filter(ActivitiesUsersStats.director_activity_hash.in_(activity_hashes))
+
+        # do we accept non checkpoint runs?
+        if no_checkpoints:
+            query = query.filter(ActivitiesUsersStats.is_checkpoint.is_(False))
+
+        # team flawless required?
+        if require_team_flawless:
+            query = query.filter(ActivitiesUsersStats.team_flawless.is_(True))
+
+        # limit max users to player_count
+        if maximum_allowed_players is not None:
+            query = query.filter(ActivitiesUsersStats.player_count <= maximum_allowed_players)
+
+        result = await self._execute_query(db=db, query=query)
+        return result.scalars().fetchall()
+
+    async def add(self, db: AsyncSession, activities: list[tuple[dict, list[tuple[dict, list[dict]]]]]):
+        """Add the newly inserted activities (as returned by `CRUDActivities._convert_to_values()`) to the rollup"""
+
+        if not (to_add := self._convert_to_stats(activities=activities)):
+            return
+
+        # every row needs a parameter per column
+        chunk_size = max_query_parameters // len(to_add[0])
+        for i in range(0, len(to_add), chunk_size):
+            query = postgresql.insert(ActivitiesUsersStats).values(to_add[i : i + chunk_size])
+
+            # sum up the counters
+            update_dict = {
+                column: getattr(ActivitiesUsersStats, column) + query.excluded[column] for column in stats_sums
+            }
+
+            # keep the fastest run
+            for seconds_column, instance_column in stats_fastest:
+                faster = or_(
+                    getattr(ActivitiesUsersStats, seconds_column).is_(None),
+                    query.excluded[seconds_column] < getattr(ActivitiesUsersStats, seconds_column),
+                )
+                update_dict[seconds_column] = case(
+                    (faster, query.excluded[seconds_column]), else_=getattr(ActivitiesUsersStats, seconds_column)
+                )
+                update_dict[instance_column] = case(
+                    (faster, query.excluded[instance_column]), else_=getattr(ActivitiesUsersStats, instance_column)
+                )
+
+            query = query.on_conflict_do_update(
+                index_elements=[key.name for key in inspect(ActivitiesUsersStats).primary_key], set_=update_dict
+            )
+            await self._execute_query(db=db, query=query)
+
+    @staticmethod
+    def _convert_to_stats(activities: list[tuple[dict, list[tuple[dict, list[dict]]]]]) -> list[dict]:
+        """Aggregate the activities to rollup rows"""
+
+        stats: dict[tuple[int, int, bool, int, bool], dict] = {}
+        for activity, users in activities:
+            player_count = activity["distinct_player_count"]
+            team_flawless = activity["team_deaths"] == 0
+            is_checkpoint = activity["starting_phase_index"] != 0
+
+            # a user can have multiple rows (characters) in an instance
+            rows_by_user: dict[int, list[dict]] = {}
+            for user, _ in users:
+                if user["completion_reason"] == 0:
+                    rows_by_user.setdefault(user["destiny_id"], []).append(user)
+
+            for destiny_id, rows in rows_by_user.items():
+                key = (destiny_id, activity["director_activity_hash"], is_checkpoint, player_count, team_flawless)
+                if key not in stats:
+                    stats[key] = {column: 0 for column in stats_sums}
+                    for seconds_column, instance_column in stats_fastest:
+                        stats[key][seconds_column] = None
+                        stats[key][instance_column] = None
+                entry = stats[key]
+
+                completed_rows = [row for row in rows if row["completed"] == 1]
+                entry["completed_rows"] += len(completed_rows)
+                entry["flawless_completed_rows"] += len([row for row in completed_rows if row["deaths"] == 0])
+                for row in completed_rows:
+                    if (
+                        entry["fastest_completed_row_seconds"] is None
+                        or row["time_played_seconds"] < entry["fastest_completed_row_seconds"]
+                    ):
+                        entry["fastest_completed_row_seconds"] = row["time_played_seconds"]
+                        entry["fastest_completed_row_instance_id"] = activity["instance_id"]
+
+                # the instance duration is the sum of all characters
+                if completed_rows:
+                    duration = sum(row["activity_duration_seconds"] for row in rows)
+                    entry["completed_instances"] += 1
+                    entry["completed_instances_duration_seconds"] += duration
+                    if (
+                        entry["fastest_completed_instance_seconds"] is None
+                        or duration < entry["fastest_completed_instance_seconds"]
+                    ):
+                        entry["fastest_completed_instance_seconds"] = duration
+                        entry["fastest_completed_instance_id"] = activity["instance_id"]
+
+                for column in ["kills", "precision_kills", "deaths", "assists", "time_played_seconds"]:
+                    entry[column] += sum(row[column] for row in rows)
+
+        # sorted by primary key, so concurrent upserts lock the rows in the same order
+        return [
+            {
+                "destiny_id": destiny_id,
+                "director_activity_hash": director_activity_hash,
+                "is_checkpoint": is_checkpoint,
+                "player_count": player_count,
+                "team_flawless": team_flawless,
+                **entry,
+            }
+            for (destiny_id, director_activity_hash, is_checkpoint, player_count, team_flawless), entry in sorted(
+                stats.items()
+            )
+        ]
+
+
+class CRUDActivitiesUsersWeaponsStats(CRUDBase):
+    async def add(self, db: AsyncSession, activities: list[tuple[dict, list[tuple[dict, list[dict]]]]]):
+        """Add the weapons of the newly inserted activities (as returned by `CRUDActivities._convert_to_values()`) to the rollup"""
+
+        if not (to_add := self._convert_to_stats(activities=activities)):
+            return
+
+        # every row needs a parameter per column
+        chunk_size = max_query_parameters // len(to_add[0])
+        for i in range(0, len(to_add), chunk_size):
+            query = postgresql.insert(ActivitiesUsersWeaponsStats).values(to_add[i : i + chunk_size])
+
+            # sum up the counters
+            update_dict = {
+                column: getattr(ActivitiesUsersWeaponsStats, column) + query.excluded[column]
+                for column in weapons_stats_sums
+            }
+
+            # keep the best activity
+            better = query.excluded.best_kills > ActivitiesUsersWeaponsStats.best_kills
+            update_dict["best_kills"] = case(
+                (better, query.excluded.best_kills), else_=ActivitiesUsersWeaponsStats.best_kills
+            )
+            update_dict["best_kills_instance_id"] = case(
+                (better, query.excluded.best_kills_instance_id),
+                else_=ActivitiesUsersWeaponsStats.best_kills_instance_id,
+            )
+
+            query = query.on_conflict_do_update(
+                index_elements=[key.name for key in inspect(ActivitiesUsersWeaponsStats).primary_key], set_=update_dict
+            )
+            await self._execute_query(db=db, query=query)
+
+    @staticmethod
+    def _convert_to_stats(activities: list[tuple[dict, list[tuple[dict, list[dict]]]]]) -> list[dict]:
+        """Aggregate the weapons of the activities to rollup rows. Every weapon usage is added to mode 0 and all modes of the activity"""
+
+        stats: dict[tuple[int, int, int, str, datetime.date], dict] = {}
+        for activity, users in activities:
+            day = activity["period"].astimezone(datetime.timezone.utc).date()
+            modes = {0, *activity["modes"]}
+
+            for user, weapons in users:
+                for weapon in weapons:
+                    for mode in modes:
+                        key = (user["destiny_id"], mode, weapon["weapon_id"], user["character_class"] or "", day)
+                        if key not in stats:
+                            stats[key] = {column: 0 for column in weapons_stats_sums}
+                            stats[key]["best_kills"] = -1
+                            stats[key]["best_kills_instance_id"] = None
+                        entry = stats[key]
+
+                        entry["kills"] += weapon["unique_weapon_kills"]
+                        entry["precision_kills"] += weapon["unique_weapon_precision_kills"]
+                        entry["usages"] += 1
+                        if weapon["unique_weapon_kills"] > entry["best_kills"]:
+                            entry["best_kills"] = weapon["unique_weapon_kills"]
+                            entry["best_kills_instance_id"] = activity["instance_id"]
+
+        # sorted by primary key, so concurrent upserts lock the rows in the same order
+        return [
+            {
+                "destiny_id": destiny_id,
+                "mode": mode,
+                "weapon_id": weapon_id,
+                "character_class": character_class,
+                "day": day,
+                **entry,
+            }
+            for (destiny_id, mode, weapon_id, character_class, day), entry in sorted(stats.items())
+        ]
+
 
 crud_activities_fail_to_get = CRUDActivitiesFailToGet(ActivitiesFailToGet)
 crud_activities = CRUDActivities(Activities)
+crud_activities_archive = CRUDActivitiesArchive(ActivitiesArchive)
+crud_activities_users_stats = CRUDActivitiesUsersStats(ActivitiesUsersStats)
+crud_activities_users_weapons_stats = CRUDActivitiesUsersWeaponsStats(ActivitiesUsersWeaponsStats)
@@ -1,5 +1,7 @@
 from typing import Optional
 
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from Backend.crud.base import CRUDBase
@@ -17,21 +19,31 @@ class CRUDCollectibles(CRUDBase):
         # check if exists in db
         return bool(result)
 
-    async def gotten_collectibles(self, db: AsyncSession, destiny_id: int) -> list[Collectibles]:
-        """Return all gotten collectibles (in the db)"""
+    async def gotten_collectibles(self, db: AsyncSession, destiny_id: int) -> list[int]:
+        """Return the ids of all gotten collectibles (in the db)"""
 
-        results: list[Collectibles] = await self._get_multi(db=db, destiny_id=destiny_id)
-        return results
+        query = select(Collectibles.collectible_id).filter(Collectibles.destiny_id == destiny_id)
+        result = await self._execute_query(db=db, query=query)
+        return result.scalars().all()
 
     async def get_collectible(self, db: AsyncSession, destiny_id: int, collectible_hash: int) -> Optional[Collectibles]:
         """Return the db entry if exists"""
 
         return await self._get_with_key(db, (destiny_id, collectible_hash))
 
-    async def insert_collectibles(self, db: AsyncSession, objs: list[Collectibles]):
-        """Insert the collectible entries in the db"""
-
-        await self._mass_insert(db, objs)
+    async def insert_collectibles(self, db: AsyncSession, destiny_id: int, collectible_ids: list[int]):
+        """Insert the collectible entries in the db. Already existing ones are ignored"""
+
+        # chunk it to stay below the parameter limit
+        for i in range(0, len(collectible_ids), 10_000):
+            query = postgresql.insert(Collectibles).values(
+                [
+                    {"destiny_id": destiny_id, "collectible_id": collectible_id}
+                    for collectible_id in collectible_ids[i : i + 10_000]
+                ]
+            )
+            query = query.on_conflict_do_nothing(index_elements=[Collectibles.destiny_id, Collectibles.collectible_id])
+            await self._execute_query(db=db, query=query)
 
 
 collectibles = CRUDCollectibles(Collectibles)
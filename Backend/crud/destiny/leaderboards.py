@@ -0,0 +1,141 @@
+from sqlalchemy import ARRAY, BigInteger, any_, bindparam, func, not_, select
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Subquery
+
+from Backend.crud.base import CRUDBase
+from Backend.database.models import ActivitiesUsersStats, ActivitiesUsersWeaponsStats
+
+
+class CRUDLeaderboards(CRUDBase):
+    """Ranks many users at once. Each leaderboard is a single query over the rollups"""
+
+    async def get_activities(
+        self, db: AsyncSession, destiny_ids: list[int], activity_hashes: list[int], sort_by: str, ascending: bool
+    ) -> list[Row]:
+        """
+        Rank the users by their stats in the activities
+        Every row has `destiny_id`, `rank`, `value`, the summed up stats, `fastest_seconds` and `average_seconds`
+        """
+
+        full = not_(ActivitiesUsersStats.is_checkpoint)
+        full_completions = func.sum(ActivitiesUsersStats.completed_instances).filter(full)
+
+        query = select(
+            ActivitiesUsersStats.destiny_id,
+            full_completions.label("full_completions"),
+            func.sum(ActivitiesUsersStats.completed_instances)
+            .filter(ActivitiesUsersStats.is_checkpoint)
+            .label("cp_completions"),
+            func.sum(ActivitiesUsersStats.kills).label("kills"),
+            func.sum(ActivitiesUsersStats.precision_kills).label("precision_kills"),
+            func.sum(ActivitiesUsersStats.deaths).label("deaths"),
+            func.sum(ActivitiesUsersStats.assists).label("assists"),
+            func.sum(ActivitiesUsersStats.time_played_seconds).label("time_played_seconds"),
+            func.min(ActivitiesUsersStats.fastest_completed_instance_seconds).filter(full).label("fastest_seconds"),
+            (
+                func.sum(ActivitiesUsersStats.completed_instances_duration_seconds).filter(full)
+                / func.nullif(full_completions, 0)
+            ).label("average_seconds"),
+        )
+        query = query.filter(ActivitiesUsersStats.destiny_id == any_(self._destiny_ids_param(destiny_ids)))
+        query = query.filter(ActivitiesUsersStats.director_activity_hash.in_(activity_hashes))
+        query = query.group_by(ActivitiesUsersStats.destiny_id)
+        stats = query.subquery()
+
+        return await self._rank(
+            db=db,
+            destiny_ids=destiny_ids,
+            stats=stats,
+            values={
+                **{
+                    column: func.coalesce(stats.c[column], 0)
+                    for column in [
+                        "full_completions",
+                        "cp_completions",
+                        "kills",
+                        "precision_kills",
+                        "deaths",
+                        "assists",
+                        "time_played_seconds",
+                    ]
+                },
+                "fastest_seconds": stats.c.fastest_seconds,
+                "average_seconds": stats.c.average_seconds,
+                "precision_percent": stats.c.precision_kills * 100.0 / func.nullif(stats.c.kills, 0),
+            },
+            sort_by=sort_by,
+            ascending=ascending,
+        )
+
+    async def get_weapons(
+        self, db: AsyncSession, destiny_ids: list[int], weapon_ids: list[int], sort_by: str, ascending: bool
+    ) -> list[Row]:
+        """
+        Rank the users by their stats with the weapon
+        Every row has `destiny_id`, `rank`, `value`, `kills` and `precision_kills`
+        """
+
+        query = select(
+            ActivitiesUsersWeaponsStats.destiny_id,
+            func.sum(ActivitiesUsersWeaponsStats.kills).label("kills"),
+            func.sum(ActivitiesUsersWeaponsStats.precision_kills).label("precision_kills"),
+        )
+        query = query.filter(ActivitiesUsersWeaponsStats.destiny_id == any_(self._destiny_ids_param(destiny_ids)))
+        query = query.filter(ActivitiesUsersWeaponsStats.mode == 0)
+        query = query.filter(ActivitiesUsersWeaponsStats.weapon_id.in_(weapon_ids))
+        query = query.group_by(ActivitiesUsersWeaponsStats.destiny_id)
+        stats = query.subquery()
+
+        return await self._rank(
+            db=db,
+            destiny_ids=destiny_ids,
+            stats=stats,
+            values={
+                "kills": func.coalesce(stats.c.kills, 0),
+                "precision_kills": func.coalesce(stats.c.precision_kills, 0),
+                "precision_percent": stats.c.precision_kills * 100.0 / func.nullif(stats.c.kills, 0),
+            },
+            sort_by=sort_by,
+            ascending=ascending,
+        )
+
+    async def _rank(
+        self,
+        db: AsyncSession,
+        destiny_ids: list[int],
+        stats: Subquery,
+        values: dict[str, ColumnElement],
+        sort_by: str,
+        ascending: bool,
+    ) -> list[Row]:
+        """Give every user a row with the values and rank them. Users without a value are ranked last"""
+
+        # users without any stats still get a row
+        users = select(func.unnest(self._destiny_ids_param(destiny_ids)).label("destiny_id")).subquery()
+
+        value = values[sort_by]
+        order = value.asc() if ascending else value.desc()
+        rank = func.rank().over(order_by=order.nulls_last())
+
+        query = select(
+            users.c.destiny_id,
+            *[column.label(name) for name, column in values.items()],
+            value.label("value"),
+            rank.label("rank"),
+        )
+        query = query.select_from(users)
+        query = query.outerjoin(stats, stats.c.destiny_id == users.c.destiny_id)
+        query = query.order_by(rank)
+
+        result = await self._execute_query(db=db, query=query)
+        return result.all()
+
+    @staticmethod
+    def _destiny_ids_param(destiny_ids: list[int]):
+        """The destiny ids as a single array parameter"""
+
+        return bindparam("destiny_ids", value=destiny_ids, type_=ARRAY(BigInteger))
+
+
+crud_leaderboards = CRUDLeaderboards(ActivitiesUsersStats)
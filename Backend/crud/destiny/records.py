@@ -1,5 +1,7 @@
 from typing import Optional
 
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from Backend.crud.base import CRUDBase
@@ -15,21 +17,28 @@ class CRUDRecords(CRUDBase):
         # check if exists in db
         return bool(result)
 
-    async def gotten_records(self, db: AsyncSession, destiny_id: int) -> list[Records]:
-        """Return all gotten records (in the db)"""
+    async def gotten_records(self, db: AsyncSession, destiny_id: int) -> list[int]:
+        """Return the ids of all gotten records (in the db)"""
 
-        results: list[Records] = await self._get_multi(db=db, destiny_id=destiny_id)
-        return results
+        query = select(Records.record_id).filter(Records.destiny_id == destiny_id)
+        result = await self._execute_query(db=db, query=query)
+        return result.scalars().all()
 
     async def get_record(self, db: AsyncSession, destiny_id: int, triumph_hash: int) -> Optional[Records]:
         """Return the db entry if exists"""
 
         return await self._get_with_key(db, (destiny_id, triumph_hash))
 
-    async def insert_records(self, db: AsyncSession, objs: list[Records]):
-        """Insert the record entries to the db"""
+    async def insert_records(self, db: AsyncSession, destiny_id: int, record_ids: list[int]):
+        """Insert the record entries in the db. Already existing ones are ignored"""
 
-        return await self._mass_insert(db, objs)
+        # chunk it to stay below the parameter limit
+        for i in range(0, len(record_ids), 10_000):
+            query = postgresql.insert(Records).values(
+                [{"destiny_id": destiny_id, "record_id": record_id} for record_id in record_ids[i : i + 10_000]]
+            )
+            query = query.on_conflict_do_nothing(index_elements=[Records.destiny_id, Records.record_id])
+            await self._execute_query(db=db, query=query)
 
 
 records = CRUDRecords(Records)
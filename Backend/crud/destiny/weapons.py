@@ -2,18 +2,51 @@ import datetime
 from typing import Optional
 
 from bungio.models import DamageType, DestinyItemSubType
-from sqlalchemy import func, select
+from sqlalchemy import func, literal_column, or_, select, tuple_, union_all
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql import Select
+from sqlalchemy.sql import CompoundSelect, Select
 
-from Backend.bungio.manifest import destiny_manifest
+from Backend.bungio.compactManifest import CompactWeapons
 from Backend.crud.base import CRUDBase
-from Backend.database.models import Activities, ActivitiesUsers, ActivitiesUsersWeapons
+from Backend.database.models import (
+    Activities,
+    ActivitiesUsers,
+    ActivitiesUsersWeapons,
+    ActivitiesUsersWeaponsStats,
+    DestinyWeaponAttributes,
+)
 from Shared.enums.destiny import DestinyWeaponSlotEnum
 from Shared.networkingSchemas.destiny import DestinyTopWeaponsStatInputModelEnum
 
 
+def get_midnight(day: datetime.date) -> datetime.datetime:
+    """Get the start of the utc day"""
+
+    return datetime.datetime.combine(day, datetime.time.min, tzinfo=datetime.timezone.utc)
+
+
+def get_full_days(
+    start_time: Optional[datetime.datetime], end_time: Optional[datetime.datetime]
+) -> tuple[Optional[datetime.date], Optional[datetime.date]]:
+    """Get the first and last day which are completely inside the utc time window. None if the window is open on that side"""
+
+    first_day = None
+    if start_time:
+        first_day = start_time.date()
+        if start_time > get_midnight(first_day):
+            first_day += datetime.timedelta(days=1)
+
+    last_day = None
+    if end_time:
+        # the end time is included, so a day is full if the end time is the last moment of it
+        last_day = (end_time + datetime.timedelta(microseconds=1)).date() - datetime.timedelta(days=1)
+
+    return first_day, last_day
+
+
 class CRUDWeapons(CRUDBase):
     async def get_usage(
         self,
@@ -26,19 +59,14 @@ class CRUDWeapons(CRUDBase):
         activity_hashes: Optional[list[int]] = None,
         start_time: Optional[datetime.datetime] = None,
         end_time: Optional[datetime.datetime] = None,
-    ) -> list[ActivitiesUsersWeapons]:
-        """Return where the specified weapon was used"""
-
-        query = select(ActivitiesUsersWeapons)
-        query = query.join(ActivitiesUsers)
-        query = query.join(Activities)
-
-        # filter by weapon ids
-        query = query.filter(ActivitiesUsersWeapons.weapon_id.in_(weapon_ids))
+    ) -> list[Row]:
+        """
+        Return where the specified weapon was used
+        Every row is either a rollup day or a single usage, with `kills`, `precision_kills`, `usages`, `best_kills` and `best_kills_instance_id`
+        """
 
-        # filter by params
-        query = self.filter_by_params(
-            query=query,
+        query = self._usage_query(
+            weapon_ids=weapon_ids,
             destiny_id=destiny_id,
             character_class=character_class,
             character_ids=character_ids,
@@ -49,14 +77,15 @@ class CRUDWeapons(CRUDBase):
         )
 
         result = await self._execute_query(db=db, query=query)
-        return result.scalars().all()
+        return result.all()
 
     async def get_top(
         self,
         db: AsyncSession,
-        slot: DestinyWeaponSlotEnum,
         stat: DestinyTopWeaponsStatInputModelEnum,
         destiny_id: int,
+        how_many_per_slot: Optional[int] = None,
+        include_weapon_with_ids: Optional[list[int]] = None,
         weapon_type: Optional[DestinyItemSubType] = None,
         damage_type: Optional[DamageType] = None,
         character_class: Optional[str] = None,
@@ -66,45 +95,186 @@ class CRUDWeapons(CRUDBase):
         start_time: Optional[datetime.datetime] = None,
         end_time: Optional[datetime.datetime] = None,
     ) -> list[Row]:
-        """Return the top weapons for the slot sorted by the input stat"""
+        """
+        Return the top weapons of all slots sorted by the input stat
+        Reissued weapons are counted together. Every row has `slot`, `weapon_ids`, `kills`, `precision_kills` and `ranking`
+        """
 
-        # which weapons are okay?
-        allowed_weapon_ids: set[int] = set()
-        weapons = await destiny_manifest.get_all_weapons()
-        for _, weapon in weapons.items():
-            # filter by weapon slot
-            if weapon.inventory.bucket_type_hash != slot.value:
-                continue
+        usages = self._usage_query(
+            destiny_id=destiny_id,
+            character_class=character_class,
+            character_ids=character_ids,
+            mode=mode,
+            activity_hashes=activity_hashes,
+            start_time=start_time,
+            end_time=end_time,
+        ).subquery()
+
+        # sum up the usages of each weapon
+        weapons = select(
+            usages.c.weapon_id,
+            func.sum(usages.c.kills).label("kills"),
+            func.sum(usages.c.precision_kills).label("precision_kills"),
+        )
+        weapons = weapons.group_by(usages.c.weapon_id).subquery()
 
-            # filter by the weapon type
-            if weapon_type and weapon.item_sub_type != weapon_type:
-                continue
+        # sort by the given stat
+        match stat:
+            case stat.KILLS:
+                stat_column = weapons.c.kills  # noqa
+            case _:
+                stat_column = weapons.c.precision_kills  # noqa
+
+        # sum up the reissues and rank them in their slot
+        query = select(
+            DestinyWeaponAttributes.slot,
+            postgresql.array_agg(aggregate_order_by(weapons.c.weapon_id, stat_column.desc())).label("weapon_ids"),
+            func.sum(weapons.c.kills).label("kills"),
+            func.sum(weapons.c.precision_kills).label("precision_kills"),
+            func.row_number()
+            .over(partition_by=DestinyWeaponAttributes.slot, order_by=func.sum(stat_column).desc())
+            .label("ranking"),
+        )
+        query = query.join(DestinyWeaponAttributes, DestinyWeaponAttributes.weapon_id == weapons.c.weapon_id)
+        query = query.group_by(DestinyWeaponAttributes.slot, DestinyWeaponAttributes.name)
 
-            # filter by the damage type
-            if damage_type and weapon.default_damage_type != damage_type:
-                continue
+        # filter by the weapon attributes
+        query = query.filter(DestinyWeaponAttributes.slot.in_([slot.value for slot in DestinyWeaponSlotEnum]))
+        if weapon_type:
+            query = query.filter(DestinyWeaponAttributes.item_sub_type == weapon_type.value)
+        if damage_type:
+            query = query.filter(DestinyWeaponAttributes.default_damage_type == damage_type.value)
 
-            allowed_weapon_ids.add(weapon.hash)
+        # limit the amount per slot, but always include the sought weapon
+        ranked = query.subquery()
+        query = select(ranked).order_by(ranked.c.slot, ranked.c.ranking)
+        if how_many_per_slot:
+            limit = ranked.c.ranking <= how_many_per_slot
+            if include_weapon_with_ids:
+                limit = or_(limit, ranked.c.weapon_ids.overlap(include_weapon_with_ids))
+            query = query.filter(limit)
+
+        result = await self._execute_query(db=db, query=query)  # noqa
+        return result.all()
+
+    def _usage_query(
+        self,
+        destiny_id: int,
+        weapon_ids: Optional[list[int]] = None,
+        character_class: Optional[str] = None,
+        character_ids: Optional[list[int]] = None,
+        mode: Optional[int] = None,
+        activity_hashes: Optional[list[int]] = None,
+        start_time: Optional[datetime.datetime] = None,
+        end_time: Optional[datetime.datetime] = None,
+    ) -> Select | CompoundSelect:
+        """
+        Build the query for the weapon usage
+        Whole days are read from the rollup, only the parts of the days at the edges of the time window get read from the single usages.
+        The rollup does not know about characters or activities, so filtering by them always reads the single usages
+        """
+
+        if character_ids or activity_hashes:
+            return self._single_usage_query(
+                weapon_ids=weapon_ids,
+                destiny_id=destiny_id,
+                character_class=character_class,
+                character_ids=character_ids,
+                mode=mode,
+                activity_hashes=activity_hashes,
+                start_time=start_time,
+                end_time=end_time,
+            )
+
+        # the rollup uses utc days
+        start_time = start_time.astimezone(datetime.timezone.utc) if start_time else None
+        end_time = end_time.astimezone(datetime.timezone.utc) if end_time else None
+        first_day, last_day = get_full_days(start_time=start_time, end_time=end_time)
+
+        # the time window does not cover a full day
+        if first_day and last_day and first_day > last_day:
+            return self._single_usage_query(
+                weapon_ids=weapon_ids,
+                destiny_id=destiny_id,
+                character_class=character_class,
+                mode=mode,
+                start_time=start_time,
+                end_time=end_time,
+            )
+
+        query = select(
+            ActivitiesUsersWeaponsStats.weapon_id,
+            ActivitiesUsersWeaponsStats.kills,
+            ActivitiesUsersWeaponsStats.precision_kills,
+            ActivitiesUsersWeaponsStats.usages,
+            ActivitiesUsersWeaponsStats.best_kills,
+            ActivitiesUsersWeaponsStats.best_kills_instance_id,
+        )
+        query = query.filter(ActivitiesUsersWeaponsStats.destiny_id == destiny_id)
+        query = query.filter(ActivitiesUsersWeaponsStats.mode == (mode or 0))
+        if weapon_ids is not None:
+            query = query.filter(ActivitiesUsersWeaponsStats.weapon_id.in_(weapon_ids))
+        if character_class:
+            query = query.filter(ActivitiesUsersWeaponsStats.character_class == character_class)
+        if first_day:
+            query = query.filter(ActivitiesUsersWeaponsStats.day >= first_day)
+        if last_day:
+            query = query.filter(ActivitiesUsersWeaponsStats.day <= last_day)
+
+        # get the parts of the days which are not covered
+        edges = []
+        if start_time and start_time < get_midnight(first_day):
+            edges.append(Activities.period < get_midnight(first_day))
+        if end_time and end_time >= get_midnight(last_day + datetime.timedelta(days=1)):
+            edges.append(Activities.period >= get_midnight(last_day + datetime.timedelta(days=1)))
+        if not edges:
+            return query
+
+        edge_query = self._single_usage_query(
+            weapon_ids=weapon_ids,
+            destiny_id=destiny_id,
+            character_class=character_class,
+            mode=mode,
+            start_time=start_time,
+            end_time=end_time,
+        )
+        edge_query = edge_query.filter(or_(*edges))
+
+        return union_all(query, edge_query)
+
+    def _single_usage_query(
+        self,
+        destiny_id: int,
+        weapon_ids: Optional[list[int]] = None,
+        character_class: Optional[str] = None,
+        character_ids: Optional[list[int]] = None,
+        mode: Optional[int] = None,
+        activity_hashes: Optional[list[int]] = None,
+        start_time: Optional[datetime.datetime] = None,
+        end_time: Optional[datetime.datetime] = None,
+    ) -> Select:
+        """Build the query for the single weapon usages, with the same columns as the rollup"""
 
-        # do the db request
         query = select(
             ActivitiesUsersWeapons.weapon_id,
-            func.sum(ActivitiesUsersWeapons.unique_weapon_kills).label("kills"),
-            func.sum(ActivitiesUsersWeapons.unique_weapon_precision_kills).label("precision_kills"),
+            ActivitiesUsersWeapons.unique_weapon_kills.label("kills"),
+            ActivitiesUsersWeapons.unique_weapon_precision_kills.label("precision_kills"),
+            literal_column("1").label("usages"),
+            ActivitiesUsersWeapons.unique_weapon_kills.label("best_kills"),
+            Activities.instance_id.label("best_kills_instance_id"),
         )
 
         # join the tables together
+        query = query.select_from(ActivitiesUsersWeapons)
         query = query.join(ActivitiesUsers)
         query = query.join(Activities)
 
-        # group them
-        query = query.group_by(ActivitiesUsersWeapons.weapon_id)
-
-        # filter by weapon
-        query = query.filter(ActivitiesUsersWeapons.weapon_id.in_(allowed_weapon_ids))
+        # filter by weapon ids
+        if weapon_ids is not None:
+            query = query.filter(ActivitiesUsersWeapons.weapon_id.in_(weapon_ids))
 
         # filter by params
-        query = self.filter_by_params(
+        return self.filter_by_params(
             query=query,
             destiny_id=destiny_id,
             character_class=character_class,
@@ -115,16 +285,6 @@ class CRUDWeapons(CRUDBase):
             end_time=end_time,
         )
 
-        # sort by the given stat
-        match stat:
-            case stat.KILLS:
-                query = query.order_by(func.sum(ActivitiesUsersWeapons.unique_weapon_kills).desc())  # noqa
-            case _:
-                query = query.order_by(func.sum(ActivitiesUsersWeapons.unique_weapon_precision_kills).desc())  # noqa
-
-        result = await self._execute_query(db=db, query=query)  # noqa
-        return result.all()
-
     @staticmethod
     def filter_by_params(
         query: Select,
@@ -168,4 +328,35 @@ class CRUDWeapons(CRUDBase):
         return query
 
 
+class CRUDWeaponAttributes(CRUDBase):
+    async def update(self, db: AsyncSession, weapons: CompactWeapons):
+        """Save the attributes of the manifest weapons. Only changed weapons get written"""
+
+        to_update = [
+            {
+                "weapon_id": weapon.hash,
+                "name": weapon.name,
+                "slot": weapon.bucket_type_hash,
+                "item_sub_type": weapon.item_sub_type.value,
+                "default_damage_type": weapon.default_damage_type.value,
+                "ammo_type": weapon.ammo_type.value,
+            }
+            for weapon in sorted(weapons.values(), key=lambda weapon: weapon.hash)
+        ]
+        columns = ["name", "slot", "item_sub_type", "default_damage_type", "ammo_type"]
+
+        # postgres only allows so many parameters per query
+        for i in range(0, len(to_update), 5_000):
+            query = postgresql.insert(DestinyWeaponAttributes).values(to_update[i : i + 5_000])
+            query = query.on_conflict_do_update(
+                index_elements=[DestinyWeaponAttributes.weapon_id],
+                set_={column: query.excluded[column] for column in columns},
+                where=tuple_(*[getattr(DestinyWeaponAttributes, column) for column in columns]).is_distinct_from(
+                    tuple_(*[query.excluded[column] for column in columns])
+                ),
+            )
+            await self._execute_query(db=db, query=query)
+
+
 crud_weapons = CRUDWeapons(ActivitiesUsersWeapons)
+crud_weapon_attributes = CRUDWeaponAttributes(DestinyWeaponAttributes)
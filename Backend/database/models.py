@@ -14,7 +14,9 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    LargeBinary,
     Numeric,
     SmallInteger,
     Text,
@@ -47,15 +49,45 @@ class BackendUser(Base):
 # Destiny Data
 
 
+# pgcrs which could not be fetched. Used as a job queue, which retries them with an exponential backoff
 class ActivitiesFailToGet(Base):
     __tablename__ = "activitiesFailToGet"
+    __table_args__ = (Index("ix_activitiesFailToGet_next_attempt_at", "next_attempt_at"),)
 
     instance_id = Column(BigInteger, nullable=False, primary_key=True)
     period = Column(DateTime(timezone=True), nullable=False)
 
+    attempts = Column(SmallInteger, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, default=get_now_with_tz)
+    last_error = Column(Text, nullable=True)
+
+
+# zstd dictionaries for the pgcr archive
+class ActivitiesArchiveDictionaries(Base):
+    __tablename__ = "activitiesArchiveDictionaries"
+
+    id = Column(Integer, nullable=False, primary_key=True, autoincrement=True)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=get_now_with_tz)
+
+
+# the raw pgcr json, zstd compressed. Append only, so new stats can be derived without fetching everything again
+class ActivitiesArchive(Base):
+    __tablename__ = "activitiesArchive"
+
+    instance_id = Column(BigInteger, nullable=False, primary_key=True)
+    period = Column(DateTime(timezone=True), nullable=False, index=True)
+    dictionary_id = Column(
+        Integer, ForeignKey(ActivitiesArchiveDictionaries.id), nullable=True
+    )  # none if compressed without
+    data = Column(LargeBinary, nullable=False)
+
 
 class Activities(Base):
     __tablename__ = "activities"
+    __table_args__ = (
+        Index("ix_activities_hash_phase_period", "director_activity_hash", "starting_phase_index", "period"),
+    )
 
     instance_id = Column(BigInteger, nullable=False, primary_key=True)
     period = Column(DateTime(timezone=True), nullable=False)
@@ -67,6 +99,10 @@ class Activities(Base):
     is_private = Column(Boolean, nullable=False)
     system = Column(SmallInteger, nullable=False)
 
+    # calculated from the users on insert
+    distinct_player_count = Column(SmallInteger, nullable=False)
+    team_deaths = Column(Integer, nullable=False)
+
     users: list[ActivitiesUsers] = relationship(
         "ActivitiesUsers",
         back_populates="activity",
@@ -78,6 +114,7 @@ class Activities(Base):
 
 class ActivitiesUsers(Base):
     __tablename__ = "activitiesUsers"
+    __table_args__ = (Index("ix_activitiesUsers_destiny_id_instance_id", "destiny_id", "activity_instance_id"),)
 
     id = Column(BigInteger, nullable=False, primary_key=True)
 
@@ -136,6 +173,68 @@ class ActivitiesUsersWeapons(Base):
     user: ActivitiesUsers = relationship("ActivitiesUsers", back_populates="weapons", lazy="selectin")
 
 
+# per user rollup of the activities, maintained on insert. Only includes user rows with `completion_reason == 0`
+class ActivitiesUsersStats(Base):
+    __tablename__ = "activitiesUsersStats"
+
+    destiny_id = Column(BigInteger, nullable=False, primary_key=True)
+    director_activity_hash = Column(BigInteger, nullable=False, primary_key=True)
+    is_checkpoint = Column(Boolean, nullable=False, primary_key=True)
+    player_count = Column(SmallInteger, nullable=False, primary_key=True)  # distinct players in the instance
+    team_flawless = Column(Boolean, nullable=False, primary_key=True)
+
+    # counted per user row (character)
+    completed_rows = Column(Integer, nullable=False)
+    flawless_completed_rows = Column(Integer, nullable=False)
+    fastest_completed_row_seconds = Column(Integer, nullable=True)
+    fastest_completed_row_instance_id = Column(BigInteger, nullable=True)
+
+    # counted per instance, the durations of all characters are summed up
+    completed_instances = Column(Integer, nullable=False)
+    completed_instances_duration_seconds = Column(BigInteger, nullable=False)
+    fastest_completed_instance_seconds = Column(Integer, nullable=True)
+    fastest_completed_instance_id = Column(BigInteger, nullable=True)
+
+    # summed up over all user rows
+    kills = Column(BigInteger, nullable=False)
+    precision_kills = Column(BigInteger, nullable=False)
+    deaths = Column(BigInteger, nullable=False)
+    assists = Column(BigInteger, nullable=False)
+    time_played_seconds = Column(BigInteger, nullable=False)
+
+
+# per user and day rollup of the weapon usage, maintained on insert. Mode 0 includes all modes
+class ActivitiesUsersWeaponsStats(Base):
+    __tablename__ = "activitiesUsersWeaponsStats"
+
+    destiny_id = Column(BigInteger, nullable=False, primary_key=True)
+    mode = Column(SmallInteger, nullable=False, primary_key=True)
+    weapon_id = Column(BigInteger, nullable=False, primary_key=True)
+    character_class = Column(Text, nullable=False, primary_key=True)  # empty if unknown
+    day = Column(Date, nullable=False, primary_key=True)  # utc day of the activity period
+
+    kills = Column(BigInteger, nullable=False)
+    precision_kills = Column(BigInteger, nullable=False)
+    usages = Column(Integer, nullable=False)  # user rows (characters) which used the weapon
+    best_kills = Column(Integer, nullable=False)
+    best_kills_instance_id = Column(BigInteger, nullable=False)
+
+
+# the weapon attributes from the manifest which we filter by. Gets updated when the manifest is loaded
+class DestinyWeaponAttributes(Base):
+    __tablename__ = "destinyWeaponAttributes"
+    __table_args__ = (
+        Index("ix_destinyWeaponAttributes_slot_type_damage", "slot", "item_sub_type", "default_damage_type"),
+    )
+
+    weapon_id = Column(BigInteger, nullable=False, primary_key=True)
+    name = Column(Text, nullable=False)  # reissued weapons have multiple ids, but the same name
+    slot = Column(BigInteger, nullable=False)  # the bucket type hash
+    item_sub_type = Column(SmallInteger, nullable=False)
+    default_damage_type = Column(SmallInteger, nullable=False)
+    ammo_type = Column(SmallInteger, nullable=False)
+
+
 class Records(Base):
     __tablename__ = "records"
 
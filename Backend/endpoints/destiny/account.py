@@ -102,11 +102,13 @@ async def destiny_solos(guild_id: int, discord_id: int):
         user = await discord_users.get_profile_from_discord_id(discord_id, db=db)
         activities = DestinyActivities(db=db, user=user)
 
-        # update the user's db entries
-        await activities.update_activity_db()
+        # make sure the user's db entries are recent, the update can finish in the background
+        as_of = await activities.ensure_fresh()
 
         # get the solo data
-        return await activities.get_solos()
+        result = await activities.get_solos()
+        result.as_of = as_of
+        return result
 
 
 @router.get("/characters", response_model=DestinyCharactersModel)  # has test
@@ -165,54 +167,28 @@ async def time(guild_id: int, discord_id: int, time_input: DestinyTimeInputModel
     async with acquire_db_session() as db:
         user = await discord_users.get_profile_from_discord_id(discord_id, db=db)
 
-        # update the user's db entries
+        # make sure the user's db entries are recent, the update can finish in the background
         activities = DestinyActivities(db=db, user=user)
-        await activities.update_activity_db()
+        as_of = await activities.ensure_fresh()
 
         profile = DestinyProfile(db=db, user=user)
 
-        entries = []
-        if not time_input.activity_ids:
-            # loop through the modes
-            for mode in time_input.modes:
-                entries.append(
-                    DestinyTimeModel(
-                        mode=mode,
-                        time_played=await profile.get_time_played(
-                            start_time=time_input.start_time,
-                            end_time=time_input.end_time,
-                            mode=mode,
-                            character_class=time_input.character_class,
-                        ),
-                    )
-                )
-
-        else:
-            # check the total then the activities
-            entries.append(
-                DestinyTimeModel(
-                    mode=0,
-                    time_played=await profile.get_time_played(
-                        start_time=time_input.start_time,
-                        end_time=time_input.end_time,
-                        mode=0,
-                        character_class=time_input.character_class,
-                    ),
-                )
-            )
-            entries.append(
-                DestinyTimeModel(
-                    activity_ids=time_input.activity_ids,
-                    time_played=await profile.get_time_played(
-                        start_time=time_input.start_time,
-                        end_time=time_input.end_time,
-                        activity_ids=time_input.activity_ids,
-                        character_class=time_input.character_class,
-                    ),
-                )
-            )
+        # get all the times with one query
+        # if activity ids are supplied, the modes are ignored and only the total is returned
+        modes = time_input.modes if not time_input.activity_ids else [0]
+        by_mode, activities_time_played = await profile.get_time_played_by_modes(
+            start_time=time_input.start_time,
+            end_time=time_input.end_time,
+            modes=modes,
+            activity_ids=time_input.activity_ids,
+            character_class=time_input.character_class,
+        )
+
+        entries = [DestinyTimeModel(mode=mode, time_played=by_mode[mode]) for mode in modes]
+        if time_input.activity_ids:
+            entries.append(DestinyTimeModel(activity_ids=time_input.activity_ids, time_played=activities_time_played))
 
-        return DestinyTimesModel(entries=entries)
+        return DestinyTimesModel(entries=entries, as_of=as_of)
 
 
 @router.get("/seasonal_challenges", response_model=SeasonalChallengesModel)  # has test
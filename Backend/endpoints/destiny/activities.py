@@ -56,11 +56,11 @@ async def activity(
     async with acquire_db_session() as db:
         user = await discord_users.get_profile_from_discord_id(discord_id, db=db)
 
-        # update the user's db entries
+        # make sure the user's db entries are recent, the update can finish in the background
         activities = DestinyActivities(db=db, user=user)
-        await activities.update_activity_db()
+        as_of = await activities.ensure_fresh()
 
-        return await activities.get_activity_stats(
+        result = await activities.get_activity_stats(
             activity_ids=activity_input.activity_ids,
             mode=activity_input.mode,
             character_class=activity_input.character_class,
@@ -68,6 +68,8 @@ async def activity(
             start_time=activity_input.start_time,
             end_time=activity_input.end_time,
         )
+        result.as_of = as_of
+        return result
 
 
 @router.get("/get/grandmaster", response_model=DestinyActivitiesModel)  # has test
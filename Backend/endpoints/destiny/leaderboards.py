@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+
+from Backend.core.destiny.leaderboards import DestinyLeaderboards
+from Backend.database import acquire_db_session
+from Shared.networkingSchemas.destiny import DestinyLeaderboardInputModel, DestinyLeaderboardModel
+
+router = APIRouter(
+    prefix="/destiny/leaderboards/{guild_id}",
+    tags=["destiny", "leaderboards"],
+)
+
+
+@router.post("/{leaderboard_name}", response_model=DestinyLeaderboardModel)  # has test
+async def get(guild_id: int, leaderboard_name: str, input_model: DestinyLeaderboardInputModel):
+    """Rank the given users in the leaderboard"""
+
+    async with acquire_db_session() as db:
+        leaderboards = DestinyLeaderboards(db=db, guild_id=guild_id)
+        return await leaderboards.get(leaderboard_name=leaderboard_name, input_model=input_model)
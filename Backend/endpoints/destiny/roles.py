@@ -1,13 +1,15 @@
 from fastapi import APIRouter
+from starlette.responses import StreamingResponse
 
 from Backend.core.destiny.activities import DestinyActivities
 from Backend.core.destiny.profile import DestinyProfile
-from Backend.core.destiny.roles import UserRoles
+from Backend.core.destiny.roles import UserRoles, get_guild_roles_bulk
 from Backend.crud import crud_roles, discord_users
 from Backend.database import acquire_db_session
 from Shared.networkingSchemas import EmptyResponseModel
 from Shared.networkingSchemas.destiny.roles import (
     EarnedRoleModel,
+    EarnedRolesBulkInputModel,
     EarnedRolesModel,
     MissingRolesModel,
     RoleModel,
@@ -48,6 +50,21 @@ async def get_user_all(guild_id: int, discord_id: int):
         return await user_roles.get_guild_roles(guild_id=guild_id)
 
 
+@router.post("/bulk/get/all")  # has test
+async def get_bulk_all(guild_id: int, members: EarnedRolesBulkInputModel):
+    """
+    Get all roles for many users in their guild
+
+    Streams back one `EarnedRolesBulkModel` per line (ndjson) as soon as each user is done
+    """
+
+    async def stream():
+        async for result in get_guild_roles_bulk(guild_id=guild_id, discord_ids=members.discord_ids):
+            yield result.json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @router.get("/{discord_id}/get/missing", response_model=MissingRolesModel)  # has test
 async def get_user_missing(guild_id: int, discord_id: int):
     """Get the missing roles for a user in a guild"""
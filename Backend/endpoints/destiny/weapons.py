@@ -32,23 +32,23 @@ async def get_all():
     format_helper = {}
     for weapon in weapons.values():
         if not weapon.redacted:
-            if weapon.display_properties.name not in format_helper:
+            if weapon.name not in format_helper:
                 format_helper.update(
                     {
-                        weapon.display_properties.name: DestinyWeaponModel(
-                            name=weapon.display_properties.name,
-                            description=weapon.display_properties.description,
+                        weapon.name: DestinyWeaponModel(
+                            name=weapon.name,
+                            description=weapon.description,
                             flavor_text=weapon.flavor_text,
                             weapon_type=weapon.item_sub_type.display_name,
-                            weapon_slot=DestinyWeaponSlotEnum(weapon.inventory.bucket_type_hash).display_name,
+                            weapon_slot=DestinyWeaponSlotEnum(weapon.bucket_type_hash).display_name,
                             damage_type=weapon.default_damage_type.display_name,
-                            ammo_type=weapon.equipping_block.ammo_type.display_name,
+                            ammo_type=weapon.ammo_type.display_name,
                             reference_ids=[weapon.hash],
                         )
                     }
                 )
             else:
-                format_helper[weapon.display_properties.name].reference_ids.append(weapon.hash)
+                format_helper[weapon.name].reference_ids.append(weapon.hash)
 
     return DestinyWeaponsModel(weapons=list(format_helper.values()))
 
@@ -64,12 +64,12 @@ async def get_top(
     async with acquire_db_session() as db:
         user = await discord_users.get_profile_from_discord_id(discord_id, db=db)
 
-        # update the user's db entries
+        # make sure the user's db entries are recent, the update can finish in the background
         activities = DestinyActivities(db=db, user=user)
-        await activities.update_activity_db()
+        as_of = await activities.ensure_fresh()
 
         weapons = DestinyWeapons(db=db, user=user)
-        return await weapons.get_top_weapons(
+        result = await weapons.get_top_weapons(
             stat=input_model.stat,
             how_many_per_slot=input_model.how_many_per_slot,
             include_weapon_with_ids=input_model.include_weapon_with_ids,
@@ -82,6 +82,8 @@ async def get_top(
             start_time=input_model.start_time,
             end_time=input_model.end_time,
         )
+        result.as_of = as_of
+        return result
 
 
 @router.post("/{guild_id}/{discord_id}/weapon", response_model=DestinyWeaponStatsModel)  # has test
@@ -95,12 +97,12 @@ async def get_weapon(
     async with acquire_db_session() as db:
         user = await discord_users.get_profile_from_discord_id(discord_id, db=db)
 
-        # update the user's db entries
+        # make sure the user's db entries are recent, the update can finish in the background
         activities = DestinyActivities(db=db, user=user)
-        await activities.update_activity_db()
+        as_of = await activities.ensure_fresh()
 
         weapons = DestinyWeapons(db=db, user=user)
-        return await weapons.get_weapon_stats(
+        result = await weapons.get_weapon_stats(
             weapon_ids=input_model.weapon_ids,
             character_class=input_model.character_class,
             character_ids=input_model.character_ids,
@@ -109,3 +111,5 @@ async def get_weapon(
             start_time=input_model.start_time,
             end_time=input_model.end_time,
         )
+        result.as_of = as_of
+        return result
@@ -0,0 +1,123 @@
+import asyncio
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import orjson
+from fastapi import APIRouter, Request
+from starlette.types import ASGIApp
+
+from Shared.networkingSchemas import BatchInputModel, BatchRequestModel, BatchResponseModel, BatchResponsesModel
+
+router = APIRouter(
+    prefix="/batch",
+    tags=["batch"],
+)
+
+# how many redirects (mostly trailing slashes) get followed per request
+max_redirects = 5
+
+
+@router.post("", response_model=BatchResponsesModel)  # has test
+async def batch(request: Request, batch_input: BatchInputModel):
+    """
+    Handle many requests at once and return their responses in the same order
+    The requests run concurrently through the whole app, so they behave exactly like they would on their own
+    """
+
+    responses = await asyncio.gather(
+        *[dispatch(app=request.app, batch_request=batch_request) for batch_request in batch_input.requests]
+    )
+    return BatchResponsesModel(responses=responses)
+
+
+async def dispatch(app: ASGIApp, batch_request: BatchRequestModel) -> BatchResponseModel:
+    """Run the request through the app without going over the network"""
+
+    method = batch_request.method.upper()
+    path, _, query_string = batch_request.route.partition("?")
+    body = orjson.dumps(batch_request.data) if batch_request.data is not None else b""
+
+    # no batches in batches
+    if path.rstrip("/") == router.prefix:
+        return BatchResponseModel(status=400)
+
+    for _ in range(max_redirects + 1):
+        try:
+            status, headers, content = await call_app(
+                app=app, method=method, path=path, query_string=query_string, body=body
+            )
+        except Exception:
+            # the exception already got logged by the middleware
+            return BatchResponseModel(status=500)
+
+        if status in (307, 308) and (location := headers.get(b"location")):
+            location = urlsplit(location.decode())
+            path, query_string = location.path, location.query
+            continue
+
+        if b"application/json" in headers.get(b"content-type", b"") and content:
+            return BatchResponseModel(status=status, content=orjson.loads(content))
+        return BatchResponseModel(status=status)
+
+    return BatchResponseModel(status=508)
+
+
+async def call_app(
+    app: ASGIApp, method: str, path: str, query_string: str, body: bytes
+) -> tuple[int, dict[bytes, bytes], bytes]:
+    """Call the asgi app directly. Returns the status, headers and body of the response"""
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [
+            (b"host", b"batch"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": None,
+        "server": None,
+    }
+
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive() -> dict:
+        nonlocal request_sent
+
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        # only disconnect once the response is there
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    status: Optional[int] = None
+    headers: dict[bytes, bytes] = {}
+    chunks: list[bytes] = []
+
+    async def send(message: dict[str, Any]):
+        nonlocal status
+
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers.update((key.lower(), value) for key, value in message.get("headers", []))
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                response_done.set()
+
+    try:
+        await app(scope, receive, send)
+    finally:
+        response_done.set()
+
+    return status, headers, b"".join(chunks)
@@ -15,6 +15,7 @@ from starlette.responses import Response
 from Backend.backgroundEvents import scheduler
 from Backend.bungio.client import get_bungio_client
 from Backend.bungio.manifest import destiny_manifest
+from Backend.core.destiny.activities import load_saved_pgcrs
 from Backend.core.errors import CustomException, handle_bungio_exception, handle_custom_exception
 from Backend.crud import backend_user
 from Backend.database.base import acquire_db_session
@@ -190,6 +191,9 @@ async def startup():
     default_logger.debug(f"< {events_loaded} > Background Events Loaded")
     startup_progress.update(startup_task, advance=1)
 
+    # load the saved activities in the background, the activity updater falls back to the db until this is done
+    scheduler.add_job(func=load_saved_pgcrs, trigger="date")
+
     # collect prometheus stats
     scheduler.add_job(
         func=collect_prometheus_stats,
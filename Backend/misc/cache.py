@@ -5,14 +5,28 @@ from typing import Optional
 from bungio.models import AuthData
 
 from Backend.database.models import DiscordUsers, PersistentMessage, Roles
+from Backend.misc.hashBitset import HashBitset, HashIndex
+from Backend.misc.instanceSet import InstanceSet
+from Backend.misc.profileCache import ProfileCache
+from Shared.networkingSchemas.destiny import DestinyLeaderboardModel
 
 
 @dataclasses.dataclass
 class Cache:
-    # Saved PGCR IDs - Key: instance_id
-    saved_pgcrs: set[int] = dataclasses.field(init=False, default_factory=set)
-    updater_instances: dict[int, datetime.datetime] = dataclasses.field(init=False, default_factory=dict)
+    # Saved PGCR IDs - Key: instance_id. Gets filled on startup
+    saved_pgcrs: InstanceSet = dataclasses.field(init=False, default_factory=InstanceSet)
     updater_running_updates: set[int] = dataclasses.field(init=False, default_factory=set)
+    # When the last activity update started which finished - Key: destiny_id
+    activities_checked: dict[int, datetime.datetime] = dataclasses.field(init=False, default_factory=dict)
+
+    # Computed leaderboards and the destiny_ids in them - Key: (guild_id, leaderboard_name, discord_ids, activity_ids, weapon_ids)
+    # Get dropped once new activities of one of the users get inserted
+    leaderboards: dict[tuple, tuple[frozenset[int], DestinyLeaderboardModel]] = dataclasses.field(
+        init=False, default_factory=dict
+    )
+
+    # Profile responses with their components, shared between requests - Key: destiny_id
+    profiles: ProfileCache = dataclasses.field(init=False, default_factory=ProfileCache)
 
     # User Objects - Key: discord_id
     discord_users: dict[int, DiscordUsers] = dataclasses.field(init=False, default_factory=dict)
@@ -31,11 +45,15 @@ class Cache:
     # Persistent Messages Objects - Key: f"{guild_id}|{message_name}"
     persistent_messages: dict[str, Optional[PersistentMessage]] = dataclasses.field(init=False, default_factory=dict)
 
+    # Dense positions of the triumph / collectible hashes. Get seeded from the manifest
+    triumph_index: HashIndex = dataclasses.field(init=False, default_factory=HashIndex)
+    collectible_index: HashIndex = dataclasses.field(init=False, default_factory=HashIndex)
+
     # User Triumphs - Key: destiny_id[triumph_hash]
-    triumphs: dict[int, set[int]] = dataclasses.field(init=False, default_factory=dict)
+    triumphs: dict[int, HashBitset] = dataclasses.field(init=False, default_factory=dict)
 
     # User Collectibles - Key: destiny_id[collectible_hash]
-    collectibles: dict[int, set[int]] = dataclasses.field(init=False, default_factory=dict)
+    collectibles: dict[int, HashBitset] = dataclasses.field(init=False, default_factory=dict)
 
 
 cache = Cache()
@@ -0,0 +1,101 @@
+from typing import Iterable
+
+
+class HashIndex:
+    """
+    Maps manifest hashes (records, collectibles, ...) to dense positions
+
+    Positions never change once they are handed out, new hashes simply get appended.
+    That way a bitset of positions stays valid across manifest updates.
+    """
+
+    __slots__ = ("_positions", "_hashes")
+
+    def __init__(self):
+        self._positions: dict[int, int] = {}
+        self._hashes: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def seed(self, hashes: Iterable[int]):
+        """Give all unknown hashes a position. Called with the manifest definitions, so most hashes are known up front"""
+
+        for item in sorted(hashes):
+            self.position(item)
+
+    def position(self, item: int) -> int:
+        """Get the position of the hash, assigns a new one if needed"""
+
+        try:
+            return self._positions[item]
+        except KeyError:
+            position = len(self._hashes)
+            self._positions[item] = position
+            self._hashes.append(item)
+            return position
+
+    def to_bits(self, hashes: Iterable[int]) -> int:
+        """Convert the hashes to a bitset"""
+
+        positions = [self.position(item) for item in hashes]
+        if not positions:
+            return 0
+
+        # set the bits in a bytearray, doing `bits |= 1 << position` would copy the whole int every time
+        buffer = bytearray(max(positions) // 8 + 1)
+        for position in positions:
+            buffer[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(buffer, "little")
+
+    def to_hashes(self, bits: int) -> list[int]:
+        """Convert the bitset back to hashes"""
+
+        hashes = []
+        for byte_index, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, "little")):
+            # skip empty bytes, most of them are
+            if not byte:
+                continue
+            for bit in range(8):
+                if byte >> bit & 1:
+                    hashes.append(self._hashes[(byte_index << 3) + bit])
+        return hashes
+
+    def has(self, bits: int, item: int) -> bool:
+        """Check if the hash is in the bitset"""
+
+        position = self._positions.get(item)
+        return position is not None and bool(bits >> position & 1)
+
+
+class HashBitset:
+    """The hashes a user has gotten, saved as a single int with one bit per position in the `HashIndex`"""
+
+    __slots__ = ("index", "bits")
+
+    def __init__(self, index: HashIndex, hashes: Iterable[int] = ()):
+        self.index = index
+        self.bits = index.to_bits(hashes)
+
+    def __contains__(self, item: int) -> bool:
+        return self.index.has(self.bits, item)
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def update(self, hashes: Iterable[int]) -> list[int]:
+        """Add the hashes and return the ones which were not in here before"""
+
+        new_bits = self.diff(hashes)
+        self.add_bits(new_bits)
+        return self.index.to_hashes(new_bits)
+
+    def diff(self, hashes: Iterable[int]) -> int:
+        """Get the bits of the hashes which are not in here yet, without adding them"""
+
+        return self.index.to_bits(hashes) & ~self.bits
+
+    def add_bits(self, bits: int):
+        """Add the hashes of a bitset, like the one from `diff()`"""
+
+        self.bits |= bits
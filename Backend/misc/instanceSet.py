@@ -0,0 +1,163 @@
+import asyncio
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+
+class InstanceSet:
+    """
+    A compact set of instance ids
+
+    The bulk of the ids is kept in a sorted `array("q")` (8 bytes per id instead of ~60 for a python set) and looked up with bisect.
+    New ids are collected in a small python set and merged into the array once enough of them piled up.
+    If an event loop is running, the merge happens in a thread. The ids which are being merged stay visible in the meantime.
+    """
+
+    __slots__ = ("_sorted", "_pending", "_merging", "_removed", "_merging_removed", "_merge_task", "merge_threshold")
+
+    def __init__(self, merge_threshold: int = 10_000):
+        self._sorted = array("q")
+        self._pending: set[int] = set()
+        self._merging: set[int] = set()
+        self._removed: set[int] = set()
+        self._merging_removed: set[int] = set()
+
+        # its **important** that this has a reference, otherwise it might get garbage collected
+        self._merge_task: Optional[asyncio.Task] = None
+
+        self.merge_threshold = merge_threshold
+
+    def __contains__(self, item: int) -> bool:
+        if item in self._pending:
+            return True
+        if item in self._removed:
+            return False
+        return self._in_base(item)
+
+    def __len__(self) -> int:
+        # ids which get removed by the running merge, but were added again, are in the array and pending
+        readded = len(self._pending & self._merging_removed) if self._merging_removed else 0
+        return len(self._sorted) + len(self._merging) + len(self._pending) - len(self._removed) - readded
+
+    def add(self, item: int):
+        """Add an id"""
+
+        if self._in_base(item):
+            self._removed.discard(item)
+
+            # the running merge drops it from the array
+            if item in self._merging_removed:
+                self._pending.add(item)
+            return
+
+        self._pending.add(item)
+
+        # merge the pending ids. The threshold grows with the set, so merging stays cheap on average
+        if not self._merging and len(self._pending) >= max(self.merge_threshold, len(self._sorted) // 8):
+            self._start_merge()
+
+    def update(self, items: Iterable[int], is_sorted: bool = False):
+        """
+        Add many ids at once
+        Ids which are sorted and unique, like the ones from the database, are taken over without copying them one by one if the set is empty
+        """
+
+        if is_sorted and not self._sorted and not self._removed:
+            self._sorted = items if isinstance(items, array) and items.typecode == "q" else array("q", items)
+            self._pending = {item for item in self._pending if not self._in_sorted(item)}
+            return
+
+        new_items = set(items)
+        self._removed.difference_update(new_items)
+        self._pending.update(new_items)
+        if not self._merging:
+            self._start_merge()
+
+    def discard(self, item: int):
+        """Remove an id if it exists"""
+
+        self._pending.discard(item)
+        if self._in_base(item):
+            self._removed.add(item)
+
+    def remove(self, item: int):
+        """Remove an id. Raises a KeyError if it does not exist"""
+
+        if item not in self:
+            raise KeyError(item)
+        self.discard(item)
+
+    def _in_base(self, item: int) -> bool:
+        """Check if the id is in the sorted array or currently being merged into it"""
+
+        return item in self._merging or self._in_sorted(item)
+
+    def _in_sorted(self, item: int) -> bool:
+        """Check if the id is in the sorted array"""
+
+        index = bisect_left(self._sorted, item)
+        return index < len(self._sorted) and self._sorted[index] == item
+
+    def _start_merge(self):
+        """Merge the pending and removed ids into the sorted array. In a thread if possible, so the loop is not blocked"""
+
+        # the removed ids stay in `_removed` until the merge is done, so they stay hidden
+        self._merging = self._pending
+        self._pending = set()
+        removed = self._merging_removed = set(self._removed)
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._finish_merge(merged=self._merge(self._sorted, self._merging, removed))
+            return
+
+        base = self._sorted
+
+        async def merge():
+            merged = await asyncio.to_thread(self._merge, base, self._merging, removed)
+
+            # the array got replaced by `update()` in the meantime, so the merged ids need to go in there too
+            if self._sorted is not base:
+                self._pending.update(item for item in self._merging if not self._in_sorted(item))
+                merged = self._sorted
+
+            self._finish_merge(merged=merged)
+
+        self._merge_task = asyncio.create_task(merge())
+
+    def _finish_merge(self, merged: array):
+        self._sorted = merged
+        self._merging = set()
+        self._merging_removed = set()
+        self._merge_task = None
+
+        # ids which were removed / added during the merge are still in `_removed` / `_pending`
+        self._removed = {item for item in self._removed if self._in_sorted(item)}
+        if len(self._pending) >= max(self.merge_threshold, len(self._sorted) // 8):
+            self._start_merge()
+
+    @staticmethod
+    def _merge(base: array, new_items: set[int], removed: set[int]) -> array:
+        """
+        Get a new sorted array with the new ids and without the removed ones
+        Only the changes are looked at one by one, the parts of the array in between get copied as a whole
+        """
+
+        merged = array("q")
+        start = 0
+        for item in sorted(new_items | removed):
+            index = bisect_left(base, item, start)
+            merged.extend(base[start:index])
+            start = index
+
+            exists = index < len(base) and base[index] == item
+            if item in removed:
+                # skip it
+                if exists:
+                    start += 1
+            elif not exists:
+                merged.append(item)
+
+        merged.extend(base[start:])
+        return merged
@@ -0,0 +1,81 @@
+from typing import Optional
+
+import zstandard
+
+# pgcrs are very similar to each other, so a shared dictionary makes them a lot smaller than compressing them one by one
+dictionary_size = 128 * 1024
+dictionary_samples = 500
+compression_level = 9
+
+
+class PgcrCompressor:
+    """
+    Compresses the raw pgcr json with zstd
+
+    Until a dictionary exists, the pgcrs get compressed without one and are kept as samples.
+    Once enough samples are there, a dictionary can be trained and is used for everything afterwards.
+    Old dictionaries stay known, so everything stays readable.
+
+    The zstd (de)compressors are not thread safe, so every call makes its own. That way batches can run in threads
+    """
+
+    __slots__ = ("dictionary_id", "_dictionaries", "_samples")
+
+    def __init__(self):
+        self.dictionary_id: Optional[int] = None
+
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = {}
+        self._samples: list[bytes] = []
+
+    def add_dictionary(self, dictionary_id: int, data: bytes, use: bool = True):
+        """Make the dictionary known. Everything compressed afterwards uses it if `use` is set"""
+
+        dictionary = zstandard.ZstdCompressionDict(data)
+        dictionary.precompute_compress(level=compression_level)
+        self._dictionaries[dictionary_id] = dictionary
+
+        if use:
+            self.dictionary_id = dictionary_id
+            self._samples = []
+
+    def compress(self, raws: list[bytes]) -> tuple[Optional[int], list[bytes]]:
+        """Compress the pgcrs. Returns the id of the used dictionary and the data"""
+
+        dictionary_id = self.dictionary_id
+        if dictionary_id is None:
+            self._samples.extend(raws[: dictionary_samples - len(self._samples)])
+            compressor = zstandard.ZstdCompressor(level=compression_level)
+        else:
+            compressor = zstandard.ZstdCompressor(level=compression_level, dict_data=self._dictionaries[dictionary_id])
+
+        return dictionary_id, [compressor.compress(raw) for raw in raws]
+
+    def decompress(self, rows: list[tuple[Optional[int], bytes]]) -> list[bytes]:
+        """Decompress the pgcrs with the dictionaries they were compressed with"""
+
+        decompressors = {}
+        result = []
+        for dictionary_id, data in rows:
+            if dictionary_id not in decompressors:
+                decompressors[dictionary_id] = (
+                    zstandard.ZstdDecompressor(dict_data=self._dictionaries[dictionary_id])
+                    if dictionary_id is not None
+                    else zstandard.ZstdDecompressor()
+                )
+            result.append(decompressors[dictionary_id].decompress(data))
+
+        return result
+
+    def knows_dictionary(self, dictionary_id: int) -> bool:
+        return dictionary_id in self._dictionaries
+
+    @property
+    def needs_dictionary(self) -> bool:
+        """If there are enough samples to train a dictionary"""
+
+        return self.dictionary_id is None and len(self._samples) >= dictionary_samples
+
+    def train_dictionary(self) -> bytes:
+        """Train a dictionary from the samples. This is slow, so run it in a thread"""
+
+        return zstandard.train_dictionary(dictionary_size, self._samples, level=compression_level).as_bytes()
@@ -0,0 +1,127 @@
+import asyncio
+import dataclasses
+import time
+from typing import Awaitable, Callable, Iterable, Optional
+
+from bungio.models import DestinyComponentType, DestinyProfileResponse
+
+# how many seconds the profile components stay fresh. The things users change often are kept shorter
+default_component_ttl = 300
+component_ttls: dict[int, int] = {
+    DestinyComponentType.PROFILES.value: 60,
+    DestinyComponentType.PROFILE_INVENTORIES.value: 60,
+    DestinyComponentType.PROFILE_CURRENCIES.value: 60,
+    DestinyComponentType.CHARACTERS.value: 60,
+    DestinyComponentType.CHARACTER_INVENTORIES.value: 60,
+    DestinyComponentType.CHARACTER_EQUIPMENT.value: 60,
+    DestinyComponentType.ITEM_INSTANCES.value: 60,
+    DestinyComponentType.ITEM_SOCKETS.value: 60,
+    DestinyComponentType.CURRENCY_LOOKUPS.value: 60,
+}
+
+# how often the expired entries get dropped
+sweep_interval = 60
+
+
+@dataclasses.dataclass
+class ProfileCacheEntry:
+    components: frozenset[int]
+    expires_at: float
+    profile: DestinyProfileResponse
+
+
+@dataclasses.dataclass
+class ProfileCache:
+    """
+    Profile responses of all users, shared between the requests
+    A cached or in-flight response with more components can also answer requests for less of them
+
+    Concurrent requests for the same user and components share one bungie request (single-flight)
+    The responses are shared too, so they must not get modified
+    """
+
+    # Key: destiny_id
+    entries: dict[int, list[ProfileCacheEntry]] = dataclasses.field(init=False, default_factory=dict)
+    # Key: (destiny_id, components, fresh)
+    in_flight: dict[tuple[int, frozenset[int], bool], asyncio.Task] = dataclasses.field(
+        init=False, default_factory=dict
+    )
+    last_sweep: float = dataclasses.field(init=False, default_factory=time.monotonic)
+
+    async def get(
+        self,
+        destiny_id: int,
+        components: Iterable[int],
+        fetch: Callable[[list[int]], Awaitable[DestinyProfileResponse]],
+        fresh: bool = False,
+    ) -> DestinyProfileResponse:
+        """
+        Get the profile with at least these components. `fetch` gets called with the components if nothing matches
+        `fresh` skips the cached responses, and only joins other requests which are fresh as well
+        """
+
+        components = frozenset(components)
+
+        if not fresh and (entry := self._get_entry(destiny_id=destiny_id, components=components)):
+            return entry.profile
+
+        task = self._get_in_flight(destiny_id=destiny_id, components=components, fresh=fresh)
+        if not task:
+            key = (destiny_id, components, fresh)
+            task = asyncio.create_task(self._fetch(destiny_id=destiny_id, components=components, fetch=fetch))
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+            self.in_flight[key] = task
+
+        # one caller getting cancelled does not cancel the request for the others
+        return await asyncio.shield(task)
+
+    def invalidate(self, destiny_id: int):
+        """Drop the cached responses of the user"""
+
+        self.entries.pop(destiny_id, None)
+
+    def _get_entry(self, destiny_id: int, components: frozenset[int]) -> Optional[ProfileCacheEntry]:
+        # newest first
+        now = time.monotonic()
+        for entry in reversed(self.entries.get(destiny_id, [])):
+            if entry.expires_at > now and components <= entry.components:
+                return entry
+
+    def _get_in_flight(self, destiny_id: int, components: frozenset[int], fresh: bool) -> Optional[asyncio.Task]:
+        for (other_destiny_id, other_components, other_fresh), task in self.in_flight.items():
+            if other_destiny_id == destiny_id and components <= other_components and (other_fresh or not fresh):
+                return task
+
+    async def _fetch(
+        self,
+        destiny_id: int,
+        components: frozenset[int],
+        fetch: Callable[[list[int]], Awaitable[DestinyProfileResponse]],
+    ) -> DestinyProfileResponse:
+        """Request the profile and save it"""
+
+        profile = await fetch(sorted(components))
+        ttl = min(component_ttls.get(component, default_component_ttl) for component in components)
+
+        # the new response replaces the ones it covers
+        entries = [entry for entry in self.entries.get(destiny_id, []) if not entry.components <= components]
+        entries.append(ProfileCacheEntry(components=components, expires_at=time.monotonic() + ttl, profile=profile))
+        self.entries[destiny_id] = entries
+
+        self._sweep()
+        return profile
+
+    def _sweep(self):
+        """Drop the expired entries every once in a while, so the memory does not grow with every user ever seen"""
+
+        now = time.monotonic()
+        if now - self.last_sweep < sweep_interval:
+            return
+        self.last_sweep = now
+
+        for destiny_id in list(self.entries):
+            entries = [entry for entry in self.entries[destiny_id] if entry.expires_at > now]
+            if entries:
+                self.entries[destiny_id] = entries
+            else:
+                self.entries.pop(destiny_id)
@@ -6,6 +6,12 @@ prom_cache = Gauge("backend_cache_count", "Amount of objects in internal caches"
 
 prom_registered_users = Gauge("backend_users", "Amount of registered users")
 
+prom_manifest_warmup = Gauge(
+    "backend_manifest_warmup_seconds",
+    "How long loading the manifest section took on the last manifest update",
+    labelnames=["section"],
+)
+
 prom_clan_activities = Counter("backend_clan_activity", "How many clan members users play with", labelnames=["user_id"])
 
 
@@ -43,6 +49,16 @@ prom_bungie_running = Gauge(
     "Amount of api calls currently running",
     labelnames=bungie_labels,
 )
+prom_bungie_queue_depth = Gauge(
+    "backend_bungie_queue_depth",
+    "Amount of api calls waiting for a ratelimit token",
+    labelnames=["priority"],
+)
+prom_bungie_queue_wait = Histogram(
+    "backend_bungie_queue_wait",
+    "How long api calls waited for a ratelimit token",
+    labelnames=["priority"],
+)
 prom_bungie_errors = Counter(
     "backend_bungie_errors",
     "Amount of errors experienced from bungie",
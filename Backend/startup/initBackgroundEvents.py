@@ -107,7 +107,7 @@ def register_background_events() -> int:
                 func=event.call,
                 trigger="interval",
                 minutes=event.interval_minutes,
-                jitter=15 * 60,
+                jitter=min(15, event.interval_minutes // 4) * 60,
             )
         elif event.scheduler_type == "cron":
             backgroundEvents.scheduler.add_job(
@@ -0,0 +1,76 @@
+import pytest
+from dummyData.insert import mock_bungio_request, mock_request
+from dummyData.static import *
+from httpx import AsyncClient
+from orjson import orjson
+from pytest_mock import MockerFixture
+
+from Shared.networkingSchemas.destiny import DestinyLeaderboardInputModel, DestinyLeaderboardModel
+
+
+@pytest.mark.asyncio
+async def test_get(client: AsyncClient, mocker: MockerFixture):
+    mocker.patch("Backend.networking.http.NetworkBase._request", mock_request)
+    mocker.patch("bungio.http.client.HttpClient._request", mock_bungio_request)
+
+    # activity leaderboard. Unknown users get skipped
+    input_model = DestinyLeaderboardInputModel(
+        discord_ids=[dummy_discord_id, 1], activity_ids=[dummy_activity_reference_id]
+    )
+    r = await client.post(
+        f"/destiny/leaderboards/{dummy_discord_guild_id}/activity_kills", json=orjson.loads(input_model.json())
+    )
+    assert r.status_code == 200
+    data = DestinyLeaderboardModel.parse_obj(r.json())
+    assert data.name == "activity_kills"
+    assert data.sort_by_ascending is False
+    assert len(data.entries) == 1
+    assert data.entries[0].discord_id == dummy_discord_id
+    assert data.entries[0].rank == 1
+    assert data.entries[0].value == 22 + 9
+    assert data.entries[0].full_completions == 1
+    assert data.entries[0].cp_completions == 1
+    assert data.entries[0].kills == 22 + 9
+    assert data.entries[0].precision_kills == 10 + 9
+    assert data.entries[0].deaths == 1 + 9
+    assert data.entries[0].assists == 6 + 9
+    assert data.entries[0].fastest.seconds == 917
+
+    # ascending
+    r = await client.post(
+        f"/destiny/leaderboards/{dummy_discord_guild_id}/activity_fastest", json=orjson.loads(input_model.json())
+    )
+    assert r.status_code == 200
+    data = DestinyLeaderboardModel.parse_obj(r.json())
+    assert data.sort_by_ascending is True
+    assert data.entries[0].value == 917
+
+    # users without stats are still ranked
+    input_model.activity_ids = [8761236781273]
+    r = await client.post(
+        f"/destiny/leaderboards/{dummy_discord_guild_id}/activity_fastest", json=orjson.loads(input_model.json())
+    )
+    assert r.status_code == 200
+    data = DestinyLeaderboardModel.parse_obj(r.json())
+    assert len(data.entries) == 1
+    assert data.entries[0].value is None
+    assert data.entries[0].kills == 0
+
+    # weapon leaderboard
+    input_model = DestinyLeaderboardInputModel(discord_ids=[dummy_discord_id], weapon_ids=[61])
+    r = await client.post(
+        f"/destiny/leaderboards/{dummy_discord_guild_id}/weapon_precision_kills", json=orjson.loads(input_model.json())
+    )
+    assert r.status_code == 200
+    data = DestinyLeaderboardModel.parse_obj(r.json())
+    assert len(data.entries) == 1
+    assert data.entries[0].value == 10 + 9
+    assert data.entries[0].kills == 100 + 9
+    assert data.entries[0].precision_kills == 10 + 9
+
+    # try something that should not work
+    r = await client.post(
+        f"/destiny/leaderboards/{dummy_discord_guild_id}/does_not_exist", json=orjson.loads(input_model.json())
+    )
+    assert r.status_code == 409
+    assert r.json()["error"] == "LeaderboardNotFound"
@@ -9,6 +9,7 @@ from pytest_mock import MockerFixture
 
 from Shared.networkingSchemas.destiny.roles import (
     EarnedRoleModel,
+    EarnedRolesBulkModel,
     EarnedRolesModel,
     MissingRolesModel,
     RequirementActivityModel,
@@ -40,6 +41,32 @@ async def test_get_all(client: AsyncClient, mocker: MockerFixture):
     assert found.guild_id == dummy_discord_guild_id
 
 
+@pytest.mark.asyncio
+async def test_get_bulk_all(client: AsyncClient, mocker: MockerFixture):
+    mocker.patch("Backend.networking.http.NetworkBase._request", mock_request)
+    mocker.patch("bungio.http.client.HttpClient._request", mock_bungio_request)
+
+    r = await client.post(
+        f"/destiny/roles/{dummy_discord_guild_id}/bulk/get/all",
+        json={"discord_ids": [dummy_discord_id, 0]},
+    )
+    assert r.status_code == 200
+
+    # one user per line
+    results = {}
+    for line in r.text.splitlines():
+        data = EarnedRolesBulkModel.parse_raw(line)
+        results[data.discord_id] = data
+    assert len(results) == 2
+
+    assert results[dummy_discord_id].error is None
+    assert results[dummy_discord_id].roles.earned
+    assert results[dummy_discord_id].roles.earned[0].discord_role_id == 1
+
+    assert results[0].roles is None
+    assert results[0].error == "DiscordIdNotFound"
+
+
 @pytest.mark.asyncio
 async def test_get_user(client: AsyncClient, mocker: MockerFixture):
     """Tests: get_user_all(), get_user_missing()"""
@@ -1,3 +1,5 @@
+import datetime
+
 import pytest
 from dummyData.insert import mock_bungio_request, mock_request
 from dummyData.static import *
@@ -153,6 +155,18 @@ async def test_get_weapon(client: AsyncClient, mocker: MockerFixture):
     data = DestinyWeaponStatsModel.parse_obj(r.json())
     assert_weapon_stats(data)
 
+    # the full days come from the rollup, the rest of the time window from the single usages
+    input_model.start_time = datetime.datetime(year=2021, month=1, day=1, hour=17, tzinfo=datetime.timezone.utc)
+    input_model.end_time = get_now_with_tz()
+    r = await client.post(
+        f"/destiny/weapons/{dummy_discord_guild_id}/{dummy_discord_id}/weapon", json=orjson.loads(input_model.json())
+    )
+    assert r.status_code == 200
+    data = DestinyWeaponStatsModel.parse_obj(r.json())
+    assert_weapon_stats(data)
+    input_model.start_time = None
+    input_model.end_time = None
+
     input_model.character_ids = [dummy_character_id]
     r = await client.post(
         f"/destiny/weapons/{dummy_discord_guild_id}/{dummy_discord_id}/weapon", json=orjson.loads(input_model.json())
@@ -0,0 +1,54 @@
+import pytest
+from dummyData.insert import mock_bungio_request, mock_request
+from dummyData.static import *
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from Shared.networkingSchemas import BatchInputModel, BatchRequestModel, BatchResponsesModel, ElevatorGuildsModel
+
+
+@pytest.mark.asyncio
+async def test_batch(client: AsyncClient, mocker: MockerFixture):
+    mocker.patch("Backend.networking.http.NetworkBase._request", mock_request)
+    mocker.patch("bungio.http.client.HttpClient._request", mock_bungio_request)
+
+    # =====================================================================
+    # the responses are in the same order as the requests
+    batch_input = BatchInputModel(
+        requests=[
+            BatchRequestModel(method="POST", route=f"/elevator/discord_servers/add/{dummy_discord_guild_id}"),
+            BatchRequestModel(method="GET", route="/elevator/discord_servers/get/all/"),
+            BatchRequestModel(method="GET", route="/does/not/exist"),
+            BatchRequestModel(method="POST", route="/batch", data={"requests": []}),
+        ]
+    )
+    r = await client.post("/batch", json=batch_input.dict())
+    assert r.status_code == 200
+    data = BatchResponsesModel.parse_obj(r.json())
+    assert len(data.responses) == 4
+    assert data.responses[0].status == 200
+    assert data.responses[1].status == 200
+    assert data.responses[2].status == 404
+    assert data.responses[3].status == 400
+
+    # the trailing slash redirect got followed
+    guilds = ElevatorGuildsModel.parse_obj(data.responses[1].content)
+    assert dummy_discord_guild_id in [guild.guild_id for guild in guilds.guilds]
+
+    # =====================================================================
+    # errors are returned like they would be on their own
+    batch_input = BatchInputModel(
+        requests=[
+            BatchRequestModel(method="GET", route="/destiny/account/0/0/name/"),
+        ]
+    )
+    r = await client.post("/batch", json=batch_input.dict())
+    assert r.status_code == 200
+    data = BatchResponsesModel.parse_obj(r.json())
+    assert data.responses[0].status == 409
+    assert data.responses[0].content["error"] == "DiscordIdNotFound"
+
+    # =====================================================================
+    # clean up
+    r = await client.delete(f"/elevator/discord_servers/delete/{dummy_discord_guild_id}")
+    assert r.status_code == 200
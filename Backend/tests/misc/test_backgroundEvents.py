@@ -1,3 +1,5 @@
+import datetime
+
 import pytest
 from anyio import create_task_group
 from dummyData.insert import mock_bungio_request, mock_request
@@ -5,9 +7,11 @@ from dummyData.static import dummy_discord_id
 from pytest_mock import MockerFixture
 
 from Backend import backgroundEvents
+from Backend.backgroundEvents.activitiesUpdater import get_next_update, max_update_interval, min_update_interval
 from Backend.core.destiny.activities import DestinyActivities
 from Backend.crud import discord_users
 from Backend.database import acquire_db_session
+from Shared.functions.helperFunctions import get_now_with_tz
 
 
 @pytest.mark.asyncio
@@ -34,3 +38,21 @@ async def test_activity_update_parallelisation(mocker: MockerFixture):
                 user = await discord_users.get_profile_from_discord_id(dummy_discord_id, db=db)
                 activities = DestinyActivities(db=db, user=user)
                 tg.start_soon(lambda: activities.update_activity_db())
+
+
+def test_activity_update_schedule():
+    now = get_now_with_tz()
+
+    # online right now
+    assert get_next_update(last_played=now, play_days=0, now=now) == now + min_update_interval
+
+    # played a while ago, the more often they played recently the sooner they get checked
+    rarely = get_next_update(last_played=now - datetime.timedelta(hours=10), play_days=1, now=now)
+    often = get_next_update(last_played=now - datetime.timedelta(hours=10), play_days=10, now=now)
+    assert now + min_update_interval < often < rarely < now + max_update_interval
+
+    # inactive
+    assert (
+        get_next_update(last_played=now - datetime.timedelta(days=100), play_days=0, now=now)
+        == now + max_update_interval
+    )
@@ -0,0 +1,82 @@
+import os
+from types import SimpleNamespace
+
+from bungio.models import DamageType, DestinyAmmunitionType, DestinyItemSubType
+
+from Backend.bungio import compactManifest
+from Backend.bungio.compactManifest import CompactWeapons, load_compact_weapons, save_compact_weapons
+
+
+def test_compact_weapons(tmp_path, monkeypatch):
+    monkeypatch.setattr(compactManifest, "manifest_cache_dir", str(tmp_path))
+
+    # only the used fields are needed
+    definitions = [
+        SimpleNamespace(
+            hash=weapon_hash,
+            inventory=SimpleNamespace(bucket_type_hash=bucket_type_hash, tier_type_name="Legendary"),
+            item_sub_type=item_sub_type,
+            default_damage_type=damage_type,
+            equipping_block=SimpleNamespace(ammo_type=ammo_type),
+            redacted=redacted,
+            display_properties=SimpleNamespace(name=name, description=f"{name} description"),
+            flavor_text=None,
+        )
+        for weapon_hash, bucket_type_hash, item_sub_type, damage_type, ammo_type, redacted, name in [
+            (
+                1,
+                1498876634,
+                DestinyItemSubType.AUTO_RIFLE,
+                DamageType.KINETIC,
+                DestinyAmmunitionType.PRIMARY,
+                False,
+                "Auto Rifle",
+            ),
+            (
+                2,
+                2465295065,
+                DestinyItemSubType.SHOTGUN,
+                DamageType.VOID,
+                DestinyAmmunitionType.SPECIAL,
+                False,
+                "Shotgün",
+            ),
+            (3, 953998645, DestinyItemSubType.NONE, DamageType.NONE, DestinyAmmunitionType.NONE, True, ""),
+        ]
+    ]
+    weapons = CompactWeapons.from_definitions(version="89360.22.10.18", definitions=definitions)
+
+    # nothing saved yet
+    assert load_compact_weapons(version="89360.22.10.18") is None
+
+    save_compact_weapons(weapons=weapons)
+    loaded = load_compact_weapons(version="89360.22.10.18")
+    assert loaded.version == "89360.22.10.18"
+    assert len(loaded) == 3
+    assert 2 in loaded
+    assert 4 not in loaded
+    assert loaded.get(4) is None
+
+    for original, weapon in zip(weapons.values(), loaded.values()):
+        assert weapon.hash == original.hash
+        assert weapon.name == original.name
+        assert weapon.description == original.description
+        assert weapon.flavor_text == original.flavor_text == ""
+        assert weapon.tier_type_name == original.tier_type_name
+        assert weapon.bucket_type_hash == original.bucket_type_hash
+        assert weapon.item_sub_type == original.item_sub_type
+        assert weapon.default_damage_type == original.default_damage_type
+        assert weapon.ammo_type == original.ammo_type
+        assert weapon.redacted == original.redacted
+
+    weapon = loaded.get(2)
+    assert weapon.name == "Shotgün"
+    assert weapon.item_sub_type == DestinyItemSubType.SHOTGUN
+    assert weapon.ammo_type == DestinyAmmunitionType.SPECIAL
+    assert loaded.get(3).redacted is True
+
+    # saving a new version removes the old file
+    weapons.version = "89361.22.10.25"
+    save_compact_weapons(weapons=weapons)
+    assert load_compact_weapons(version="89360.22.10.18") is None
+    assert len(os.listdir(tmp_path)) == 1
@@ -0,0 +1,46 @@
+import random
+
+from Backend.misc.hashBitset import HashBitset, HashIndex
+
+
+def test_hash_bitset():
+    index = HashIndex()
+    index.seed([30, 10, 20])
+    assert len(index) == 3
+    assert index.position(10) == 0
+    assert index.position(30) == 2
+
+    gotten = HashBitset(index=index, hashes=[10, 30])
+    assert len(gotten) == 2
+    assert 10 in gotten
+    assert 20 not in gotten
+    assert 40 not in gotten
+
+    # only the new hashes are returned
+    assert sorted(gotten.update([10, 20, 40])) == [20, 40]
+    assert gotten.update([10, 20, 40]) == []
+    assert len(gotten) == 4
+    assert 40 in gotten
+
+    # the diff does not change the bitset until it is added
+    new_bits = gotten.diff([20, 50])
+    assert index.to_hashes(new_bits) == [50]
+    assert 50 not in gotten
+    gotten.add_bits(new_bits)
+    assert 50 in gotten
+    assert gotten.diff([10, 50]) == 0
+    assert len(gotten) == 5
+
+    # positions stay the same after seeding again
+    index.seed([5, 10, 20, 30, 40])
+    assert index.position(10) == 0
+    assert 5 not in gotten
+    assert sorted(index.to_hashes(gotten.bits)) == [10, 20, 30, 40, 50]
+
+    # compare with a normal set
+    hashes = random.sample(range(1, 10**9), 5000)
+    index.seed(hashes)
+    expected = set(random.sample(hashes, 1000))
+    gotten = HashBitset(index=index, hashes=expected)
+    assert all((item in gotten) == (item in expected) for item in hashes)
+    assert set(index.to_hashes(gotten.bits)) == expected
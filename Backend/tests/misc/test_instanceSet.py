@@ -0,0 +1,89 @@
+import asyncio
+import random
+from array import array
+
+import pytest
+
+from Backend.misc.instanceSet import InstanceSet
+
+
+def test_instance_set():
+    instances = InstanceSet(merge_threshold=10)
+    assert len(instances) == 0
+    assert 1 not in instances
+
+    # bulk load
+    instances.update([5, 1, 3, 3])
+    assert len(instances) == 3
+    assert 1 in instances
+    assert 3 in instances
+    assert 2 not in instances
+
+    # add single ids
+    instances.add(2)
+    instances.add(2)
+    instances.add(3)
+    assert len(instances) == 4
+    assert 2 in instances
+
+    # remove ids from the sorted part and the pending part
+    instances.remove(3)
+    instances.discard(2)
+    instances.discard(100)
+    assert len(instances) == 2
+    assert 3 not in instances
+    assert 2 not in instances
+    with pytest.raises(KeyError):
+        instances.remove(3)
+
+    # re-add a removed id
+    instances.add(3)
+    assert 3 in instances
+    assert len(instances) == 3
+
+    # compare against a normal set with enough ids to trigger merges
+    expected = {1, 3, 5}
+    for _ in range(1000):
+        item = random.randint(0, 500)
+        if random.random() < 0.7:
+            instances.add(item)
+            expected.add(item)
+        else:
+            instances.discard(item)
+            expected.discard(item)
+    assert len(instances) == len(expected)
+    assert all((item in instances) == (item in expected) for item in range(-1, 502))
+
+
+@pytest.mark.asyncio
+async def test_instance_set_background_merge():
+    instances = InstanceSet(merge_threshold=10)
+
+    # sorted ids from the database get taken over as they are
+    ids = array("q", range(0, 1000, 2))
+    instances.update(ids, is_sorted=True)
+    assert len(instances) == 500
+    assert 2 in instances
+    assert 3 not in instances
+
+    # the merges run in a thread, the ids have to stay correct while they run
+    expected = set(ids)
+    for i in range(5000):
+        item = random.randint(0, 1200)
+        if random.random() < 0.7:
+            instances.add(item)
+            expected.add(item)
+        else:
+            instances.discard(item)
+            expected.discard(item)
+
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+            assert len(instances) == len(expected)
+            assert all((item in instances) == (item in expected) for item in range(-1, 1202))
+
+    # wait for the last merge
+    while instances._merge_task:
+        await asyncio.sleep(0.01)
+    assert len(instances) == len(expected)
+    assert all((item in instances) == (item in expected) for item in range(-1, 1202))
@@ -0,0 +1,91 @@
+import datetime
+
+import aiohttp
+import pytest
+from dummyData.insert import mock_bungio_request, mock_request
+from pytest_mock import MockerFixture
+
+from Backend.core.destiny.activities import retry_missing_pgcrs
+from Backend.crud import crud_activities_fail_to_get
+from Backend.crud.destiny.activities import (
+    missing_pgcr_base_backoff,
+    missing_pgcr_max_attempts,
+    missing_pgcr_max_backoff,
+    missing_pgcr_parked_until,
+)
+from Backend.database import acquire_db_session
+from Shared.functions.helperFunctions import get_now_with_tz
+
+missing_instance_ids = [900000001, 900000002]
+
+
+@pytest.mark.asyncio
+async def test_missing_pgcr_claim_and_retry():
+    now = get_now_with_tz()
+    async with acquire_db_session() as db:
+        for instance_id in missing_instance_ids:
+            await crud_activities_fail_to_get.insert(db=db, instance_id=instance_id, period=now)
+
+    async with acquire_db_session() as db:
+        claimed = {row.instance_id: row for row in await crud_activities_fail_to_get.claim(db=db, limit=1000)}
+        assert set(missing_instance_ids) <= set(claimed)
+
+        # other workers skip the locked rows
+        async with acquire_db_session() as other_db:
+            other_claimed = await crud_activities_fail_to_get.claim(db=other_db, limit=1000)
+            assert not {row.instance_id for row in other_claimed} & set(missing_instance_ids)
+
+        # the first attempt gets pushed back by the base backoff
+        row = claimed[missing_instance_ids[0]]
+        await crud_activities_fail_to_get.retry_later(db=db, obj=row, error="first")
+        assert row.attempts == 1
+        assert row.last_error == "first"
+        assert row.next_attempt_at >= now + missing_pgcr_base_backoff
+
+        # the backoff is capped, even for many attempts
+        row = claimed[missing_instance_ids[1]]
+        await crud_activities_fail_to_get._update(db=db, to_update=row, attempts=missing_pgcr_max_attempts - 2)
+        await crud_activities_fail_to_get.retry_later(db=db, obj=row, error="capped")
+        assert row.next_attempt_at <= get_now_with_tz() + missing_pgcr_max_backoff
+
+        # then it gets parked
+        await crud_activities_fail_to_get.retry_later(db=db, obj=row, error="parked")
+        assert row.attempts == missing_pgcr_max_attempts
+        assert row.next_attempt_at == missing_pgcr_parked_until
+
+    # neither is due anymore
+    async with acquire_db_session() as db:
+        claimed = await crud_activities_fail_to_get.claim(db=db, limit=1000)
+        assert not {row.instance_id for row in claimed} & set(missing_instance_ids)
+
+        await crud_activities_fail_to_get.delete(db=db, instance_ids=missing_instance_ids)
+
+
+@pytest.mark.asyncio
+async def test_missing_pgcr_retry_errors(mocker: MockerFixture):
+    mocker.patch("Backend.networking.http.NetworkBase._request", mock_request)
+    mocker.patch("bungio.http.client.HttpClient._request", mock_bungio_request)
+    mocker.patch("aiohttp.ClientSession._request", mock_request)
+
+    # errors which are not from bungio only push the row back, instead of stopping all the workers
+    mocker.patch("bungio.api.ApiClient.get_post_game_carnage_report", side_effect=aiohttp.ClientError("broken"))
+
+    async with acquire_db_session() as db:
+        for instance_id in missing_instance_ids:
+            await crud_activities_fail_to_get.insert(
+                db=db, instance_id=instance_id, period=get_now_with_tz() - datetime.timedelta(days=1)
+            )
+
+    await retry_missing_pgcrs()
+
+    async with acquire_db_session() as db:
+        rows = [
+            row for row in await crud_activities_fail_to_get.get_all(db=db) if row.instance_id in missing_instance_ids
+        ]
+        assert len(rows) == len(missing_instance_ids)
+        for row in rows:
+            assert row.attempts == 1
+            assert row.last_error == "ClientError: broken"
+            assert row.next_attempt_at > get_now_with_tz()
+
+        await crud_activities_fail_to_get.delete(db=db, instance_ids=missing_instance_ids)
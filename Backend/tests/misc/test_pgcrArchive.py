@@ -0,0 +1,77 @@
+import random
+
+import orjson
+
+from Backend.misc.pgcrArchive import PgcrCompressor, dictionary_samples
+
+
+def get_pgcr(instance_id: int) -> bytes:
+    """Get a pgcr-like json, they all share most of their structure"""
+
+    return orjson.dumps(
+        {
+            "period": f"2022-01-{random.randint(10, 28)}T20:00:00Z",
+            "activityDetails": {"referenceId": random.choice([1, 2, 3]), "instanceId": instance_id, "mode": 4},
+            "entries": [
+                {
+                    "player": {"destinyUserInfo": {"membershipId": random.randint(1, 10**18), "membershipType": 3}},
+                    "characterId": random.randint(1, 10**18),
+                    "values": {
+                        name: {"basic": {"value": random.randint(0, 500), "displayValue": "0"}}
+                        for name in ["kills", "deaths", "assists", "completed", "timePlayedSeconds"]
+                    },
+                    "extended": {
+                        "weapons": [
+                            {"referenceId": random.randint(1, 10**9), "values": {"uniqueWeaponKills": {"basic": {}}}}
+                        ]
+                    },
+                }
+                for _ in range(random.randint(1, 6))
+            ],
+        }
+    )
+
+
+def test_pgcr_compressor():
+    compressor = PgcrCompressor()
+    raws = [get_pgcr(instance_id) for instance_id in range(dictionary_samples)]
+
+    # without a dictionary the pgcrs are kept as samples
+    assert not compressor.needs_dictionary
+    dictionary_id, without_dictionary = compressor.compress(raws)
+    assert dictionary_id is None
+    assert compressor.needs_dictionary
+    assert compressor.decompress([(None, data) for data in without_dictionary]) == raws
+
+    # the trained dictionary gets used afterwards and makes them smaller
+    old_dictionary = compressor.train_dictionary()
+    compressor.add_dictionary(dictionary_id=1, data=old_dictionary)
+    assert not compressor.needs_dictionary
+    dictionary_id, with_old_dictionary = compressor.compress(raws)
+    assert dictionary_id == 1
+    assert sum(len(data) for data in with_old_dictionary) < sum(len(data) for data in without_dictionary)
+
+    # a newer dictionary replaces it
+    other = PgcrCompressor()
+    other.compress([get_pgcr(instance_id) for instance_id in range(dictionary_samples)])
+    new_dictionary = other.train_dictionary()
+    compressor.add_dictionary(dictionary_id=2, data=new_dictionary)
+    dictionary_id, with_new_dictionary = compressor.compress(raws)
+    assert dictionary_id == 2
+
+    # rows from all the dictionaries can be read together, also by a compressor which only knows the dictionaries
+    rows = []
+    for index in range(0, len(raws), 3):
+        rows.append((None, without_dictionary[index]))
+        rows.append((1, with_old_dictionary[index]))
+        rows.append((2, with_new_dictionary[index]))
+    expected = [raws[index] for index in range(0, len(raws), 3) for _ in range(3)]
+    assert compressor.decompress(rows) == expected
+
+    reader = PgcrCompressor()
+    reader.add_dictionary(dictionary_id=1, data=old_dictionary, use=False)
+    reader.add_dictionary(dictionary_id=2, data=new_dictionary, use=False)
+    assert reader.dictionary_id is None
+    assert reader.knows_dictionary(1) and reader.knows_dictionary(2)
+    assert not reader.knows_dictionary(3)
+    assert reader.decompress(rows) == expected
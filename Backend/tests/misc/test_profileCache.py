@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from Backend.misc.profileCache import ProfileCache
+
+
+@pytest.mark.asyncio
+async def test_profile_cache():
+    profile_cache = ProfileCache()
+    calls = []
+
+    async def fetch(components: list[int]):
+        calls.append(components)
+        await asyncio.sleep(0.05)
+        return object()
+
+    # concurrent requests share one fetch, also if they need less components
+    results = await asyncio.gather(
+        profile_cache.get(destiny_id=1, components=[100, 200], fetch=fetch),
+        profile_cache.get(destiny_id=1, components=[100, 200], fetch=fetch),
+        profile_cache.get(destiny_id=1, components=[200], fetch=fetch),
+    )
+    assert calls == [[100, 200]]
+    assert results[0] is results[1] is results[2]
+    assert not profile_cache.in_flight
+
+    # cached now
+    assert await profile_cache.get(destiny_id=1, components=[100], fetch=fetch) is results[0]
+    assert len(calls) == 1
+
+    # more components, another user, or fresh data need a new request
+    await profile_cache.get(destiny_id=1, components=[100, 900], fetch=fetch)
+    await profile_cache.get(destiny_id=2, components=[100], fetch=fetch)
+    fresh = await profile_cache.get(destiny_id=1, components=[100], fetch=fetch, fresh=True)
+    assert len(calls) == 4
+    assert fresh is not results[0]
+
+    # the fresh response replaced the older one it covers
+    assert await profile_cache.get(destiny_id=1, components=[100], fetch=fetch) is fresh
+
+    # errors get passed to everyone waiting and do not get cached
+    async def fail(components: list[int]):
+        await asyncio.sleep(0.05)
+        raise ValueError
+
+    profile_cache.invalidate(destiny_id=1)
+    results = await asyncio.gather(
+        profile_cache.get(destiny_id=1, components=[100], fetch=fail),
+        profile_cache.get(destiny_id=1, components=[100], fetch=fail),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, ValueError) for result in results)
+    assert await profile_cache.get(destiny_id=1, components=[100], fetch=fetch)
+    assert len(calls) == 5
@@ -1,3 +1,4 @@
+import asyncio
 import time
 
 import bungio
@@ -5,6 +6,8 @@ import pytest
 from anyio import create_task_group
 from bungio.http import RateLimiter
 
+from Backend.bungio.scheduler import PriorityRateLimiter, RequestPriority, use_request_priority
+
 
 @pytest.mark.asyncio
 async def test_ratelimiter():
@@ -44,3 +47,50 @@ async def test_ratelimiter():
     end = time.perf_counter()
     assert (end - start) >= 10
     assert (end - start) < 20
+
+
+@pytest.mark.asyncio
+async def test_priority_ratelimiter():
+    limiter = PriorityRateLimiter(seconds=1, max_tokens=8)
+    done: list[RequestPriority] = []
+
+    async def request(priority: RequestPriority):
+        with use_request_priority(priority):
+            await limiter.wait_for_token()
+        done.append(priority)
+
+    # a big backfill can only use its budget, the users still get served in the first window
+    start = time.perf_counter()
+    async with create_task_group() as tg:
+        for _ in range(6):
+            tg.start_soon(request, RequestPriority.BACKFILL)
+        for _ in range(4):
+            tg.start_soon(request, RequestPriority.INTERACTIVE)
+    end = time.perf_counter()
+
+    assert done[:6].count(RequestPriority.INTERACTIVE) == 4
+    assert done.count(RequestPriority.BACKFILL) == 6
+    assert (end - start) >= 2
+    assert limiter.get_remaining_budget(RequestPriority.INTERACTIVE) == 1
+
+
+@pytest.mark.asyncio
+async def test_priority_ratelimiter_late_request():
+    limiter = PriorityRateLimiter(seconds=3, max_tokens=40)
+
+    async def request(priority: RequestPriority):
+        with use_request_priority(priority):
+            await limiter.wait_for_token()
+
+    # the backfill uses its budget and the rest of it waits for the next window
+    async with create_task_group() as tg:
+        for _ in range(20):
+            tg.start_soon(request, RequestPriority.BACKFILL)
+
+        # a user showing up afterwards does not have to wait for the window to end, since there are tokens left
+        await asyncio.sleep(0.2)
+        start = time.perf_counter()
+        await request(RequestPriority.INTERACTIVE)
+        assert (time.perf_counter() - start) < 1
+
+        assert limiter.get_remaining_budget(RequestPriority.BACKFILL) == 0
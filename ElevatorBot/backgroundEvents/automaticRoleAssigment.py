@@ -1,7 +1,14 @@
+from anyio import CapacityLimiter, create_task_group
+from naff import Member
+
 from ElevatorBot.backgroundEvents.base import BaseEvent
 from ElevatorBot.core.destiny.roles import Roles
 from ElevatorBot.discordEvents.base import ElevatorClient
-from ElevatorBot.networking.destiny.profile import DestinyProfile
+from ElevatorBot.networking.destiny.roles import DestinyRoles
+from Shared.networkingSchemas.destiny.roles import EarnedRolesModel
+
+# how many members get their discord roles changed at the same time
+role_update_concurrency = 10
 
 
 class AutomaticRoleAssignment(BaseEvent):
@@ -19,9 +26,27 @@ class AutomaticRoleAssignment(BaseEvent):
         )
 
     async def run(self, client: ElevatorClient):
-        # loop through all guilds members
+        limiter = CapacityLimiter(role_update_concurrency)
+
+        # loop through all guilds and get the roles of all their members in one request
         for guild in client.guilds:
-            for member in guild.humans:
-                # ignore know unregistered people
-                if await DestinyProfile(ctx=None, discord_member=member, discord_guild=guild).is_registered():
-                    await Roles(guild=guild, member=member, ctx=None).update()
+            members = {member.id: member for member in guild.humans}
+            if not members:
+                continue
+
+            async with create_task_group() as tg:
+                async for result in DestinyRoles(ctx=None, discord_member=None, discord_guild=guild).get_bulk(
+                    discord_ids=list(members)
+                ):
+                    # unregistered people and failed lookups have no roles
+                    if not result.roles:
+                        continue
+
+                    tg.start_soon(self._apply, limiter, guild, members[result.discord_id], result.roles)
+
+    @staticmethod
+    async def _apply(limiter: CapacityLimiter, guild, member: Member, result: EarnedRolesModel):
+        """Only send the changed roles to discord"""
+
+        async with limiter:
+            await Roles(guild=guild, member=member, ctx=None).apply(result=result)
@@ -0,0 +1,129 @@
+import asyncio
+import dataclasses
+import logging
+from typing import Optional
+
+from naff import GuildForum
+from naff.client.errors import Forbidden, NotFound
+from naff.models.discord.channel import GuildForumPost
+
+from ElevatorBot.networking.destiny.lfgSystem import DestinyLfgSystem
+
+# how long to wait for more lfg changes before sorting, so a burst of them only sorts once
+sort_debounce_seconds = 5
+
+
+def get_posts_to_bump(current: list[int], target: list[int]) -> list[int]:
+    """
+    Get the posts which need to be bumped (in that order) to get from the current to the target order
+    Both orders are from the oldest to the newest activity, so the last one is at the top of the forum
+
+    A bump moves the post to the top. So the posts which are not bumped keep their order at the bottom,
+    and need to be the start of the target order. The longest start of it which is already in order stays
+    """
+
+    in_order = 0
+    for post_id in current:
+        if in_order < len(target) and post_id == target[in_order]:
+            in_order += 1
+
+    return target[in_order:]
+
+
+@dataclasses.dataclass
+class LfgSorter:
+    """
+    Keeps the lfg posts of a guild sorted by their start time, the nearest one at the top
+
+    The forum is sorted by the last activity in the posts, so only the posts which are out of order get bumped
+    The posts are kept between the sorts, and bursts of changes are sorted only once
+    """
+
+    channel: GuildForum
+    backend: DestinyLfgSystem
+
+    # Key: post id
+    posts: dict[int, GuildForumPost] = dataclasses.field(init=False, default_factory=dict)
+
+    # its **important** that this has a reference, otherwise it might get garbage collected
+    _task: Optional[asyncio.Task] = dataclasses.field(init=False, default=None)
+    _dirty: bool = dataclasses.field(init=False, default=False)
+
+    logger_exceptions: logging.Logger = dataclasses.field(
+        init=False, default=logging.getLogger("backgroundEventsExceptions")
+    )
+
+    def request(self):
+        """Sort the posts soon. Returns immediately"""
+
+        self._dirty = True
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        # changes which come in while sorting trigger another sort afterwards
+        while self._dirty:
+            await asyncio.sleep(sort_debounce_seconds)
+            self._dirty = False
+
+            try:
+                await self.sort()
+            except Exception as error:
+                self.logger_exceptions.error(f"Could not sort the lfg posts in `{self.channel.id}`", exc_info=error)
+
+    async def sort(self):
+        """Bump the posts which are out of order"""
+
+        result = await self.backend.get_all()
+
+        # ignore started events
+        start_times = {}
+        for event in result.events:
+            if not event.started and event.message_id:
+                start_times[event.message_id] = event.start_time
+
+        # only continue if there is more than one event
+        if len(start_times) <= 1:
+            return
+
+        # only get the posts which are not known yet
+        self.posts = {post_id: post for post_id, post in self.posts.items() if post_id in start_times}
+        for post_id in start_times:
+            if post_id not in self.posts:
+                if post := await self.channel.fetch_post(post_id):
+                    self.posts[post_id] = post
+
+        # the post id is the id of the first message, so it works for posts without other messages too
+        current = sorted(self.posts, key=lambda post_id: int(self.posts[post_id].last_message_id or post_id))
+
+        # furthest in the future at the bottom. Asap events have the earliest possible start time and go to the top
+        # events with the same start time keep their current order
+        target = sorted(current, key=lambda post_id: start_times[post_id], reverse=True)
+
+        # put a message in the post and then delete it instantly to bump the post
+        for post_id in get_posts_to_bump(current=current, target=target):
+            post = self.posts[post_id]
+            try:
+                bump_msg = await post.send("Sorting...")
+                await bump_msg.delete()
+            except (Forbidden, NotFound):
+                self.posts.pop(post_id)
+                continue
+
+            # the deleted message does not reset the activity
+            post.last_message_id = bump_msg.id
+
+
+# Key: guild id
+lfg_sorters: dict[int, LfgSorter] = {}
+
+
+def get_lfg_sorter(channel: GuildForum, backend: DestinyLfgSystem) -> LfgSorter:
+    """Get the sorter of the guild. A new lfg channel gets a new one"""
+
+    sorter = lfg_sorters.get(channel.guild.id)
+    if not sorter or sorter.channel.id != channel.id:
+        sorter = LfgSorter(channel=channel, backend=backend)
+        lfg_sorters[channel.guild.id] = sorter
+
+    return sorter
@@ -38,6 +38,7 @@ from naff.client.errors import Forbidden, NotFound
 from naff.models.discord.channel import GuildForumPost
 
 from ElevatorBot.commandHelpers import autocomplete
+from ElevatorBot.core.destiny.lfg.lfgSorting import get_lfg_sorter
 from ElevatorBot.core.destiny.lfg.scheduledEvents import delete_lfg_scheduled_events
 from ElevatorBot.core.misc.persistentMessages import PersistentMessages
 from ElevatorBot.discordEvents.base import ElevatorClient
@@ -56,7 +57,6 @@ from Shared.functions.readSettingsFile import get_setting
 from Shared.networkingSchemas.destiny.lfgSystem import LfgCreateInputModel, LfgOutputModel, LfgUpdateInputModel
 
 asap_start_time = datetime.datetime(year=1997, month=6, day=11, tzinfo=datetime.timezone.utc)
-sort_lfg_messages_lock = asyncio.Lock()
 
 
 @dataclasses.dataclass()
@@ -627,62 +627,9 @@ class LfgMessage:
             await self.voice_channel.delete()
 
     async def __sort_lfg_messages(self):
-        """Sort all the lfg messages in the guild by start_time"""
-
-        async with sort_lfg_messages_lock:
-            # get all lfg ids
-            result = await self.backend.get_all()
-            events = result.events
-
-            # only continue if there is more than one event
-            if len(events) <= 1:
-                return
-
-            # get a list with the LfgMessage objs
-            lfg_messages = []
-            for event in events:
-                # ignore started messages
-                if event.started:
-                    continue
-
-                post = await self.channel.fetch_post(event.message_id)
-                message = post.initial_post
-                lfg_messages.append(
-                    LfgMessage(
-                        backend=self.backend,
-                        client=self.client,
-                        id=event.id,
-                        guild=self.guild,
-                        channel=self.channel,
-                        post=post,
-                        author_id=event.author_id,
-                        activity=event.activity,
-                        description=event.description,
-                        start_time=event.start_time if event.start_time != asap_start_time else "asap",
-                        max_joined_members=event.max_joined_members,
-                        message=message,
-                        creation_time=event.creation_time,
-                        joined_ids=event.joined_members,
-                        backup_ids=event.backup_members,
-                        voice_channel=await self.client.fetch_channel(event.voice_channel_id)
-                        if event.voice_channel_id
-                        else None,
-                        voice_category_channel=await self.client.fetch_channel(event.voice_category_channel_id)
-                        if event.voice_category_channel_id
-                        else None,
-                        started=event.started,
-                    )
-                )
-
-            # sort the LfgMessages by their start_time
-            # furthest in the future at the top
-            sorted_lfg_messages = sorted(lfg_messages, reverse=True)
+        """Sort all the lfg messages in the guild by start_time. This happens in the background, and only bumps the posts which are out of order"""
 
-            # put a message in the post and then delete it instantly to bump the post
-            # since the nearest post will be bumped last, it will be at the top
-            for lfg_message in sorted_lfg_messages:
-                bump_msg = await lfg_message.post.send("Sorting...")
-                await bump_msg.delete()
+        get_lfg_sorter(channel=self.channel, backend=self.backend).request()
 
     async def __get_joined_members_display_names(self) -> list[str]:
         """Get the mention strings of the joined members"""
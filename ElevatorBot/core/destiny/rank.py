@@ -12,20 +12,40 @@ from ElevatorBot.misc.helperFunctions import get_emoji_by_name
 from ElevatorBot.networking.destiny.account import DestinyAccount
 from ElevatorBot.networking.destiny.activities import DestinyActivities
 from ElevatorBot.networking.destiny.clan import DestinyClan
+from ElevatorBot.networking.destiny.leaderboards import DestinyLeaderboards
 from ElevatorBot.networking.destiny.profile import DestinyProfile
 from ElevatorBot.networking.destiny.roles import DestinyRoles
-from ElevatorBot.networking.destiny.weapons import DestinyWeapons
-from ElevatorBot.networking.errors import BackendException
 from ElevatorBot.static.destinyActivities import raid_to_emblem_hash
 from ElevatorBot.static.emojis import custom_emojis
-from Shared.enums.destiny import DestinyWeaponTypeEnum, UsableDestinyActivityModeTypeEnum
+from Shared.enums.destiny import DestinyWeaponTypeEnum
 from Shared.networkingSchemas.destiny import (
     DestinyActivityInputModel,
     DestinyActivityModel,
+    DestinyLeaderboardInputModel,
     DestinyWeaponModel,
-    DestinyWeaponStatsInputModel,
 )
 
+# the leaderboards which the backend computes for all members at once
+backend_leaderboards = [
+    "endgame_raids",
+    "endgame_raid_time",
+    "endgame_gms",
+    "endgame_gm_time",
+    "activity_full_completions",
+    "activity_cp_completions",
+    "activity_kills",
+    "activity_precision_kills",
+    "activity_percent_precision_kills",
+    "activity_deaths",
+    "activity_assists",
+    "activity_time_spend",
+    "activity_fastest",
+    "activity_average",
+    "weapon_kills",
+    "weapon_precision_kills",
+    "weapon_precision_kills_percent",
+]
+
 
 @dataclasses.dataclass
 class RankResult:
@@ -145,11 +165,16 @@ class RankCommandHandler:
                 if await DestinyProfile(ctx=None, discord_member=server_member, discord_guild=ctx.guild).is_registered()
             ]
 
-        # get all results in anyio tasks
+        # the backend ranks the db backed leaderboards for all members at once
         results: list[RankResult] = []
-        async with create_task_group() as tg:
-            for discord_member in discord_members:
-                tg.start_soon(self._handle_member, results, ctx, discord_member, leaderboard_name, activity, weapon)
+        if leaderboard_name in backend_leaderboards:
+            results = await self._handle_backend_leaderboard(ctx, discord_members, leaderboard_name, activity, weapon)
+
+        # get all other results in anyio tasks
+        else:
+            async with create_task_group() as tg:
+                for discord_member in discord_members:
+                    tg.start_soon(self._handle_member, results, ctx, discord_member, leaderboard_name, activity, weapon)
 
         # sort the results
         sort_by_ascending = results[0].sort_by_ascending
@@ -216,6 +241,76 @@ class RankCommandHandler:
         embed.description = "\n".join(description)
         await ctx.send(embeds=embed)
 
+    @staticmethod
+    async def _handle_backend_leaderboard(
+        ctx: ElevatorInteractionContext,
+        discord_members: list[Member],
+        leaderboard_name: str,
+        activity: Optional[DestinyActivityModel] = None,
+        weapon: Optional[DestinyWeaponModel] = None,
+    ) -> list[RankResult]:
+        """Get the leaderboard from the backend with one request"""
+
+        input_data = DestinyLeaderboardInputModel(discord_ids=[discord_member.id for discord_member in discord_members])
+        if leaderboard_name in ["endgame_gms", "endgame_gm_time"]:
+            input_data.activity_ids = autocomplete.activities_grandmaster["Grandmaster: All".lower()].activity_ids
+        elif activity:
+            input_data.activity_ids = activity.activity_ids
+        elif weapon:
+            input_data.weapon_ids = weapon.reference_ids
+
+        backend = DestinyLeaderboards(ctx=ctx, discord_member=None, discord_guild=ctx.guild)
+        leaderboard = await backend.get(leaderboard_name=leaderboard_name, input_data=input_data)
+
+        members_by_id = {discord_member.id: discord_member for discord_member in discord_members}
+        results = []
+        for entry in leaderboard.entries:
+            result = RankResult(discord_member=members_by_id[entry.discord_id])
+
+            # the entries are already ranked
+            result.sort_value = entry.rank
+            result.sort_by_ascending = True
+
+            percent = entry.value or 0
+            match leaderboard_name:
+                case "endgame_raids":
+                    result.display_text = f"Raids: {entry.full_completions:,} ({entry.cp_completions:,} CP)"
+
+                case "endgame_gms":
+                    result.display_text = f"Grandmasters: {entry.full_completions:,}"
+
+                case "activity_full_completions" | "activity_cp_completions":
+                    result.display_text = f"Completions: {entry.full_completions:,} ({entry.cp_completions:,} CP)"
+
+                case "activity_kills" | "weapon_kills":
+                    percent = (entry.precision_kills / entry.kills) * 100 if entry.kills else 0
+                    result.display_text = f"Kills: {entry.kills:,} _({round(percent, 2)}% prec)_"
+
+                case "activity_precision_kills" | "weapon_precision_kills":
+                    result.display_text = f"Precision Kills: {entry.precision_kills:,}"
+
+                case "activity_percent_precision_kills" | "weapon_precision_kills_percent":
+                    result.display_text = f"% Precision Kills: {round(percent, 2)}%"
+
+                case "activity_deaths":
+                    result.display_text = f"Deaths: {entry.deaths:,}"
+
+                case "activity_assists":
+                    result.display_text = f"Assists: {entry.assists:,}"
+
+                case "endgame_raid_time" | "endgame_gm_time" | "activity_time_spend":
+                    result.display_text = f"Time Played: {format_timedelta(entry.time_spend)}"
+
+                case "activity_fastest":
+                    result.display_text = f"Fastest Time: {format_timedelta(entry.fastest)}"
+
+                case "activity_average":
+                    result.display_text = f"Average Time: {format_timedelta(entry.average)}"
+
+            results.append(result)
+
+        return results
+
     @staticmethod
     async def _handle_member(
         results: list[RankResult],
@@ -235,7 +330,6 @@ class RankCommandHandler:
         # open connections
         backend_account = DestinyAccount(ctx=ctx, discord_member=discord_member, discord_guild=ctx.guild)
         backend_activities = DestinyActivities(ctx=ctx, discord_member=discord_member, discord_guild=ctx.guild)
-        backend_weapons = DestinyWeapons(ctx=ctx, discord_member=discord_member, discord_guild=ctx.guild)
         backend_roles = DestinyRoles(ctx=ctx, discord_member=discord_member, discord_guild=ctx.guild)
 
         # handle each leaderboard differently
@@ -442,26 +536,6 @@ class RankCommandHandler:
                 result.sort_value = stat.completed
                 result.display_text = f"Catalysts: {stat.completed:,}"
 
-            case "endgame_raids":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(mode=UsableDestinyActivityModeTypeEnum.RAID.value)
-                )
-
-                # save the stat
-                result.sort_value = stat.full_completions
-                result.display_text = f"Raids: {stat.full_completions:,} ({stat.cp_completions:,} CP)"
-
-            case "endgame_raid_time":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(mode=UsableDestinyActivityModeTypeEnum.RAID.value)
-                )
-
-                # save the stat
-                result.sort_value = stat.time_spend
-                result.display_text = f"Time Played: {format_timedelta(stat.time_spend)}"
-
             case "endgame_day_one_raids":
                 # get the stat
                 for raid_name, collectible_id in raid_to_emblem_hash.items():
@@ -473,175 +547,4 @@ class RankCommandHandler:
                 # save the stat
                 result.display_text = f"Raids: {result.sort_value:,}"
 
-            case "endgame_gms":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(
-                        activity_ids=autocomplete.activities_grandmaster["Grandmaster: All".lower()].activity_ids
-                    )
-                )
-
-                # save the stat
-                result.sort_value = stat.full_completions
-                result.display_text = f"Grandmasters: {stat.full_completions:,}"
-
-            case "endgame_gm_time":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(
-                        activity_ids=autocomplete.activities_grandmaster["Grandmaster: All".lower()].activity_ids
-                    )
-                )
-
-                # save the stat
-                result.sort_value = stat.time_spend
-                result.display_text = f"Time Played: {format_timedelta(stat.time_spend)}"
-
-            case "activity_full_completions":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                result.sort_value = stat.full_completions
-                result.display_text = f"Completions: {stat.full_completions:,} ({stat.cp_completions:,} CP)"
-
-            case "activity_cp_completions":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                result.sort_value = stat.cp_completions
-                result.display_text = f"Completions: {stat.full_completions:,} ({stat.cp_completions:,} CP)"
-
-            case "activity_kills":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                percent = (stat.precision_kills / stat.kills) * 100 if stat.kills else 0
-                result.sort_value = stat.kills
-                result.display_text = f"Kills: {stat.kills:,} _({round(percent, 2)}% prec)_"
-
-            case "activity_precision_kills":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                result.sort_value = stat.precision_kills
-                result.display_text = f"Precision Kills: {stat.precision_kills:,}"
-
-            case "activity_percent_precision_kills":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                percent = (stat.precision_kills / stat.kills) * 100 if stat.kills else 0
-                result.sort_value = percent
-                result.display_text = f"% Precision Kills: {round(percent, 2)}%"
-
-            case "activity_deaths":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                result.sort_value = stat.kills
-                result.display_text = f"Deaths: {stat.deaths:,}"
-
-            case "activity_assists":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                result.sort_value = stat.assists
-                result.display_text = f"Assists: {stat.assists:,}"
-
-            case "activity_time_spend":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                result.sort_value = stat.time_spend
-                result.display_text = f"Time Played: {format_timedelta(stat.time_spend)}"
-
-            case "activity_fastest":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                result.sort_value = stat.fastest if stat.fastest else 9999999
-                result.display_text = f"Fastest Time: {format_timedelta(stat.fastest)}"
-
-                result.sort_by_ascending = True
-
-            case "activity_average":
-                # get the stat
-                stat = await backend_activities.get_activity_stats(
-                    input_model=DestinyActivityInputModel(activity_ids=activity.activity_ids)
-                )
-
-                # save the stat
-                result.sort_value = stat.average if stat.average else 9999999
-                result.display_text = f"Average Time: {format_timedelta(stat.average)}"
-
-                result.sort_by_ascending = True
-
-            case "weapon_kills":
-                # get the stat
-                try:
-                    stat = await backend_weapons.get_weapon(
-                        input_data=DestinyWeaponStatsInputModel(weapon_ids=weapon.reference_ids)
-                    )
-                except BackendException:
-                    stat = 0
-
-                # save the stat
-                percent = (stat.total_precision_kills / stat.total_kills) * 100 if stat.total_kills else 0
-                result.sort_value = stat.total_kills
-                result.display_text = f"Kills: {stat.total_kills:,} _({round(percent, 2)}% prec)_"
-
-            case "weapon_precision_kills":
-                # get the stat
-                try:
-                    stat = await backend_weapons.get_weapon(
-                        input_data=DestinyWeaponStatsInputModel(weapon_ids=weapon.reference_ids)
-                    )
-                except BackendException:
-                    stat = 0
-
-                # save the stat
-                result.sort_value = stat.total_precision_kills
-                result.display_text = f"Precision Kills: {stat.total_precision_kills:,}"
-
-            case "weapon_precision_kills_percent":
-                # get the stat
-                try:
-                    stat = await backend_weapons.get_weapon(
-                        input_data=DestinyWeaponStatsInputModel(weapon_ids=weapon.reference_ids)
-                    )
-                except BackendException:
-                    stat = 0
-
-                # save the stat
-                percent = (stat.total_precision_kills / stat.total_kills) * 100 if stat.total_kills else 0
-                result.sort_value = percent
-                result.display_text = f"% Precision Kills: {round(percent, 2)}"
-
         results.append(result)
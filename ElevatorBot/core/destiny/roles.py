@@ -12,7 +12,7 @@ from ElevatorBot.misc.formatting import embed_message
 from ElevatorBot.networking.destiny.roles import DestinyRoles
 from ElevatorBot.networking.errors import BackendException
 from Shared.functions.readSettingsFile import get_setting
-from Shared.networkingSchemas.destiny.roles import RolesCategoryModel
+from Shared.networkingSchemas.destiny.roles import EarnedRolesModel, RolesCategoryModel
 
 
 @dataclasses.dataclass()
@@ -143,24 +143,7 @@ class Roles:
 
         roles_at_start = [role.id for role in self.member.roles]
 
-        # assign new roles
-        await assign_roles_to_member(
-            self.member,
-            *[role_data.discord_role_id for role_data in result.earned],
-            reason="Destiny 2 Role Update",
-        )
-
-        # remove old roles
-        await remove_roles_from_member(
-            self.member,
-            *[role_data.discord_role_id for role_data in result.earned_but_replaced_by_higher_role],
-            reason="Destiny 2 Role Update",
-        )
-        await remove_roles_from_member(
-            self.member,
-            *[role_data.discord_role_id for role_data in result.not_earned],
-            reason="Destiny 2 Role Update",
-        )
+        await self.apply(result=result)
 
         # send a message
         if self.ctx:
@@ -214,6 +197,33 @@ class Roles:
 
             await self.ctx.send(embeds=embed)
 
+    async def apply(self, result: EarnedRolesModel):
+        """Give the member the earned roles and remove the others. Only changed roles get sent to discord"""
+
+        member_role_ids = {role.id for role in self.member.roles}
+
+        # assign new roles
+        await assign_roles_to_member(
+            self.member,
+            *[
+                role_data.discord_role_id
+                for role_data in result.earned
+                if role_data.discord_role_id not in member_role_ids
+            ],
+            reason="Destiny 2 Role Update",
+        )
+
+        # remove old roles
+        await remove_roles_from_member(
+            self.member,
+            *[
+                role_data.discord_role_id
+                for role_data in result.earned_but_replaced_by_higher_role + result.not_earned
+                if role_data.discord_role_id in member_role_ids
+            ],
+            reason="Destiny 2 Role Update",
+        )
+
     async def __sort_by_category(self, items: list[RolesCategoryModel]) -> dict[str, list[str]]:
         """Sort list[RolesCategoryModel] by category"""
 
@@ -0,0 +1,126 @@
+import asyncio
+import dataclasses
+import logging
+from typing import Optional
+
+import aiohttp
+from naff import Client, Embed
+from naff.client.errors import Forbidden, HTTPException, NotFound
+
+from ElevatorBot.core.misc.persistentMessages import PersistentMessages
+from ElevatorBot.networking.errors import BackendException
+
+# how many messages get sent at once. Naff waits for the discord ratelimit buckets of the routes itself
+delivery_workers = 10
+
+# how often a message gets tried to be sent if discord has problems, and how long to wait in between
+delivery_attempts = 3
+delivery_retry_seconds = 2
+
+
+@dataclasses.dataclass(eq=False)
+class MessageDeliveryJob:
+    """A message which needs to be sent to many channels"""
+
+    content: Optional[str]
+    embed: Optional[Embed]
+    targets: list[dict]  # {"guild_id": int, "channel_id": int}
+
+    # the persistent message which gets deleted for guilds where the channel is gone
+    message_name: Optional[str] = None
+
+    remaining: int = dataclasses.field(init=False)
+    dead_targets: list[dict] = dataclasses.field(init=False, default_factory=list)
+
+    def __post_init__(self):
+        self.remaining = len(self.targets)
+
+
+@dataclasses.dataclass
+class MessageDelivery:
+    """
+    Sends messages to many channels concurrently in the background
+
+    Every channel is handled by a worker on its own, so one slow or broken channel does not hold up the others
+    Channels which do not exist anymore are reported to the backend once the whole job is done
+    Other failures (like missing permissions) only get logged, so the subscription is kept
+    """
+
+    queue: asyncio.Queue = dataclasses.field(init=False, default_factory=asyncio.Queue)
+
+    # its **important** that these have a reference, otherwise they might get garbage collected
+    _workers: list[asyncio.Task] = dataclasses.field(init=False, default_factory=list)
+    _reports: set[asyncio.Task] = dataclasses.field(init=False, default_factory=set)
+
+    logger: logging.Logger = dataclasses.field(init=False, default=logging.getLogger("webServer"))
+    logger_exceptions: logging.Logger = dataclasses.field(init=False, default=logging.getLogger("webServerExceptions"))
+
+    def enqueue(self, client: Client, job: MessageDeliveryJob):
+        """Queue the message for all its channels. Returns immediately"""
+
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(delivery_workers)]
+
+        for target in job.targets:
+            self.queue.put_nowait((client, job, target))
+
+    async def _work(self):
+        while True:
+            client, job, target = await self.queue.get()
+            try:
+                if not await self._deliver(client=client, job=job, target=target):
+                    job.dead_targets.append(target)
+            except Exception as error:
+                self.logger_exceptions.error(f"Could not deliver message to `{target}`", exc_info=error)
+            finally:
+                self.queue.task_done()
+
+                job.remaining -= 1
+                if job.remaining == 0 and job.dead_targets:
+                    task = asyncio.create_task(self._report_dead_targets(job=job))
+                    self._reports.add(task)
+                    task.add_done_callback(self._reports.discard)
+
+    async def _deliver(self, client: Client, job: MessageDeliveryJob, target: dict) -> bool:
+        """Send the message to the channel. Returns False if the channel is gone, raises if it could not be sent otherwise"""
+
+        for attempt in range(delivery_attempts):
+            try:
+                if not (channel := await client.fetch_channel(target["channel_id"])):
+                    return False
+
+                await channel.send(content=job.content, embeds=job.embed)
+                return True
+
+            except NotFound:
+                return False
+
+            except Forbidden as error:
+                # missing permissions can be fixed again, so the channel is not gone
+                raise error
+
+            except (HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as error:
+                # only server errors are worth another try
+                if (isinstance(error, HTTPException) and error.status < 500) or attempt == delivery_attempts - 1:
+                    raise error
+
+                await asyncio.sleep(delivery_retry_seconds * 2**attempt)
+
+    async def _report_dead_targets(self, job: MessageDeliveryJob):
+        """Tell the backend about all the channels which are gone"""
+
+        self.logger.info(f"Could not deliver message to `{len(job.dead_targets)}` channels: `{job.dead_targets}`")
+        if not job.message_name:
+            return
+
+        async def delete(target: dict):
+            persistent_messages = PersistentMessages(ctx=None, guild=None, message_name=None)
+            try:
+                await persistent_messages.delete(message_name=job.message_name, guild_id=target["guild_id"])
+            except BackendException:
+                pass
+
+        await asyncio.gather(*[delete(target) for target in job.dead_targets])
+
+
+message_delivery = MessageDelivery()
@@ -0,0 +1,142 @@
+import asyncio
+import dataclasses
+import logging
+from typing import Optional
+
+from naff import Client, Guild, Member
+from naff.api.events import GuildLeft
+from naff.client.errors import Forbidden
+
+from ElevatorBot.discordEvents.guildEvents import on_guild_left
+from ElevatorBot.prometheus.stats import role_updates_applied, role_updates_guilds_running, role_updates_queued
+
+# how many guilds get their roles applied at once. The members of one guild share a discord ratelimit bucket
+role_application_guilds = 5
+
+
+@dataclasses.dataclass
+class RoleDiff:
+    """The roles a member should get and lose"""
+
+    to_assign: set[int] = dataclasses.field(default_factory=set)
+    to_remove: set[int] = dataclasses.field(default_factory=set)
+    reason: Optional[str] = None
+
+    def merge(self, to_assign: set[int], to_remove: set[int], reason: Optional[str] = None):
+        """Add a newer change. It wins over this one for the roles both touch"""
+
+        self.to_assign = (self.to_assign - to_remove) | to_assign
+        self.to_remove = (self.to_remove - to_assign) | to_remove
+        self.reason = reason or self.reason
+
+
+@dataclasses.dataclass
+class RoleApplication:
+    """
+    Applies role changes of many members in the background
+
+    The changes are grouped by guild and member, so multiple changes for the same member become one
+    Every member gets their final role set in a single discord call, instead of one call per role
+    Guilds run concurrently, the members of one guild one after another
+    """
+
+    # Key: guild_id, member_id
+    pending: dict[int, dict[int, RoleDiff]] = dataclasses.field(init=False, default_factory=dict)
+
+    # its **important** that these have a reference, otherwise they might get garbage collected
+    _guild_tasks: dict[int, asyncio.Task] = dataclasses.field(init=False, default_factory=dict)
+    _semaphore: asyncio.Semaphore = dataclasses.field(
+        init=False, default_factory=lambda: asyncio.Semaphore(role_application_guilds)
+    )
+
+    logger_exceptions: logging.Logger = dataclasses.field(init=False, default=logging.getLogger("webServerExceptions"))
+
+    def enqueue(
+        self,
+        client: Client,
+        guild_id: int,
+        member_id: int,
+        to_assign: Optional[list[int]] = None,
+        to_remove: Optional[list[int]] = None,
+        reason: Optional[str] = None,
+    ):
+        """Queue the role changes of the member. Returns immediately"""
+
+        members = self.pending.setdefault(guild_id, {})
+        if member_id not in members:
+            members[member_id] = RoleDiff()
+            role_updates_queued.inc()
+        members[member_id].merge(to_assign=set(to_assign or []), to_remove=set(to_remove or []), reason=reason)
+
+        if guild_id not in self._guild_tasks:
+            task = asyncio.create_task(self._work_guild(client=client, guild_id=guild_id))
+            self._guild_tasks[guild_id] = task
+
+    async def _work_guild(self, client: Client, guild_id: int):
+        """Apply the changes of the guild until there are none left"""
+
+        async with self._semaphore:
+            role_updates_guilds_running.inc()
+            try:
+                guild = None
+                while members := self.pending.pop(guild_id, None):
+                    role_updates_queued.dec(len(members))
+
+                    # make sure the guild can still be found
+                    try:
+                        guild = guild or await client.fetch_guild(guild_id)
+                    except Forbidden:
+                        continue
+                    if not guild:
+                        await on_guild_left(GuildLeft(guild_id=guild_id))
+                        continue
+
+                    for member_id, diff in members.items():
+                        try:
+                            await self._apply(guild=guild, member_id=member_id, diff=diff)
+                        except Exception as error:
+                            self.logger_exceptions.error(
+                                f"Could not apply roles `{diff}` for `{member_id}` in `{guild_id}`", exc_info=error
+                            )
+            finally:
+                # nothing is pending anymore, and there is no await until here, so no new changes can be missed
+                self._guild_tasks.pop(guild_id, None)
+                role_updates_guilds_running.dec()
+
+    @staticmethod
+    async def _apply(guild: Guild, member_id: int, diff: RoleDiff):
+        """Give the member their final role set with as few calls as possible"""
+
+        member: Optional[Member] = await guild.fetch_member(member_id)
+        if not member or member.pending:
+            role_updates_applied.labels(method="skipped").inc()
+            return
+
+        # only use roles which still exist
+        to_assign = set()
+        for role_id in diff.to_assign:
+            if await guild.fetch_role(role_id):
+                to_assign.add(role_id)
+
+        current = {role.id for role in member.roles}
+        added = to_assign - current
+        removed = diff.to_remove & current
+
+        # a single change costs one call either way
+        if not added and not removed:
+            method = "unchanged"
+        elif len(added) + len(removed) == 1:
+            if added:
+                method = "add"
+                await member.add_role(role=added.pop(), reason=diff.reason)
+            else:
+                method = "remove"
+                await member.remove_role(role=removed.pop(), reason=diff.reason)
+        else:
+            method = "edit"
+            await member.edit(roles=list((current | added) - removed), reason=diff.reason)
+
+        role_updates_applied.labels(method=method).inc()
+
+
+role_application = RoleApplication()
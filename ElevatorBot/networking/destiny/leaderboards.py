@@ -0,0 +1,28 @@
+import dataclasses
+from typing import Optional
+
+from naff import Guild, Member
+
+from ElevatorBot.networking.http import BaseBackendConnection
+from ElevatorBot.networking.routes import destiny_leaderboards_get_route
+from Shared.networkingSchemas.destiny import DestinyLeaderboardInputModel, DestinyLeaderboardModel
+
+
+@dataclasses.dataclass
+class DestinyLeaderboards(BaseBackendConnection):
+    discord_guild: Optional[Guild]
+    discord_member: Optional[Member]
+
+    async def get(self, leaderboard_name: str, input_data: DestinyLeaderboardInputModel) -> DestinyLeaderboardModel:
+        """Rank all the given members in the leaderboard at once"""
+
+        result = await self._backend_request(
+            method="POST",
+            route=destiny_leaderboards_get_route.format(
+                guild_id=self.discord_guild.id, leaderboard_name=leaderboard_name
+            ),
+            data=input_data,
+        )
+
+        # convert to correct pydantic model
+        return DestinyLeaderboardModel.parse_obj(result.result)
@@ -1,5 +1,5 @@
 import dataclasses
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from naff import Guild, Role
 
@@ -9,10 +9,17 @@ from ElevatorBot.networking.routes import (
     destiny_role_delete_all_route,
     destiny_role_delete_route,
     destiny_role_get_all_user_route,
+    destiny_role_get_bulk_route,
     destiny_role_get_missing_user_route,
     destiny_role_get_user_route,
 )
-from Shared.networkingSchemas.destiny.roles import EarnedRoleModel, EarnedRolesModel, MissingRolesModel
+from Shared.networkingSchemas.destiny.roles import (
+    EarnedRoleModel,
+    EarnedRolesBulkInputModel,
+    EarnedRolesBulkModel,
+    EarnedRolesModel,
+    MissingRolesModel,
+)
 
 
 @dataclasses.dataclass
@@ -33,6 +40,17 @@ class DestinyRoles(BaseBackendConnection):
         # convert to correct pydantic model
         return EarnedRolesModel.parse_obj(result.result)
 
+    async def get_bulk(self, discord_ids: list[int]) -> AsyncIterator[EarnedRolesBulkModel]:
+        """Get the roles of many users in the guild. Yields them as soon as the backend is done with them"""
+
+        async for result in self._backend_stream_request(
+            method="POST",
+            route=destiny_role_get_bulk_route.format(guild_id=self.discord_guild.id),
+            data=EarnedRolesBulkInputModel(discord_ids=discord_ids),
+        ):
+            # convert to correct pydantic model
+            yield EarnedRolesBulkModel.parse_obj(result)
+
     async def get_missing(self) -> MissingRolesModel:
         """Get the users missing roles in the guild"""
 
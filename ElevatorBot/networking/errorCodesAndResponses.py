@@ -39,6 +39,7 @@ def get_error_codes_and_responses(client: Optional["Elevator"] = None):
             "PollOptionNotExist": "This option does not exist. Make sure you spelled it correctly",
             "PollNotExist": "This poll ID does not exist",
             "NoActivityFound": "{discord_member.mention} has never done an activity that fulfills the given requirements",
+            "LeaderboardNotFound": "I do not know that leaderboard",
             "WeaponUnused": "{discord_member.mention} has never used the specified weapon in any activity that fulfills the given requirements",
             "WeaponTypeMismatch": "This weapon does not belong to the specified weapon type",
             "WeaponDamageTypeMismatch": "This weapon does not have the specified damage type",
@@ -4,19 +4,23 @@ import logging
 import os
 from asyncio import Semaphore
 from datetime import timedelta
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
 
 import aiohttp
 import aiohttp_client_cache
 import orjson
 from aiohttp import ClientTimeout
+from aiohttp_client_cache.cache_control import get_url_expiration, url_match
 from bungio.http import RateLimiter
 from naff import Member, Message
+from yarl import URL
 
 from ElevatorBot.discordEvents.customInteractions import ElevatorComponentContext, ElevatorInteractionContext
 from ElevatorBot.networking.errors import BackendException
 from ElevatorBot.networking.results import BackendResult
+from ElevatorBot.networking.routes import base_route
 from Shared.functions.readSettingsFile import get_setting
+from Shared.networkingSchemas import BatchInputModel, BatchRequestModel, BatchResponsesModel
 from Shared.networkingSchemas.base import CustomBaseModel
 
 # the limiter object to not overload the backend
@@ -44,6 +48,180 @@ backend_cache = aiohttp_client_cache.RedisBackend(
 )
 _no_default = object()
 
+# the pooled connections to the backend. Get created on first use, since they need the running loop
+backend_connections = 200
+backend_dns_cache_seconds = 300
+_backend_session: Optional[aiohttp_client_cache.CachedSession] = None
+_backend_uncached_session: Optional[aiohttp.ClientSession] = None
+
+# how long requests wait for others to be sent together with, and how many requests get sent together at most
+batch_delay = 0.005
+batch_max_size = 50
+
+# the routes which can be sent together. Only quick lookups, so one request does not hold up the others in its batch
+# requests which change something, or can take long (like the ones updating the activities), are always sent on their own
+batch_routes = [
+    "**/destiny/profile/discord",
+    "**/destiny/profile/destiny",
+    "**/destiny/profile/*/has_token",
+    "**/destiny/profile/*/*/registration_role",
+    "**/destiny/lfg/*/get",
+    "**/persistentMessages/*/get",
+    "**/elevator/discord_servers/get",
+    "**/polls/*/*/get",
+]
+batch_methods = ["GET"]
+
+# a batch should be done quickly. If it is not, the requests get sent on their own with the normal timeout
+batch_timeout = ClientTimeout(total=30)
+
+
+def get_backend_session() -> aiohttp_client_cache.CachedSession:
+    """Get the cached session to the backend. It keeps the connections alive, so they get reused by the next requests"""
+
+    global _backend_session
+
+    if not _backend_session or _backend_session.closed:
+        _backend_session = aiohttp_client_cache.CachedSession(
+            cache=backend_cache,
+            connector=aiohttp.TCPConnector(
+                limit=backend_connections,
+                limit_per_host=backend_connections,
+                ttl_dns_cache=backend_dns_cache_seconds,
+            ),
+            json_serialize=lambda x: orjson.dumps(x).decode(),
+        )
+    return _backend_session
+
+
+def get_backend_uncached_session() -> aiohttp.ClientSession:
+    """Get the session for requests which are never cached. It shares the connections of the cached session"""
+
+    global _backend_uncached_session
+
+    session = get_backend_session()
+    if not _backend_uncached_session or _backend_uncached_session.connector is not session.connector:
+        _backend_uncached_session = aiohttp.ClientSession(
+            connector=session.connector,
+            connector_owner=False,
+            json_serialize=lambda x: orjson.dumps(x).decode(),
+        )
+    return _backend_uncached_session
+
+
+async def backend_uncached_request(
+    method: str, url: str, params: Optional[dict], data: Optional[Any], timeout: ClientTimeout
+) -> tuple[int, Any]:
+    """Make the request without the cache and return its status and json content"""
+
+    async with get_backend_uncached_session().request(
+        method=method, url=url, params=params, json=data, timeout=timeout
+    ) as response:
+        content = await response.json(loads=orjson.loads) if response.content_type == "application/json" else None
+        return response.status, content
+
+
+@dataclasses.dataclass(eq=False)
+class BackendBatcher:
+    """
+    Collects the backend requests which are made at the same time and sends them as one request to the `/batch` endpoint
+    Requests which are alone get sent normally. If the batch itself fails, its requests get sent on their own
+    """
+
+    timeout: ClientTimeout
+    pending: list[tuple[BatchRequestModel, asyncio.Future]] = dataclasses.field(init=False, default_factory=list)
+    flush_handle: Optional[asyncio.TimerHandle] = dataclasses.field(init=False, default=None)
+
+    logger_exceptions: logging.Logger = dataclasses.field(
+        init=False, default=logging.getLogger("backendNetworkingExceptions")
+    )
+
+    # its **important** that the tasks have a reference - https://docs.python.org/3/library/asyncio-task.html#asyncio.create_task
+    tasks: set[asyncio.Task] = dataclasses.field(init=False, default_factory=set)
+
+    async def request(self, method: str, route: str, params: Optional[dict], data: Optional[Any]) -> tuple[int, Any]:
+        """Queue the request and return its status and json content once the batch is done"""
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(
+            (BatchRequestModel(method=method, route=URL(route).update_query(params or {}).path_qs, data=data), future)
+        )
+
+        if len(self.pending) >= batch_max_size:
+            self.flush()
+        elif not self.flush_handle:
+            self.flush_handle = loop.call_later(batch_delay, self.flush)
+
+        return await future
+
+    def flush(self):
+        """Send the queued requests"""
+
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        pending, self.pending = self.pending, []
+        if pending:
+            task = asyncio.create_task(self._send(pending))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _send(self, pending: list[tuple[BatchRequestModel, asyncio.Future]]):
+        """Send the requests and hand out the results"""
+
+        if len(pending) == 1:
+            await self._send_single(*pending[0])
+            return
+
+        try:
+            status, content = await backend_uncached_request(
+                method="POST",
+                url=base_route + "batch",
+                params=None,
+                data=BatchInputModel(requests=[batch_request for batch_request, _ in pending]).dict(),
+                timeout=batch_timeout,
+            )
+            if status != 200:
+                raise ValueError(f"The batch failed with `{status}`: {content}")
+            results = [
+                (response.status, response.content) for response in BatchResponsesModel.parse_obj(content).responses
+            ]
+
+        except Exception as error:
+            # the requests themselves might be fine, so try them on their own
+            self.logger_exceptions.error(f"Sending `{len(pending)}` requests on their own", exc_info=error)
+            await asyncio.gather(*[self._send_single(*request) for request in pending])
+
+        else:
+            for (_, future), result in zip(pending, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _send_single(self, batch_request: BatchRequestModel, future: asyncio.Future):
+        """Send the request on its own"""
+
+        try:
+            result = await backend_uncached_request(
+                method=batch_request.method,
+                url=base_route + batch_request.route.removeprefix("/"),
+                params=None,
+                data=batch_request.data,
+                timeout=self.timeout,
+            )
+        except Exception as error:
+            if not future.done():
+                future.set_exception(error)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+
+# give request a max timeout of half an hour
+backend_timeout = ClientTimeout(total=30 * 60)
+backend_batcher = BackendBatcher(timeout=backend_timeout)
+
 
 @dataclasses.dataclass(init=False)
 class BaseBackendConnection:
@@ -75,7 +253,7 @@ class BaseBackendConnection:
 
     # give request a max timeout of half an hour
     timeout: ClientTimeout = dataclasses.field(
-        default=ClientTimeout(total=30 * 60),
+        default=backend_timeout,
         init=False,
         compare=False,
         repr=False,
@@ -111,6 +289,14 @@ class BaseBackendConnection:
         repr=False,
     )
 
+    # sends concurrent requests together
+    batcher: BackendBatcher = dataclasses.field(
+        default=backend_batcher,
+        init=False,
+        compare=False,
+        repr=False,
+    )
+
     def __bool__(self):
         """Bool function to test if this exist. Useful for testing if this class got returned and not BackendResult, can be returned on errors"""
 
@@ -153,64 +339,150 @@ class BaseBackendConnection:
         await self.limiter.wait_for_token()
 
         async with self.semaphore:
-            async with aiohttp_client_cache.CachedSession(
-                cache=self.cache, timeout=self.timeout, json_serialize=lambda x: orjson.dumps(x).decode()
-            ) as session:
-                async with session.request(
+            # requests which get cached go through the cache, quick lookups can be sent together with other requests
+            if self.__is_cached(method=method, route=route):
+                async with get_backend_session().request(
                     method=method,
                     url=route,
                     params=params,
                     json=data,
+                    timeout=self.timeout,
                 ) as response:
-                    result = await self.__backend_parse_response(response=response)
+                    content = (
+                        await response.json(loads=orjson.loads) if response.content_type == "application/json" else None
+                    )
+                    status = response.status
+            elif self.__is_batched(method=method, route=route):
+                status, content = await self.batcher.request(method=method, route=route, params=params, data=data)
+            else:
+                status, content = await backend_uncached_request(
+                    method=method, url=route, params=params, data=data, timeout=self.timeout
+                )
+
+            result = self.__backend_parse_response(method=method, route=route, status=status, content=content)
+
+            # if an error occurred, already do the basic formatting
+            if not result:
+                if self.discord_member:
+                    result.error_message = {"discord_member": self.discord_member}
+                if error_message_kwargs:
+                    result.error_message = error_message_kwargs
+                await self.send_error(result)
+
+            return result
+
+    async def _backend_stream_request(
+        self,
+        method: str,
+        route: str,
+        params: Optional[dict] = None,
+        data: Optional[dict | CustomBaseModel] = None,
+        **error_message_kwargs,
+    ) -> AsyncIterator[dict]:
+        """Make a request to the specified backend route which streams back one json object per line, and yield them as they arrive"""
 
-                    # if an error occurred, already do the basic formatting
-                    if not result:
-                        if self.discord_member:
-                            result.error_message = {"discord_member": self.discord_member}
-                        if error_message_kwargs:
-                            result.error_message = error_message_kwargs
-                        await self.send_error(result)
+        if data:
+            # load with orjson to convert complex types such as datetime to a string
+            if isinstance(data, CustomBaseModel):
+                data = data.json()
+            else:
+                data = orjson.dumps(data)
+            data = orjson.loads(data)
 
-                    return result
+        await self.limiter.wait_for_token()
 
-    async def __backend_parse_response(self, response: aiohttp.ClientResponse) -> BackendResult:
+        async with self.semaphore:
+            # streams are not cached, and can take longer than the normal timeout as long as data keeps arriving
+            async with get_backend_uncached_session().request(
+                method=method,
+                url=route,
+                params=params,
+                json=data,
+                timeout=ClientTimeout(total=None, sock_read=self.timeout.total),
+            ) as response:
+                if response.status != 200:
+                    content = (
+                        await response.json(loads=orjson.loads) if response.content_type == "application/json" else None
+                    )
+                    result = self.__backend_parse_response(
+                        method=method, route=route, status=response.status, content=content
+                    )
+
+                    # do the basic error formatting
+                    if self.discord_member:
+                        result.error_message = {"discord_member": self.discord_member}
+                    if error_message_kwargs:
+                        result.error_message = error_message_kwargs
+                    await self.send_error(result)
+
+                self.logger.info(f"{response.status}: `{response.method}` - `{response.url}`")
+
+                # the chunks do not line up with the lines
+                buffer = b""
+                async for chunk in response.content.iter_any():
+                    buffer += chunk
+                    *lines, buffer = buffer.split(b"\n")
+                    for line in lines:
+                        if line.strip():
+                            yield orjson.loads(line)
+                if buffer.strip():
+                    yield orjson.loads(buffer)
+
+    def __is_cached(self, method: str, route: str) -> bool:
+        """Whether the response of that request gets saved in the cache"""
+
+        if method.upper() not in self.cache.allowed_methods:
+            return False
+
+        expire_after = get_url_expiration(route, self.cache.urls_expire_after)
+        if expire_after is None:
+            expire_after = self.cache.expire_after
+        return expire_after != 0
+
+    @staticmethod
+    def __is_batched(method: str, route: str) -> bool:
+        """Whether that request can be sent together with other requests"""
+
+        return method.upper() in batch_methods and any(url_match(route, pattern) for pattern in batch_routes)
+
+    def __backend_parse_response(self, method: str, route: str, status: int, content: Any) -> BackendResult:
         """Handle any errors and then return the content of the response"""
 
-        if response.status == 200:
+        if status == 200:
             success = True
             error = None
-            self.logger.info(f"{response.status}: `{response.method}` - `{response.url}`")
+            self.logger.info(f"{status}: `{method}` - `{route}`")
 
             # format the result to be the pydantic model
-            result = await response.json(loads=orjson.loads)
+            result = content
             error_message = None
 
         else:
             success = False
             result = None
-            error, error_message = await self.__backend_handle_errors(response)
+            error, error_message = self.__backend_handle_errors(
+                method=method, route=route, status=status, content=content
+            )
 
         return BackendResult(result=result, success=success, error=error, message=error_message)
 
-    async def __backend_handle_errors(self, response: aiohttp.ClientResponse) -> tuple[Optional[str], Optional[str]]:
+    def __backend_handle_errors(
+        self, method: str, route: str, status: int, content: Any
+    ) -> tuple[Optional[str], Optional[str]]:
         """Handles potential errors. Returns None if the error should not be returned to the user and str, str if something should be returned to the user"""
 
-        match response.status:
+        match status:
             case 409:
                 # this means the errors isn't really an error, and we want to return info to the user
-                self.logger.info(f"{response.status}: `{response.method}` - `{response.url}`")
-                error_json = await response.json(loads=orjson.loads)
-                return error_json["error"], error_json.get("message", None)
+                self.logger.info(f"{status}: `{method}` - `{route}`")
+                return content["error"], content.get("message", None)
 
             case 500:
                 # internal server error
-                self.logger_exceptions.error(f"{response.status}: `{response.method}` - `{response.url}`")
+                self.logger_exceptions.error(f"{status}: `{method}` - `{route}`")
                 return "ProgrammingError", None
 
             case _:
                 # if we don't know anything, just log it with the error
-                self.logger_exceptions.error(
-                    f"{response.status}: `{response.method}` - `{response.url}`\n{await response.json(loads=orjson.loads)}"
-                )
+                self.logger_exceptions.error(f"{status}: `{method}` - `{route}`\n{content}")
                 return None, None
@@ -67,13 +67,17 @@ class BackendPersistentMessages(BaseBackendConnection):
         return PersistentMessage.parse_obj(result.result)
 
     async def delete(
-        self, message_name: Optional[str] = None, channel_id: Optional[int] = None, message_id: Optional[int] = None
+        self,
+        message_name: Optional[str] = None,
+        channel_id: Optional[int] = None,
+        message_id: Optional[int] = None,
+        guild_id: Optional[int] = None,
     ):
-        """Deletes a persistent message"""
+        """Deletes a persistent message. `guild_id` is used if the guild object is not available anymore"""
 
         await self._backend_request(
             method="POST",
-            route=persistent_messages_delete_route.format(guild_id=self.guild.id),
+            route=persistent_messages_delete_route.format(guild_id=guild_id or self.guild.id),
             data=PersistentMessageDeleteInput(message_name=message_name, channel_id=channel_id, message_id=message_id),
         )
 
@@ -58,6 +58,10 @@ destiny_triumph_name_route = destiny_items_route + "triumph/{triumph_id}/"  # GE
 destiny_get_all_triumph_route = destiny_items_route + "triumph/get/all/"  # GET
 destiny_get_all_lore_route = destiny_items_route + "lore/get/all/"  # GET
 
+# leaderboards
+destiny_leaderboards_route = base_route + "destiny/leaderboards/{guild_id}/"
+destiny_leaderboards_get_route = destiny_leaderboards_route + "{leaderboard_name}/"  # POST
+
 # lfg
 destiny_lfg_route = base_route + "destiny/lfg/{guild_id}/"
 destiny_lfg_get_route = destiny_lfg_route + "get/{lfg_id}/"  # GET
@@ -82,6 +86,7 @@ destiny_role_get_all_route = destiny_role_route + "get/all/"  # GET
 destiny_role_get_all_user_route = destiny_role_route + "{discord_id}/get/all/"  # GET
 destiny_role_get_missing_user_route = destiny_role_route + "{discord_id}/get/missing/"  # GET
 destiny_role_get_user_route = destiny_role_route + "{discord_id}/get/{role_id}/"  # GET
+destiny_role_get_bulk_route = destiny_role_route + "bulk/get/all/"  # POST
 destiny_role_create_route = destiny_role_route + "create/"  # POST
 destiny_role_update_route = destiny_role_route + "update//{role_id}"  # POST
 destiny_role_delete_all_route = destiny_role_route + "delete/all/"  # DELETE
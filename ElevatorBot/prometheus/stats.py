@@ -71,3 +71,13 @@ descend_voice_channel_activity = Histogram(
     labelnames=["channel_id", "channel_name", "user_id"],
     buckets=BUCKETS,
 )
+
+role_updates_queued = Gauge("elevator_role_updates_queued", "Amount of members waiting for their roles to be applied")
+role_updates_guilds_running = Gauge(
+    "elevator_role_updates_guilds_running", "Amount of guilds which get their roles applied right now"
+)
+role_updates_applied = Counter(
+    "elevator_role_updates_applied",
+    "Amount of members whose roles were applied, by how it was done",
+    labelnames=["method"],
+)
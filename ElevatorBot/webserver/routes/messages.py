@@ -1,5 +1,6 @@
 from aiohttp import web
 
+from ElevatorBot.core.misc.messageDelivery import MessageDeliveryJob, message_delivery
 from ElevatorBot.misc.formatting import embed_message
 
 
@@ -20,34 +21,32 @@ async def messages(request: web.Request):
                 "channel_id": int
             }
         ],
+        "message_name": Optional[str],
         ...
     }
 
     When the message field is empty, both embed fields must be supplied
+    The messages get delivered in the background. If "message_name" is set, that persistent message gets deleted for the guilds where the channel is gone
     """
 
     client = request.app["client"]
     parameters: dict = await request.json()
 
-    guilds_with_errors = []
-
-    # loop through the guilds where messages need to be send
-    for guild_info in parameters["guilds"]:
-        channel = await client.fetch_channel(guild_info["channel_id"])
-        if not channel:
-            guilds_with_errors.append(guild_info)
-            continue
-
-        embed = None
-        if title := parameters.get("embed_title"):
-            embed = embed_message(title, parameters.get("embed_description"))
-            if image_url := parameters.get("embed_image_url"):
-                embed.set_image(url=image_url)
-
-        await channel.send(content=parameters.get("message"), embeds=embed)
-
-    return (
-        web.json_response({"success": True})
-        if not guilds_with_errors
-        else web.json_response({"success": False, "guilds": guilds_with_errors})
+    embed = None
+    if title := parameters.get("embed_title"):
+        embed = embed_message(title, parameters.get("embed_description"))
+        if image_url := parameters.get("embed_image_url"):
+            embed.set_image(url=image_url)
+
+    # the messages get sent in the background, so the caller does not have to wait for all the guilds
+    message_delivery.enqueue(
+        client=client,
+        job=MessageDeliveryJob(
+            content=parameters.get("message"),
+            embed=embed,
+            targets=parameters["guilds"],
+            message_name=parameters.get("message_name"),
+        ),
     )
+
+    return web.json_response({"success": True})
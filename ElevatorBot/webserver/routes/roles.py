@@ -1,9 +1,6 @@
 from aiohttp import web
-from naff.api.events import GuildLeft
-from naff.client.errors import Forbidden
 
-from ElevatorBot.discordEvents.guildEvents import on_guild_left
-from ElevatorBot.misc.discordShortcutFunctions import assign_roles_to_member, remove_roles_from_member
+from ElevatorBot.core.misc.roleApplication import role_application
 
 
 async def roles(request: web.Request):
@@ -25,23 +22,14 @@ async def roles(request: web.Request):
     client = request.app["client"]
     parameters = await request.json()
 
-    # loop through the guilds where roles need to be assigned
+    # the roles get applied in the background, grouped by guild and member
     for data in parameters["data"]:
-        # make sure both the guild and the member can be not found anymore
-        try:
-            if not (guild := await client.fetch_guild(data["guild_id"])):
-                await on_guild_left(GuildLeft(guild_id=data["guild_id"]))
-                continue
-
-        except Forbidden:
-            continue
-
-        if not (member := await guild.fetch_member(data["discord_id"])):
-            continue
-
-        if data["to_assign_role_ids"]:
-            await assign_roles_to_member(member, *data["to_assign_role_ids"])
-        if data["to_remove_role_ids"]:
-            await remove_roles_from_member(member, *data["to_remove_role_ids"])
+        role_application.enqueue(
+            client=client,
+            guild_id=data["guild_id"],
+            member_id=data["discord_id"],
+            to_assign=data["to_assign_role_ids"],
+            to_remove=data["to_remove_role_ids"],
+        )
 
     return web.json_response({"success": True})
@@ -2,6 +2,7 @@ from Shared.networkingSchemas.destiny.account import *
 from Shared.networkingSchemas.destiny.activities import *
 from Shared.networkingSchemas.destiny.clan import *
 from Shared.networkingSchemas.destiny.items import *
+from Shared.networkingSchemas.destiny.leaderboards import *
 from Shared.networkingSchemas.destiny.lfgSystem import *
 from Shared.networkingSchemas.destiny.profile import *
 from Shared.networkingSchemas.destiny.roles import *
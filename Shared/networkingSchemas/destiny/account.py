@@ -36,6 +36,9 @@ class DestinyTimeModel(CustomBaseModel):
 class DestinyTimesModel(CustomBaseModel):
     entries: list[DestinyTimeModel] = []
 
+    # the saved activities are complete up to this time
+    as_of: Optional[datetime.datetime] = None
+
 
 class DestinyStatInputModel(CustomBaseModel):
     stat_name: str
@@ -62,6 +65,9 @@ class DestinyLowMansModel(CustomBaseModel):
 class DestinyLowMansByCategoryModel(CustomBaseModel):
     categories: list[DestinyLowMansModel] = []
 
+    # the saved activities are complete up to this time
+    as_of: Optional[datetime.datetime] = None
+
 
 class SeasonalChallengesRecordModel(CustomBaseModel):
     record_id: int
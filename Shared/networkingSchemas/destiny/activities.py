@@ -87,3 +87,4 @@ class DestinyActivityOutputModel(CustomBaseModel):
     fastest: Optional[datetime.timedelta] = None  # only includes full runs
     fastest_instance_id: Optional[int] = None
     average: Optional[datetime.timedelta] = None
+    as_of: Optional[datetime.datetime] = None  # the saved activities are complete up to this time
@@ -0,0 +1,32 @@
+import datetime
+from typing import Optional
+
+from Shared.networkingSchemas.base import CustomBaseModel
+
+
+class DestinyLeaderboardInputModel(CustomBaseModel):
+    discord_ids: list[int]
+    activity_ids: Optional[list[int]] = None  # needed for the activity leaderboards
+    weapon_ids: Optional[list[int]] = None  # needed for the weapon leaderboards
+
+
+class DestinyLeaderboardEntryModel(CustomBaseModel):
+    discord_id: int
+    rank: int
+    value: Optional[float] = None  # what the leaderboard is sorted by
+
+    full_completions: int = 0
+    cp_completions: int = 0
+    kills: int = 0
+    precision_kills: int = 0
+    deaths: int = 0
+    assists: int = 0
+    time_spend: datetime.timedelta = datetime.timedelta()
+    fastest: Optional[datetime.timedelta] = None  # only includes full runs
+    average: Optional[datetime.timedelta] = None
+
+
+class DestinyLeaderboardModel(CustomBaseModel):
+    name: str
+    sort_by_ascending: bool
+    entries: list[DestinyLeaderboardEntryModel] = []  # sorted by rank
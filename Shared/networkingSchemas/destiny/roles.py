@@ -21,6 +21,16 @@ class EarnedRolesModel(CustomBaseModel):
     not_earned: list[RolesCategoryModel] = []
 
 
+class EarnedRolesBulkInputModel(CustomBaseModel):
+    discord_ids: list[int]
+
+
+class EarnedRolesBulkModel(CustomBaseModel):
+    discord_id: int
+    roles: Optional[EarnedRolesModel] = None
+    error: Optional[str] = None  # set if the user could not be checked, f.e. "DiscordIdNotFound"
+
+
 class MissingRolesModel(CustomBaseModel):
     acquirable: list[RolesCategoryModel] = []
     deprecated: list[RolesCategoryModel] = []
@@ -39,6 +39,9 @@ class DestinyWeaponStatsModel(CustomBaseModel):
     best_kills_activity_id: int
     best_kills_date: datetime.datetime
 
+    # the saved activities are complete up to this time
+    as_of: Optional[datetime.datetime] = None
+
 
 class DestinyTopWeaponModel(CustomBaseModel):
     ranking: int
@@ -56,6 +59,9 @@ class DestinyTopWeaponsModel(CustomBaseModel):
     energy: list[DestinyTopWeaponModel] = []
     power: list[DestinyTopWeaponModel] = []
 
+    # the saved activities are complete up to this time
+    as_of: Optional[datetime.datetime] = None
+
 
 class DestinyTopWeaponsStatInputModelEnum(str, Enum):
     KILLS = "kills"
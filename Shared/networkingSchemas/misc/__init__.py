@@ -1,4 +1,5 @@
 from Shared.networkingSchemas.misc.auth import *
+from Shared.networkingSchemas.misc.batch import *
 from Shared.networkingSchemas.misc.elevatorInfo import *
 from Shared.networkingSchemas.misc.moderation import *
 from Shared.networkingSchemas.misc.persistentMessages import *
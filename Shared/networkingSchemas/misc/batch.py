@@ -0,0 +1,22 @@
+from typing import Any, Optional
+
+from Shared.networkingSchemas.base import CustomBaseModel
+
+
+class BatchRequestModel(CustomBaseModel):
+    method: str
+    route: str  # the path, including the query string
+    data: Optional[Any] = None
+
+
+class BatchInputModel(CustomBaseModel):
+    requests: list[BatchRequestModel]
+
+
+class BatchResponseModel(CustomBaseModel):
+    status: int
+    content: Optional[Any] = None
+
+
+class BatchResponsesModel(CustomBaseModel):
+    responses: list[BatchResponseModel]